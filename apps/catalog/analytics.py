@@ -0,0 +1,181 @@
+"""
+Аналитика скидок по дневным итогам (DiscountDailyRollup).
+
+Итоги за день пересобираются из заказов задачей rollup_discount_usage,
+а день старого заказа, скидка которого изменилась, — обработчиком outbox;
+статистика за произвольный период читается одним запросом к итогам.
+Уникальные клиенты за период считаются объединением HyperLogLog-скетчей
+дней (погрешность около 3%, на малых количествах — точное значение).
+"""
+import hashlib
+import math
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .models import DiscountDailyRollup
+
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+
+def _hll_add(registers, value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    hashed = int.from_bytes(digest, 'big')
+    index = hashed >> (64 - HLL_PRECISION)
+    rest = hashed & ((1 << (64 - HLL_PRECISION)) - 1)
+    rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+    if rank > registers[index]:
+        registers[index] = rank
+
+
+def build_sketch(values):
+    registers = bytearray(HLL_REGISTERS)
+    for value in values:
+        _hll_add(registers, value)
+    return bytes(registers)
+
+
+def merge_sketches(sketches):
+    merged = bytes(HLL_REGISTERS)
+    for sketch in sketches:
+        merged = bytes(map(max, merged, bytes(sketch)))
+    return merged
+
+
+def estimate_cardinality(sketch):
+    registers = bytes(sketch)
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    estimate = alpha * HLL_REGISTERS ** 2 / sum(2.0 ** -rank for rank in registers)
+    zeros = registers.count(0)
+    if estimate <= 2.5 * HLL_REGISTERS and zeros:
+        # Малые количества: линейный подсчет по пустым регистрам
+        estimate = HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+    return int(round(estimate))
+
+
+class DiscountAnalyticsService:
+    @staticmethod
+    def _day_bounds(day):
+        tz = timezone.get_current_timezone()
+        start = timezone.make_aware(datetime.combine(day, time.min), tz)
+        return start, start + timedelta(days=1)
+
+    @staticmethod
+    def rollup_day(day):
+        """Пересобирает итоги скидок за день. Возвращает количество строк итогов."""
+        from apps.orders.models import Order
+
+        start, end = DiscountAnalyticsService._day_bounds(day)
+        rows = defaultdict(lambda: {'orders': 0, 'total': Decimal('0'), 'clients': set()})
+        for rule_id, client_id, amount in Order.objects.filter(
+            discount__isnull=False,
+            created_at__gte=start,
+            created_at__lt=end
+        ).values_list('discount_id', 'client_id', 'discount_amount').iterator():
+            row = rows[rule_id]
+            row['orders'] += 1
+            row['total'] += amount or 0
+            row['clients'].add(client_id)
+
+        with transaction.atomic():
+            DiscountDailyRollup.objects.filter(day=day).delete()
+            DiscountDailyRollup.objects.bulk_create([
+                DiscountDailyRollup(
+                    rule_id=rule_id,
+                    day=day,
+                    orders_count=row['orders'],
+                    users_count=len(row['clients']),
+                    total_discount=row['total'],
+                    users_sketch=build_sketch(row['clients'])
+                )
+                for rule_id, row in rows.items()
+            ])
+        return len(rows)
+
+    @staticmethod
+    def apply_order_changes(payloads):
+        """
+        Применяет пачку событий 'order.changed': скидка, примененная к заказу
+        или снятая с него позже, меняет итоги дня создания заказа. Эти дни
+        пересобираются сразу: rollup_recent пересобирает только последние дни.
+        """
+        from apps.orders.models import Order
+
+        order_ids = {
+            payload['order_id'] for payload in payloads
+            if not payload['created'] and set(payload['changed_fields']) & {'discount_id', 'discount_amount'}
+        }
+        if not order_ids:
+            return 0
+        days = {
+            timezone.localdate(created_at)
+            for created_at in Order.objects.filter(id__in=order_ids).values_list('created_at', flat=True)
+        }
+        return sum(DiscountAnalyticsService.rollup_day(day) for day in sorted(days))
+
+    @staticmethod
+    def rollup_recent(days=2):
+        """Пересобирает итоги за последние дни, включая текущий"""
+        today = timezone.localdate()
+        return sum(
+            DiscountAnalyticsService.rollup_day(today - timedelta(days=offset))
+            for offset in range(days)
+        )
+
+    @staticmethod
+    def get_statistics(date_from, date_to):
+        """
+        Статистика скидок за период [date_from, date_to] одним запросом к итогам:
+        по правилам, по дням и общая.
+        """
+        rows = DiscountDailyRollup.objects.filter(
+            day__gte=date_from,
+            day__lte=date_to
+        ).values_list(
+            'rule_id', 'rule__name', 'day', 'orders_count', 'users_count', 'total_discount', 'users_sketch'
+        )
+
+        per_rule = {}
+        per_day = defaultdict(lambda: {'orders_count': 0, 'total_discount': Decimal('0')})
+        all_sketches = []
+        for rule_id, name, day, orders_count, users_count, total_discount, sketch in rows:
+            rule = per_rule.setdefault(rule_id, {
+                'id': rule_id, 'name': name, 'orders_count': 0, 'users_count': users_count,
+                'total_discount_amount': Decimal('0'), 'sketches': []
+            })
+            rule['orders_count'] += orders_count
+            rule['total_discount_amount'] += total_discount
+            rule['sketches'].append(sketch)
+            per_day[day]['orders_count'] += orders_count
+            per_day[day]['total_discount'] += total_discount
+            all_sketches.append(sketch)
+
+        discounts = []
+        for rule in per_rule.values():
+            sketches = rule.pop('sketches')
+            if len(sketches) > 1:
+                # За один день число клиентов в итогах точное, за период — оценка
+                rule['users_count'] = estimate_cardinality(merge_sketches(sketches))
+            rule['avg_discount_amount'] = (
+                (rule['total_discount_amount'] / rule['orders_count']).quantize(Decimal('0.01'))
+                if rule['orders_count'] else Decimal('0')
+            )
+            discounts.append(rule)
+        discounts.sort(key=lambda rule: -rule['total_discount_amount'])
+
+        orders_count = sum(rule['orders_count'] for rule in discounts)
+        total_discount = sum((rule['total_discount_amount'] for rule in discounts), Decimal('0'))
+        return {
+            'date_from': date_from,
+            'date_to': date_to,
+            'discounts': discounts,
+            'daily': [{'day': day, **values} for day, values in sorted(per_day.items())],
+            'totals': {
+                'orders_count': orders_count,
+                'users_count': estimate_cardinality(merge_sketches(all_sketches)),
+                'total_discount': total_discount,
+                'avg_discount': (total_discount / orders_count).quantize(Decimal('0.01')) if orders_count else Decimal('0'),
+            },
+        }
@@ -0,0 +1,227 @@
+"""
+Рассылки писем о скидках (DiscountCampaign).
+
+Скидки для пачки клиентов подбираются по агрегатам ClientLoyalty,
+загруженным одним запросом вместе с клиентами. Шаблоны компилируются
+один раз на процесс. Пачка писем уходит одним вызовом send_messages
+через общее SMTP-соединение, скорость ограничивается перед каждым
+письмом. Позиция сохраняется после каждой пачки.
+"""
+import smtplib
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+from apps.core.ratelimit import RateLimiter
+from apps.users.models import User
+from .models import DiscountCampaign, DiscountRule
+
+# Тема письма и шаблон (без расширения) для каждого типа рассылки
+CAMPAIGN_EMAILS = {
+    'available': ('Доступные скидки на заказы', 'catalog/emails/available_discounts'),
+    'upcoming': ('Скоро доступные скидки', 'catalog/emails/upcoming_discounts'),
+}
+# Скидка «почти доступна», если осталось не больше стольких заказов или рублей
+UPCOMING_ORDERS_GAP = 3
+UPCOMING_SPENT_GAP = Decimal('5000')
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    return get_template(name)
+
+
+class CampaignBatch:
+    """
+    Письма пачки клиентов для одного вызова send_messages. Перед каждым
+    письмом ждет ограничитель скорости. Позиция и счетчик отправленных
+    обновляются, когда соединение берет следующее письмо, то есть после
+    отправки предыдущего: при обрыве соединения позиция остается перед
+    клиентом, письмо которому не ушло.
+    """
+
+    def __init__(self, campaign, rules, users, limiter):
+        self.campaign = campaign
+        self.rules = rules
+        self.users = users
+        self.limiter = limiter
+        self.current = None
+        self.failed = False
+
+    def messages(self):
+        campaign = self.campaign
+        for user in self.users:
+            context = DiscountCampaignService.get_context(campaign.kind, self.rules, user)
+            if context is not None:
+                message = DiscountCampaignService.build_message(campaign.kind, user, context)
+                self.limiter.wait()
+                self.current, self.failed = user, False
+                yield message
+                if not self.failed:
+                    campaign.sent_count += 1
+            campaign.last_user_id = user.id
+
+    def fail(self, error):
+        """Ошибка отправки текущего письма: клиент пропускается"""
+        self.failed = True
+        self.campaign.failed_count += 1
+        self.campaign.last_error = f"{self.current.email}: {error}"
+
+
+class DiscountCampaignService:
+    @staticmethod
+    def active_rules(kind):
+        """Правила рассылки; для 'upcoming' — и начинающие действовать в ближайшие 30 дней"""
+        now = timezone.now()
+        starts_before = now if kind == 'available' else now + timedelta(days=30)
+        return list(
+            DiscountRule.objects.filter(
+                is_active=True,
+                valid_from__lte=starts_before
+            ).filter(
+                Q(valid_until__isnull=True) | Q(valid_until__gt=now)
+            ).prefetch_related('work_types')
+        )
+
+    @staticmethod
+    def _loyalty(user):
+        try:
+            return user.loyalty.completed_orders, user.loyalty.total_spent
+        except ObjectDoesNotExist:
+            return 0, Decimal('0')
+
+    @staticmethod
+    def get_context(kind, rules, user):
+        """Скидки для письма клиенту или None, если писать не о чем"""
+        orders, spent = DiscountCampaignService._loyalty(user)
+        if kind == 'available':
+            discounts = [
+                rule for rule in rules
+                if orders >= rule.min_orders and spent >= rule.min_total_spent
+            ]
+            return {'discounts': discounts} if discounts else None
+
+        upcoming = []
+        for rule in rules:
+            orders_remaining = max(0, rule.min_orders - orders)
+            spent_remaining = max(Decimal('0'), rule.min_total_spent - spent)
+            if 0 < orders_remaining <= UPCOMING_ORDERS_GAP or 0 < spent_remaining <= UPCOMING_SPENT_GAP:
+                upcoming.append({
+                    'discount': rule,
+                    'orders_remaining': orders_remaining,
+                    'spent_remaining': spent_remaining
+                })
+        return {'upcoming_discounts': upcoming} if upcoming else None
+
+    @staticmethod
+    def build_message(kind, user, context):
+        subject, template = CAMPAIGN_EMAILS[kind]
+        context = {'user': user, 'site_url': settings.FRONTEND_URL, **context}
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body=_template(f'{template}.txt').render(context),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email]
+        )
+        message.attach_alternative(_template(f'{template}.html').render(context), 'text/html')
+        return message
+
+    @staticmethod
+    def recipients(after_id, limit):
+        """Следующая пачка клиентов с агрегатами лояльности, одним запросом"""
+        return list(
+            User.objects.filter(
+                role='client',
+                is_active=True,
+                id__gt=after_id
+            ).exclude(
+                email=''
+            ).select_related('loyalty').only(
+                'id', 'username', 'email', 'first_name', 'last_name',
+                'loyalty__completed_orders', 'loyalty__total_spent'
+            ).order_by('id')[:limit]
+        )
+
+    @staticmethod
+    def start(kind):
+        """Создает рассылку и ставит ее отправку в очередь после фиксации транзакции"""
+        from .tasks import send_discount_campaign
+
+        campaign = DiscountCampaign.objects.create(kind=kind)
+        transaction.on_commit(lambda: send_discount_campaign.delay(campaign.pk))
+        return campaign
+
+    @staticmethod
+    def claim(campaign_id):
+        """
+        Захватывает рассылку для выполнения. Рассылка в статусе 'running',
+        не обновлявшаяся DISCOUNT_CAMPAIGN_STALE_AFTER секунд, считается
+        брошенной упавшим процессом.
+        """
+        stale = timezone.now() - timedelta(seconds=getattr(settings, 'DISCOUNT_CAMPAIGN_STALE_AFTER', 900))
+        return DiscountCampaign.objects.filter(pk=campaign_id).filter(
+            Q(status__in=['pending', 'paused']) | Q(status='running', updated_at__lt=stale)
+        ).update(status='running', updated_at=timezone.now()) == 1
+
+    @staticmethod
+    def run(campaign_id, time_limit=None):
+        """
+        Продолжает рассылку с сохраненной позиции. По истечении time_limit
+        секунд рассылка приостанавливается (status='paused'). Возвращает
+        рассылку или None, если она завершена или ее выполняет другой процесс.
+
+        Позиция сохраняется после каждой пачки и при обрыве соединения,
+        поэтому повторно письмо может получить только клиент, на котором
+        оборвалось соединение.
+        """
+        if not DiscountCampaignService.claim(campaign_id):
+            return None
+        campaign = DiscountCampaign.objects.get(pk=campaign_id)
+        batch_size = getattr(settings, 'DISCOUNT_CAMPAIGN_BATCH_SIZE', 100)
+        # Не больше DISCOUNT_CAMPAIGN_RATE писем в секунду, равномерно
+        limiter = RateLimiter(getattr(settings, 'DISCOUNT_CAMPAIGN_RATE', 10))
+        rules = DiscountCampaignService.active_rules(campaign.kind)
+        started = time.monotonic()
+        fields = ['status', 'last_user_id', 'sent_count', 'failed_count', 'last_error', 'finished_at', 'updated_at']
+
+        try:
+            with get_connection() as connection:
+                while True:
+                    users = DiscountCampaignService.recipients(campaign.last_user_id, batch_size)
+                    if not users:
+                        campaign.status = 'completed'
+                        campaign.finished_at = timezone.now()
+                        break
+
+                    batch = CampaignBatch(campaign, rules, users, limiter)
+                    messages = batch.messages()
+                    while True:
+                        try:
+                            # Ошибка письма прерывает вызов, остаток пачки отправляется следующим
+                            connection.send_messages(messages)
+                        except smtplib.SMTPServerDisconnected:
+                            raise
+                        except smtplib.SMTPException as e:
+                            batch.fail(e)
+                        else:
+                            break
+                    campaign.save(update_fields=fields)
+
+                    if time_limit is not None and time.monotonic() - started >= time_limit:
+                        campaign.status = 'paused'
+                        break
+        except Exception as e:
+            campaign.status = 'paused'
+            campaign.last_error = str(e)
+            campaign.save(update_fields=fields)
+            raise
+
+        campaign.save(update_fields=fields)
+        return campaign
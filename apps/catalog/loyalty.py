@@ -0,0 +1,146 @@
+"""
+Агрегаты лояльности клиентов и сегменты правил скидок.
+
+ClientLoyalty хранит количество и сумму выполненных заказов клиента.
+Сегмент правила — клиенты, прошедшие пороги min_orders и min_total_spent, —
+выбирается одним запросом по индексу агрегатов, без группировки заказов.
+"""
+import csv
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import ClientLoyalty
+
+ZERO = Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class ClientLoyaltyService:
+    @staticmethod
+    def apply_order_changes(payloads):
+        """
+        Применяет пачку событий 'order.changed': вклад выполненных заказов
+        суммируется по клиентам, затем каждая строка обновляется одним UPDATE
+        """
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        tracked = {'status', 'client_id', 'budget'}
+
+        for payload in payloads:
+            # События, записанные до появления агрегатов, уже учтены
+            # заполнением в миграции
+            if 'budget' not in payload:
+                continue
+            changed = set(payload['changed_fields'])
+            if not payload['created'] and not changed & tracked:
+                continue
+
+            if payload['status'] == 'completed' and payload['client_id']:
+                delta = deltas[payload['client_id']]
+                delta[0] += 1
+                delta[1] += Decimal(str(payload['budget']))
+            if payload['created']:
+                continue
+
+            previous = {
+                field: payload['previous'].get(field) if field in changed else payload[field]
+                for field in tracked
+            }
+            if previous['status'] == 'completed' and previous['client_id']:
+                delta = deltas[previous['client_id']]
+                delta[0] -= 1
+                delta[1] -= Decimal(str(previous['budget'] or 0))
+
+        user_ids = sorted(user_id for user_id, (orders, spent) in deltas.items() if orders or spent)
+        if not user_ids:
+            return
+        ClientLoyalty.objects.bulk_create(
+            [ClientLoyalty(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+        # Фиксированный порядок обновления строк исключает взаимоблокировки
+        for user_id in user_ids:
+            orders, spent = deltas[user_id]
+            ClientLoyalty.objects.filter(pk=user_id).update(
+                completed_orders=Greatest(F('completed_orders') + orders, Value(0)),
+                total_spent=Greatest(F('total_spent') + spent, ZERO)
+            )
+
+    @staticmethod
+    def reconcile():
+        """
+        Сверяет агрегаты с выполненными заказами и исправляет расхождения.
+        Возвращает количество исправленных строк.
+        """
+        from apps.orders.models import Order
+
+        completed = Order.objects.filter(status='completed')
+        missing = completed.filter(client__isnull=False, client__loyalty__isnull=True)
+        # Новые строки создаются нулевыми и исправляются ниже
+        ClientLoyalty.objects.bulk_create(
+            [ClientLoyalty(user_id=user_id) for user_id in missing.values_list('client_id', flat=True).distinct()],
+            ignore_conflicts=True
+        )
+
+        rows = completed.filter(client=OuterRef('pk')).order_by().values('client')
+        actual = ClientLoyalty.objects.annotate(
+            actual_orders=Coalesce(Subquery(rows.annotate(v=Count('pk')).values('v')), 0),
+            actual_spent=Coalesce(Subquery(rows.annotate(v=Sum('budget')).values('v')), ZERO)
+        ).filter(
+            ~Q(completed_orders=F('actual_orders')) | ~Q(total_spent=F('actual_spent'))
+        ).values('pk', 'actual_orders', 'actual_spent')
+
+        fixed = 0
+        with transaction.atomic():
+            for row in actual:
+                ClientLoyalty.objects.filter(pk=row['pk']).update(
+                    completed_orders=row['actual_orders'],
+                    total_spent=row['actual_spent']
+                )
+                fixed += 1
+        return fixed
+
+
+class _Echo:
+    """Буфер для csv.writer, возвращающий записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+class DiscountSegmentService:
+    EXPORT_HEADER = ('user_id', 'username', 'email', 'completed_orders', 'total_spent')
+
+    @staticmethod
+    def queryset(rule):
+        """
+        Клиенты, подходящие под пороги правила. Учитываются клиенты
+        хотя бы с одним выполненным заказом.
+        """
+        return ClientLoyalty.objects.filter(
+            completed_orders__gte=max(rule.min_orders, 1),
+            total_spent__gte=rule.min_total_spent
+        )
+
+    @staticmethod
+    def count(rule):
+        """Количество подходящих клиентов; кэшируется на DISCOUNT_SEGMENT_COUNT_TIMEOUT"""
+        key = f'discount_segment_count:{rule.pk}:{rule.min_orders}:{rule.min_total_spent}'
+        count = cache.get(key)
+        if count is None:
+            count = DiscountSegmentService.queryset(rule).count()
+            cache.set(key, count, getattr(settings, 'DISCOUNT_SEGMENT_COUNT_TIMEOUT', 60))
+        return count
+
+    @staticmethod
+    def export_rows(rule, chunk_size=2000):
+        """Строки CSV сегмента; клиенты читаются из базы пачками по chunk_size"""
+        writer = csv.writer(_Echo())
+        yield writer.writerow(DiscountSegmentService.EXPORT_HEADER)
+        rows = DiscountSegmentService.queryset(rule).order_by('user_id').values_list(
+            'user_id', 'user__username', 'user__email', 'completed_orders', 'total_spent'
+        )
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield writer.writerow(row)
@@ -0,0 +1,66 @@
+import random
+import time
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.catalog.models import WorkType, Complexity
+from apps.catalog.pricing import pricing_engine
+from apps.catalog.services import PricingService
+
+User = get_user_model()
+
+REQUIREMENTS = (
+    None,
+    {'uniqueness': 85},
+    {'uniqueness': 95, 'formatting': True},
+    {'additional_materials': True, 'presentation': True},
+)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость расчета цен: по одной цене (PricingService) и пачкой (PricingEngine.price_many)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', type=int, default=20000, help='Количество цен')
+        parser.add_argument('--user', type=int, help='id пользователя для расчета скидок')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        work_types = list(WorkType.objects.filter(is_active=True))
+        complexities = list(Complexity.objects.all())
+        if not work_types or not complexities:
+            raise CommandError('Нужны типы работ и сложности: create_default_work_types, create_default_complexities')
+        user = User.objects.get(pk=options['user']) if options['user'] else None
+
+        rnd = random.Random(options['seed'])
+        now = timezone.now()
+        quotes = [
+            (
+                rnd.choice(work_types),
+                rnd.choice(complexities),
+                now + timedelta(hours=rnd.randint(1, 400), seconds=rnd.randint(0, 3599)),
+                rnd.choice(REQUIREMENTS),
+            )
+            for _ in range(options['quotes'])
+        ]
+        pricing_engine.sync()
+
+        started = time.perf_counter()
+        single = [
+            PricingService.calculate_order_price(work_type, complexity, deadline, user, requirements)
+            for work_type, complexity, deadline, requirements in quotes
+        ]
+        single_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = pricing_engine.price_many(
+            [(work_type.id, complexity.id, deadline, requirements) for work_type, complexity, deadline, requirements in quotes],
+            user=user
+        )
+        batch_time = time.perf_counter() - started
+
+        if single != batch:
+            raise CommandError('Цены по одной и пачкой не совпадают')
+        for name, elapsed in (('По одной', single_time), ('Пачкой', batch_time)):
+            self.stdout.write(f'{name}: {len(quotes) / elapsed:,.0f} цен/с ({elapsed * 1000:.1f} мс)')
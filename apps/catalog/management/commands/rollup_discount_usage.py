@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.catalog.analytics import DiscountAnalyticsService
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневные итоги использования скидок за период (по умолчанию за 30 дней)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='Первый день периода, ГГГГ-ММ-ДД')
+        parser.add_argument('--date-to', help='Последний день периода, ГГГГ-ММ-ДД')
+
+    def handle(self, *args, **options):
+        try:
+            date_to = date.fromisoformat(options['date_to']) if options['date_to'] else timezone.localdate()
+            date_from = (
+                date.fromisoformat(options['date_from']) if options['date_from']
+                else date_to - timedelta(days=29)
+            )
+        except ValueError:
+            raise CommandError('Даты нужно указать в формате ГГГГ-ММ-ДД')
+
+        day = date_from
+        rows = 0
+        while day <= date_to:
+            rows += DiscountAnalyticsService.rollup_day(day)
+            day += timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(
+            f'Итоги скидок пересобраны с {date_from} по {date_to}: {rows} строк'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.catalog.campaigns import CAMPAIGN_EMAILS, DiscountCampaignService
+from apps.catalog.models import DiscountCampaign
+
+
+class Command(BaseCommand):
+    help = 'Отправляет рассылку о скидках всем клиентам или продолжает прерванную (--resume)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='?', choices=sorted(CAMPAIGN_EMAILS))
+        parser.add_argument('--resume', type=int, help='id прерванной рассылки')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            campaign_id = options['resume']
+        elif options['kind']:
+            campaign_id = DiscountCampaign.objects.create(kind=options['kind']).pk
+        else:
+            raise CommandError('Укажите тип рассылки или --resume')
+
+        campaign = DiscountCampaignService.run(campaign_id)
+        if campaign is None:
+            raise CommandError(f'Рассылка #{campaign_id} завершена или выполняется другим процессом')
+        self.stdout.write(self.style.SUCCESS(
+            f'Рассылка #{campaign.pk}: отправлено {campaign.sent_count}, ошибок {campaign.failed_count}'
+        ))
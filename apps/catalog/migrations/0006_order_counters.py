@@ -0,0 +1,101 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, link):
+    rows = queryset.filter(**{link: OuterRef('pk')}).order_by().values(link)
+    return Coalesce(Subquery(rows.annotate(v=Count('pk')).values('v')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    Topic = apps.get_model('catalog', 'Topic')
+    Specialization = apps.get_model('experts', 'Specialization')
+    for link, name in (('subject', 'Subject'), ('topic', 'Topic'),
+                       ('work_type', 'WorkType'), ('complexity', 'Complexity')):
+        apps.get_model('catalog', name).objects.update(
+            orders_count=_count(Order.objects.all(), link),
+            completed_orders_count=_count(Order.objects.filter(status='completed'), link)
+        )
+    apps.get_model('catalog', 'Subject').objects.update(
+        topics_count=_count(Topic.objects.all(), 'subject'),
+        active_topics_count=_count(Topic.objects.filter(is_active=True), 'subject'),
+        experts_count=_count(Specialization.objects.all(), 'subject'),
+        verified_experts_count=_count(Specialization.objects.filter(is_verified=True), 'subject')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_alter_subject_options'),
+        ('experts', '0007_remove_expertstatistics_orders_cancelled_and_more'),
+        ('orders', '0010_ledgermonthlyrollup_transaction_entry_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complexity',
+            name='completed_orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Выполненных заказов'),
+        ),
+        migrations.AddField(
+            model_name='complexity',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Заказов'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='active_topics_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Активных тем'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='completed_orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Выполненных заказов'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='experts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Экспертов'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Заказов'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='topics_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Тем'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='verified_experts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Проверенных экспертов'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='completed_orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Выполненных заказов'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Заказов'),
+        ),
+        migrations.AddField(
+            model_name='worktype',
+            name='completed_orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Выполненных заказов'),
+        ),
+        migrations.AddField(
+            model_name='worktype',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Заказов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
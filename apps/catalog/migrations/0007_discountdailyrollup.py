@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_order_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscountDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('users_count', models.PositiveIntegerField(default=0, verbose_name='Клиентов')),
+                ('total_discount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма скидок')),
+                ('users_sketch', models.BinaryField(verbose_name='Скетч клиентов')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='catalog.discountrule', verbose_name='Правило скидки')),
+            ],
+            options={
+                'verbose_name': 'Итоги скидки за день',
+                'verbose_name_plural': 'Итоги скидок по дням',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='catalog_dis_day_8ca247_idx')],
+                'unique_together': {('rule', 'day')},
+            },
+        ),
+    ]
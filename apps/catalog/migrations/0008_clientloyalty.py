@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_loyalty(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    ClientLoyalty = apps.get_model('catalog', 'ClientLoyalty')
+    rows = Order.objects.filter(status='completed', client__isnull=False).values('client_id').annotate(
+        orders=Count('id'), spent=Sum('budget')
+    ).order_by()
+    ClientLoyalty.objects.bulk_create(
+        [ClientLoyalty(user_id=row['client_id'], completed_orders=row['orders'], total_spent=row['spent'] or 0)
+         for row in rows.iterator()],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_discountdailyrollup'),
+        ('orders', '0011_order_discount_index'),
+        ('users', '0009_user_token_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientLoyalty',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loyalty', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('completed_orders', models.PositiveIntegerField(default=0, verbose_name='Выполненных заказов')),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма выполненных заказов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Лояльность клиента',
+                'verbose_name_plural': 'Лояльность клиентов',
+                'indexes': [models.Index(fields=['completed_orders', 'total_spent'], name='catalog_cli_complet_30031f_idx')],
+            },
+        ),
+        migrations.RunPython(fill_loyalty, migrations.RunPython.noop),
+    ]
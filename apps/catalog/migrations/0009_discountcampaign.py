@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_clientloyalty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscountCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('available', 'Доступные скидки'), ('upcoming', 'Скоро доступные скидки')], max_length=20, verbose_name='Тип рассылки')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('paused', 'Приостановлена'), ('completed', 'Завершена')], default='pending', max_length=20, verbose_name='Статус')),
+                ('last_user_id', models.PositiveIntegerField(default=0, verbose_name='Последний обработанный клиент')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Ошибок отправки')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Рассылка о скидках',
+                'verbose_name_plural': 'Рассылки о скидках',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,10 +1,23 @@
 from django.db import models
+from django.conf import settings
 from django.utils.text import slugify
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
 
+class OrderCounters(models.Model):
+    """
+    Счетчики заказов, поддерживаемые инкрементально обработчиком outbox
+    'order.changed' и сверяемые периодической задачей (CatalogCounterService)
+    """
+    orders_count = models.PositiveIntegerField("Заказов", default=0)
+    completed_orders_count = models.PositiveIntegerField("Выполненных заказов", default=0)
+
+    class Meta:
+        abstract = True
+
+
 class SubjectCategory(models.Model):
     """Категория предметов (например, Технические науки, Гуманитарные науки и т.д.)"""
     name = models.CharField("Название", max_length=100)
@@ -37,7 +50,7 @@ class SubjectCategory(models.Model):
         return reverse('catalog:category-detail', kwargs={'slug': self.slug})
 
 
-class Subject(models.Model):
+class Subject(OrderCounters):
     """Модель предмета (например, Математика, Физика и т.д.)"""
     name = models.CharField("Название предмета", max_length=100)
     slug = models.SlugField("URL", max_length=100, unique=True, blank=True)
@@ -58,6 +71,10 @@ class Subject(models.Model):
         default=0,
         validators=[MinValueValidator(0)]
     )
+    topics_count = models.PositiveIntegerField("Тем", default=0)
+    active_topics_count = models.PositiveIntegerField("Активных тем", default=0)
+    experts_count = models.PositiveIntegerField("Экспертов", default=0)
+    verified_experts_count = models.PositiveIntegerField("Проверенных экспертов", default=0)
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
     updated_at = models.DateTimeField("Дата обновления", auto_now=True)
     
@@ -77,16 +94,8 @@ class Subject(models.Model):
     def get_absolute_url(self):
         return reverse('catalog:subject-detail', kwargs={'slug': self.slug})
 
-    @property
-    def active_topics_count(self):
-        return self.topics.filter(is_active=True).count()
-
-    @property
-    def verified_experts_count(self):
-        return self.experts.filter(is_verified=True).count()
-
 
-class Topic(models.Model):
+class Topic(OrderCounters):
     """Модель темы в рамках предмета"""
     subject = models.ForeignKey(
         Subject,
@@ -132,16 +141,8 @@ class Topic(models.Model):
             'slug': self.slug
         })
 
-    @property
-    def orders_count(self):
-        return self.orders.count()
 
-    @property
-    def completed_orders_count(self):
-        return self.orders.filter(status='completed').count()
-
-
-class WorkType(models.Model):
+class WorkType(OrderCounters):
     """Модель типа работы (например, Контрольная, Курсовая и т.д.)"""
     name = models.CharField("Название", max_length=100, unique=True)
     slug = models.SlugField("URL", max_length=100, unique=True, blank=True)
@@ -184,10 +185,6 @@ class WorkType(models.Model):
     def get_absolute_url(self):
         return reverse('catalog:worktype-detail', kwargs={'slug': self.slug})
 
-    @property
-    def orders_count(self):
-        return self.orders.count()
-
     @property
     def average_completion_time(self):
         completed_orders = self.orders.filter(status='completed')
@@ -198,7 +195,7 @@ class WorkType(models.Model):
         return total_time / completed_orders.count()
 
 
-class Complexity(models.Model):
+class Complexity(OrderCounters):
     """Модель сложности работы"""
     name = models.CharField("Название", max_length=50, unique=True)
     slug = models.SlugField("URL", max_length=50, unique=True, blank=True)
@@ -236,10 +233,6 @@ class Complexity(models.Model):
     def get_absolute_url(self):
         return reverse('catalog:complexity-detail', kwargs={'slug': self.slug})
 
-    @property
-    def orders_count(self):
-        return self.orders.count()
-
     @property
     def average_rating(self):
         completed_orders = self.orders.filter(status='completed', expert_review__isnull=False)
@@ -352,3 +345,95 @@ class DiscountRule(models.Model):
             return (base_price * self.value) / 100
         return min(self.value, base_price)  # Не даем скидке превысить базовую цену
 
+
+
+class DiscountDailyRollup(models.Model):
+    """
+    Дневные итоги применения правила скидки (по дате создания заказа).
+    users_sketch — HyperLogLog-скетч клиентов: скетчи разных дней
+    объединяются, что дает число уникальных клиентов за любой период.
+    """
+    rule = models.ForeignKey(
+        DiscountRule,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        verbose_name="Правило скидки"
+    )
+    day = models.DateField("День")
+    orders_count = models.PositiveIntegerField("Заказов", default=0)
+    users_count = models.PositiveIntegerField("Клиентов", default=0)
+    total_discount = models.DecimalField("Сумма скидок", max_digits=12, decimal_places=2, default=0)
+    users_sketch = models.BinaryField("Скетч клиентов")
+
+    class Meta:
+        verbose_name = "Итоги скидки за день"
+        verbose_name_plural = "Итоги скидок по дням"
+        unique_together = ['rule', 'day']
+        indexes = [models.Index(fields=['day'])]
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.rule_id} {self.day}: {self.orders_count}"
+
+
+class ClientLoyalty(models.Model):
+    """
+    Агрегаты выполненных заказов клиента для правил скидок (min_orders,
+    min_total_spent). Обновляются по событиям 'order.changed' и сверяются
+    периодической задачей (ClientLoyaltyService). Строка создается
+    при первом выполненном заказе клиента.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='loyalty',
+        verbose_name="Клиент"
+    )
+    completed_orders = models.PositiveIntegerField("Выполненных заказов", default=0)
+    total_spent = models.DecimalField("Сумма выполненных заказов", max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+
+    class Meta:
+        verbose_name = "Лояльность клиента"
+        verbose_name_plural = "Лояльность клиентов"
+        indexes = [models.Index(fields=['completed_orders', 'total_spent'])]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.completed_orders} / {self.total_spent}"
+
+
+class DiscountCampaign(models.Model):
+    """
+    Рассылка клиентам писем о скидках. Клиенты обходятся по возрастанию id,
+    после каждой пачки писем позиция (last_user_id) и счетчики сохраняются,
+    поэтому прерванная рассылка продолжается с места остановки.
+    """
+    KIND_CHOICES = [
+        ('available', 'Доступные скидки'),
+        ('upcoming', 'Скоро доступные скидки'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('running', 'Выполняется'),
+        ('paused', 'Приостановлена'),
+        ('completed', 'Завершена'),
+    ]
+
+    kind = models.CharField("Тип рассылки", max_length=20, choices=KIND_CHOICES)
+    status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default='pending')
+    last_user_id = models.PositiveIntegerField("Последний обработанный клиент", default=0)
+    sent_count = models.PositiveIntegerField("Отправлено", default=0)
+    failed_count = models.PositiveIntegerField("Ошибок отправки", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    updated_at = models.DateTimeField("Дата обновления", auto_now=True)
+    finished_at = models.DateTimeField("Дата завершения", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Рассылка о скидках"
+        verbose_name_plural = "Рассылки о скидках"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.get_status_display()})"
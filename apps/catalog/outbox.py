@@ -0,0 +1,27 @@
+from .analytics import DiscountAnalyticsService
+from .loyalty import ClientLoyaltyService
+from .services import CatalogCounterService
+
+
+def update_order_counters(payloads):
+    """
+    Обработчик outbox 'order.changed': обновляет счетчики заказов
+    предметов, тем, типов работ и сложностей
+    """
+    CatalogCounterService.apply_order_changes(payloads)
+
+
+def update_client_loyalty(payloads):
+    """
+    Обработчик outbox 'order.changed': обновляет агрегаты выполненных
+    заказов клиентов для правил скидок
+    """
+    ClientLoyaltyService.apply_order_changes(payloads)
+
+
+def update_discount_rollups(payloads):
+    """
+    Обработчик outbox 'order.changed': пересобирает дневные итоги скидок
+    за дни заказов, скидка которых изменилась после создания
+    """
+    DiscountAnalyticsService.apply_order_changes(payloads)
@@ -0,0 +1,272 @@
+"""
+Расчет стоимости заказов в памяти процесса.
+
+Базовые цены и нормы времени типов работ, множители сложностей и правила
+скидок загружаются один раз в массивы по слотам (номер строки в массиве)
+неизменяемого снимка PricingData и перезагружаются при смене версии
+каталога (CatalogSnapshotService).
+Множители дополнительных требований заранее сведены в таблицу всех
+комбинаций, произведения базовой цены и множителей запоминаются по слотам,
+поэтому на каждую цену остаются только срочность, скидка и округление.
+
+Расчет целиком в Decimal. Итоговая цена округляется до сотен рублей
+банковским округлением (как round()), без промежуточного float.
+"""
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_EVEN
+from itertools import product
+from django.conf import settings
+from django.utils import timezone
+from .models import WorkType, Complexity, DiscountRule
+
+ONE = Decimal('1')
+TWO = Decimal('2')
+HUNDRED = Decimal('100')
+KOPECK = Decimal('0.01')
+MICROSECONDS_PER_HOUR = 3600 * 10 ** 6
+
+# Множители дополнительных требований
+UNIQUENESS_MULTIPLIERS = (ONE, Decimal('1.1'), Decimal('1.2'))  # до 80%, выше 80%, выше 90%
+FORMATTING_MULTIPLIER = Decimal('1.1')
+MATERIALS_MULTIPLIER = Decimal('1.15')
+PRESENTATION_MULTIPLIER = Decimal('1.25')
+
+# Слот требований: уровень уникальности * 8 + оформление * 4 + материалы * 2 + презентация
+REQUIREMENT_MULTIPLIERS = tuple(
+    UNIQUENESS_MULTIPLIERS[uniqueness]
+    * (FORMATTING_MULTIPLIER if formatting else ONE)
+    * (MATERIALS_MULTIPLIER if materials else ONE)
+    * (PRESENTATION_MULTIPLIER if presentation else ONE)
+    for uniqueness, formatting, materials, presentation in product(range(3), (0, 1), (0, 1), (0, 1))
+)
+
+
+def requirements_slot(requirements):
+    """Слот таблицы REQUIREMENT_MULTIPLIERS для словаря дополнительных требований"""
+    if not requirements:
+        return 0
+    uniqueness = 0
+    if requirements.get('uniqueness'):
+        value = int(requirements['uniqueness'])
+        uniqueness = 2 if value > 90 else 1 if value > 80 else 0
+    return (
+        uniqueness * 8
+        + bool(requirements.get('formatting')) * 4
+        + bool(requirements.get('additional_materials')) * 2
+        + bool(requirements.get('presentation'))
+    )
+
+
+def urgency_multiplier(estimated_hours, time_left):
+    """
+    Множитель срочности: от 1 до 2, если до дедлайна меньше нормы
+    времени, 0.9 при запасе больше двух норм, иначе 1
+    """
+    if time_left <= timedelta(0):
+        raise ValueError("Дедлайн не может быть в прошлом")
+    if estimated_hours <= 0:
+        return ONE
+    micros = time_left // timedelta(microseconds=1)
+    norm = estimated_hours * MICROSECONDS_PER_HOUR
+    if micros < norm:
+        return min(TWO, max(ONE, TWO - Decimal(micros) / norm))
+    if micros > norm * 2:
+        return Decimal('0.9')
+    return ONE
+
+
+def round_price(price):
+    """Округление до сотен рублей"""
+    return (price / HUNDRED).quantize(ONE, rounding=ROUND_HALF_EVEN) * HUNDRED
+
+
+class PricingData:
+    """
+    Неизменяемый снимок данных каталога для расчета. Загрузка собирает
+    новый снимок целиком и подменяет им текущий, поэтому расчет, взявший
+    снимок, не видит наполовину загруженных массивов. Меняется только
+    таблица запомненных произведений, в которую пишут по одному ключу.
+    """
+    __slots__ = (
+        'work_type_slots', 'base_prices', 'estimated_hours', 'complexity_slots', 'multipliers',
+        'rules', 'products', 'version', 'loaded_at',
+    )
+
+    def __init__(self, work_types=(), complexities=(), rules=(), version=None, loaded_at=None):
+        self.work_type_slots = {pk: slot for slot, (pk, _, _) in enumerate(work_types)}  # id типа работы -> слот
+        self.base_prices = tuple(base_price for _, base_price, _ in work_types)
+        self.estimated_hours = tuple(estimated_time for _, _, estimated_time in work_types)
+        self.complexity_slots = {pk: slot for slot, (pk, _) in enumerate(complexities)}  # id сложности -> слот
+        self.multipliers = tuple(multiplier for _, multiplier in complexities)
+        self.rules = tuple(rules)  # (правило, id типов работ или None — для всех типов)
+        self.products = {}  # (слот типа, слот сложности, слот требований) -> цена без срочности
+        self.version = version
+        self.loaded_at = loaded_at
+
+    def has(self, work_type_id, complexity_id):
+        return work_type_id in self.work_type_slots and complexity_id in self.complexity_slots
+
+
+class PricingEngine:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.data = PricingData()
+        self.stale = True
+        self.checked_at = None
+
+    # Загрузка
+
+    def load(self, version=None):
+        """Загружает новый снимок данных каталога, подменяет им текущий и возвращает его"""
+        work_types = list(WorkType.objects.values_list('id', 'base_price', 'estimated_time'))
+        complexities = list(Complexity.objects.values_list('id', 'multiplier'))
+        rule_work_types = {}
+        for rule_id, work_type_id in DiscountRule.work_types.through.objects.values_list(
+            'discountrule_id', 'worktype_id'
+        ):
+            rule_work_types.setdefault(rule_id, set()).add(work_type_id)
+        rules = [
+            (rule, frozenset(rule_work_types[rule.id]) if rule.id in rule_work_types else None)
+            for rule in DiscountRule.objects.filter(is_active=True).order_by('-value')
+        ]
+        data = PricingData(work_types, complexities, rules, version, time.monotonic())
+
+        with self._lock:
+            self.data = data
+            self.stale = False
+        return data
+
+    def sync(self):
+        """
+        Перезагружает данные при смене версии каталога. Версия читается
+        не чаще раза в PRICING_ENGINE_CHECK_INTERVAL секунд; без Redis
+        данные перезагружаются раз в PRICING_ENGINE_RELOAD_INTERVAL.
+        """
+        from .services import CatalogSnapshotService
+
+        now = time.monotonic()
+        if not self.stale and self.checked_at is not None and now - self.checked_at < getattr(settings, 'PRICING_ENGINE_CHECK_INTERVAL', 5):
+            return
+        version = CatalogSnapshotService.get_version()
+        self.checked_at = now
+        data = self.data
+        expired = data.loaded_at is None or now - data.loaded_at > getattr(settings, 'PRICING_ENGINE_RELOAD_INTERVAL', 300)
+        if self.stale or version != data.version or expired:
+            self.load(version)
+
+    def invalidate(self):
+        with self._lock:
+            self.stale = True
+            self.checked_at = None
+
+    def snapshot(self, pairs):
+        """
+        Текущий снимок, в котором есть все пары (id типа работы, id сложности).
+        Тип работы или сложность, добавленные после загрузки, появляются
+        в снимке раньше, чем сменится прочитанная версия каталога, поэтому
+        при промахе данные один раз перезагружаются.
+        """
+        from .services import CatalogSnapshotService
+
+        data = self.data
+        if all(data.has(*pair) for pair in pairs):
+            return data
+        data = self.load(CatalogSnapshotService.get_version())
+        if all(data.has(*pair) for pair in pairs):
+            return data
+        raise ValueError("Неизвестный тип работы или сложность")
+
+    # Расчет
+
+    @staticmethod
+    def _product(data, work_type_slot, complexity_slot, requirements):
+        key = (work_type_slot, complexity_slot, requirements)
+        price = data.products.get(key)
+        if price is None:
+            price = data.base_prices[work_type_slot] * data.multipliers[complexity_slot] * REQUIREMENT_MULTIPLIERS[requirements]
+            data.products[key] = price
+        return price
+
+    def user_rules(self, user, now, data=None):
+        """Правила скидок, доступные пользователю, по его агрегатам ClientLoyalty"""
+        from .models import ClientLoyalty
+
+        if user is None:
+            return []
+        data = data or self.data
+        loyalty = ClientLoyalty.objects.filter(user_id=user.pk).values_list('completed_orders', 'total_spent').first()
+        orders, spent = loyalty or (0, Decimal('0'))
+        return [
+            (rule, work_types) for rule, work_types in data.rules
+            if rule.valid_from <= now
+            and (rule.valid_until is None or rule.valid_until >= now)
+            and orders >= rule.min_orders
+            and spent >= rule.min_total_spent
+        ]
+
+    @staticmethod
+    def best_discount(rules, work_type_id, price):
+        """Наибольшая скидка среди правил, действующих для типа работы: (сумма, правило)"""
+        best_amount, best_rule = Decimal('0'), None
+        for rule, work_types in rules:
+            if work_types is not None and work_type_id not in work_types:
+                continue
+            amount = rule.calculate_discount(price)
+            if amount > best_amount:
+                best_amount, best_rule = amount, rule
+        return best_amount, best_rule
+
+    def price_many(self, items, user=None, now=None):
+        """
+        Цены для последовательности (id типа работы, id сложности, дедлайн,
+        требования) за один проход. Скидки пользователя подбираются один раз
+        на весь проход.
+        """
+        self.sync()
+        items = list(items)
+        data = self.snapshot({(item[0], item[1]) for item in items})
+        now = now or timezone.now()
+        rules = self.user_rules(user, now, data)
+        prices = []
+        for work_type_id, complexity_id, deadline, requirements in items:
+            work_type_slot, complexity_slot = data.work_type_slots[work_type_id], data.complexity_slots[complexity_id]
+            price = self._product(data, work_type_slot, complexity_slot, requirements_slot(requirements))
+            price *= urgency_multiplier(data.estimated_hours[work_type_slot], deadline - now)
+            if rules:
+                price -= self.best_discount(rules, work_type_id, price)[0]
+            prices.append(round_price(price))
+        return prices
+
+    def quote(self, work_type_id, complexity_id, deadline, requirements=None, user=None, now=None):
+        """Цена с разбивкой по составляющим"""
+        self.sync()
+        data = self.snapshot([(work_type_id, complexity_id)])
+        now = now or timezone.now()
+        work_type_slot, complexity_slot = data.work_type_slots[work_type_id], data.complexity_slots[complexity_id]
+        base_price = data.base_prices[work_type_slot]
+        complexity_price = base_price * data.multipliers[complexity_slot]
+        urgency_price = complexity_price * urgency_multiplier(data.estimated_hours[work_type_slot], deadline - now)
+        price = urgency_price * REQUIREMENT_MULTIPLIERS[requirements_slot(requirements)]
+
+        discount_amount, rule = self.best_discount(self.user_rules(user, now, data), work_type_id, price)
+        result = {
+            'base_price': base_price,
+            'complexity_adjustment': (complexity_price - base_price).quantize(KOPECK),
+            'urgency_adjustment': (urgency_price - complexity_price).quantize(KOPECK),
+            'requirements_adjustment': (price - urgency_price).quantize(KOPECK),
+            'discount_amount': discount_amount.quantize(KOPECK),
+            'final_price': round_price(price - discount_amount),
+        }
+        if rule is not None:
+            result['discount_details'] = {
+                'name': rule.name,
+                'type': rule.discount_type,
+                'value': rule.value,
+                'amount': discount_amount.quantize(KOPECK),
+            }
+        return result
+
+
+pricing_engine = PricingEngine()
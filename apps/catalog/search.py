@@ -0,0 +1,315 @@
+"""
+Поисковый индекс каталога в памяти процесса.
+
+Инвертированный индекс по основам слов (стеммер Портера для русского языка)
+из названий, ключевых слов и описаний тем и предметов. Поддерживает поиск
+с учетом морфологии, автодополнение по префиксу последнего слова
+и исправление опечаток (кандидаты по триграммам, расстояние Левенштейна).
+
+Индекс синхронизируется с базой по версии снимка каталога
+(CatalogSnapshotService): при смене версии переиндексируются только
+темы и предметы, измененные с момента прошлой синхронизации.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .models import Subject, Topic
+
+_WORD = re.compile(r'\w+')
+_RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+_PERFECTIVE_GERUND = re.compile(r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+_REFLEXIVE = re.compile(r'(ся|сь)$')
+_ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$'
+)
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+_DERIVATIONAL = re.compile(r'[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+
+# Предлоги и союзы не индексируются и не участвуют в запросе
+STOP_WORDS = frozenset('и в во на по с со к ко о об от до для из за у а но или не при про'.split())
+
+# Вес поля документа в ранжировании
+FIELD_WEIGHTS = {'name': 3.0, 'keywords': 2.0, 'subject': 1.0, 'description': 0.5}
+# Множитель совпадения: точное, по префиксу, с опечаткой
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+# Максимальный интервал между синхронизациями, сек
+SYNC_INTERVAL = 60
+
+
+def stem(word):
+    """Основа слова по алгоритму Snowball для русского языка; латиница не изменяется"""
+    word = word.lower().replace('ё', 'е')
+    match = _RV.match(word)
+    if match is None:
+        return word
+    head, rv = match.groups()
+
+    stripped = _PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = _REFLEXIVE.sub('', rv, 1)
+        stripped = _ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = _PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = _VERB.sub('', rv, 1)
+            rv = _NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if _DERIVATIONAL.search(rv):
+        rv = re.sub(r'ость?$', '', rv)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = re.sub(r'(ейше|ейш)$', '', rv)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return head + rv
+
+
+def tokenize(text):
+    return [stem(word) for word in _WORD.findall((text or '').lower()) if word not in STOP_WORDS]
+
+
+def _trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _distance(a, b, limit):
+    """Расстояние Левенштейна с отсечением: больше limit -> limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CatalogSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.version = None
+        self.synced_at = None
+
+    def _reset(self):
+        self.documents = {}  # (тип, id) -> {'terms': {основа: вес}, 'fields': {поле: основы}, ...}
+        self.postings = defaultdict(dict)  # основа -> {(тип, id): вес}
+        self.terms = []  # отсортированные основы для поиска по префиксу
+        self.trigrams = defaultdict(set)  # триграмма -> основы
+
+    # Изменение индекса
+
+    def _add_term(self, term):
+        insort(self.terms, term)
+        for gram in _trigrams(term):
+            self.trigrams[gram].add(term)
+
+    def _drop_term(self, term):
+        del self.postings[term]
+        index = bisect_left(self.terms, term)
+        if index < len(self.terms) and self.terms[index] == term:
+            del self.terms[index]
+        for gram in _trigrams(term):
+            self.trigrams[gram].discard(term)
+
+    def remove(self, key):
+        with self._lock:
+            document = self.documents.pop(key, None)
+            if document is None:
+                return
+            for term in document['terms']:
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(key, None)
+                if not postings:
+                    self._drop_term(term)
+
+    def add(self, key, fields, **meta):
+        """Индексирует документ; fields — {поле: текст} с весами из FIELD_WEIGHTS"""
+        terms = {}
+        field_terms = {}
+        for field, text in fields.items():
+            field_terms[field] = frozenset(tokenize(text))
+            for term in field_terms[field]:
+                terms[term] = max(terms.get(term, 0), FIELD_WEIGHTS[field])
+        with self._lock:
+            self.remove(key)
+            self.documents[key] = {'terms': terms, 'fields': field_terms, **meta}
+            for term, weight in terms.items():
+                if term not in self.postings:
+                    self._add_term(term)
+                self.postings[term][key] = weight
+
+    def index_topic(self, topic, subject_name):
+        self.add(
+            ('topic', topic.id),
+            {
+                'name': topic.name,
+                'keywords': topic.keywords.replace(',', ' '),
+                'subject': subject_name,
+                'description': topic.description,
+            },
+            id=topic.id,
+            name=topic.name,
+            subject_id=topic.subject_id,
+            subject_name=subject_name,
+            is_active=topic.is_active,
+        )
+
+    def index_subject(self, subject):
+        self.add(
+            ('subject', subject.id),
+            {'name': subject.name, 'description': subject.description},
+            id=subject.id,
+            name=subject.name,
+            is_active=subject.is_active,
+        )
+
+    # Синхронизация с базой
+
+    def sync(self):
+        """Приводит индекс к текущей версии каталога"""
+        from .services import CatalogSnapshotService
+
+        version = CatalogSnapshotService.get_version()
+        if version == self.version and not self._stale():
+            return
+        with self._lock:
+            if version == self.version and not self._stale():
+                return
+            started = timezone.now()
+            if self.synced_at is None:
+                self._reset()
+                subjects = Subject.objects.all()
+                topics = Topic.objects.select_related('subject')
+            else:
+                # Запас на расхождение часов и незавершенные транзакции
+                since = self.synced_at - timedelta(seconds=5)
+                subjects = Subject.objects.filter(updated_at__gte=since)
+                topics = Topic.objects.select_related('subject').filter(
+                    Q(updated_at__gte=since) | Q(subject__updated_at__gte=since)
+                )
+                self._remove_deleted()
+
+            for subject in subjects:
+                self.index_subject(subject)
+            for topic in topics:
+                self.index_topic(topic, topic.subject.name)
+            self.version = version
+            self.synced_at = started
+
+    def _stale(self):
+        # Без Redis версия не меняется: изменения подхватываются по времени
+        return self.synced_at is None or timezone.now() - self.synced_at > timedelta(seconds=SYNC_INTERVAL)
+
+    def _remove_deleted(self):
+        existing = {
+            'topic': set(Topic.objects.values_list('id', flat=True)),
+            'subject': set(Subject.objects.values_list('id', flat=True)),
+        }
+        for key in [key for key in self.documents if key[1] not in existing[key[0]]]:
+            self.remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.version = None
+            self.synced_at = None
+
+    # Поиск
+
+    def _expand(self, token, prefix):
+        """Основы индекса, соответствующие слову запроса, с множителем совпадения"""
+        matches = {}
+        if token in self.postings:
+            matches[token] = EXACT
+        if prefix:
+            index = bisect_left(self.terms, token)
+            while index < len(self.terms) and self.terms[index].startswith(token):
+                matches.setdefault(self.terms[index], PREFIX)
+                index += 1
+        if not matches and len(token) >= 4:
+            limit = 1 if len(token) <= 6 else 2
+            candidates = set()
+            for gram in _trigrams(token):
+                candidates |= self.trigrams.get(gram, set())
+            for term in candidates:
+                if _distance(token, term, limit) <= limit:
+                    matches[term] = FUZZY
+        return matches
+
+    def search(self, query, kind='topic', limit=20, prefix=True, active_only=False, fields=None):
+        """
+        Ищет документы, содержащие все слова запроса. Последнее слово при
+        prefix=True сопоставляется и как префикс. fields ограничивает поиск
+        полями документа (например, ('keywords',)). Возвращает список
+        метаданных документов по убыванию релевантности.
+        """
+        self.sync()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores = None
+            for position, token in enumerate(tokens):
+                is_last = prefix and position == len(tokens) - 1
+                token_scores = defaultdict(float)
+                for term, factor in self._expand(token, is_last).items():
+                    for key, weight in self.postings[term].items():
+                        if key[0] != kind:
+                            continue
+                        if fields is not None:
+                            document_fields = self.documents[key]['fields']
+                            weights = [FIELD_WEIGHTS[field] for field in fields if term in document_fields.get(field, ())]
+                            if not weights:
+                                continue
+                            weight = max(weights)
+                        token_scores[key] = max(token_scores[key], weight * factor)
+                if scores is None:
+                    scores = dict(token_scores)
+                else:
+                    scores = {key: scores[key] + score for key, score in token_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+            documents = [
+                (score, self.documents[key]) for key, score in scores.items()
+                if not active_only or self.documents[key]['is_active']
+            ]
+        documents.sort(key=lambda item: (-item[0], item[1]['name']))
+        return [
+            {field: value for field, value in document.items() if field not in ('terms', 'fields')}
+            for _, document in documents[:limit]
+        ]
+
+    def search_ids(self, query, kind='topic', limit=None, fields=None):
+        """Идентификаторы найденных документов по убыванию релевантности (limit=None — все)"""
+        return [document['id'] for document in self.search(query, kind=kind, limit=limit, fields=fields)]
+
+
+catalog_index = CatalogSearchIndex()
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Subject, Topic, WorkType, Complexity, SubjectCategory, DiscountRule
+from .models import Subject, Topic, WorkType, Complexity, SubjectCategory, DiscountRule, ClientLoyalty
 from django.utils import timezone
 
 class SubjectCategorySerializer(serializers.ModelSerializer):
@@ -153,4 +153,13 @@ class DiscountProgressSerializer(serializers.Serializer):
                 raise serializers.ValidationError(
                     "Дата окончания должна быть позже даты начала"
                 )
-        return data 
\ No newline at end of file
+        return data 
+
+class EligibleClientSerializer(serializers.ModelSerializer):
+    """Клиент из сегмента правила скидки"""
+    username = serializers.CharField(source='user.username', read_only=True)
+    email = serializers.EmailField(source='user.email', read_only=True)
+
+    class Meta:
+        model = ClientLoyalty
+        fields = ['user_id', 'username', 'email', 'completed_orders', 'total_spent']
@@ -1,289 +1,278 @@
-from decimal import Decimal
 from django.utils import timezone
-from datetime import timedelta
 from django.core.cache import cache
-from .models import WorkType, Complexity, DiscountRule
-from django.db import models
+import hashlib
+import json
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import SubjectCategory, Subject, Topic, WorkType, Complexity
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from .pricing import REQUIREMENT_MULTIPLIERS, pricing_engine, requirements_slot, urgency_multiplier
 
 class PricingService:
-    CACHE_TTL = 3600  # Время жизни кэша в секундах (1 час)
-    
-    @staticmethod
-    def _get_cache_key(work_type_id, complexity_id, deadline_timestamp, requirements_hash=None, user_id=None):
-        """Генерирует ключ кэша для расчета цены"""
-        key_parts = [
-            f"price",
-            f"wt_{work_type_id}",
-            f"cx_{complexity_id}",
-            f"dl_{int(deadline_timestamp)}"
-        ]
-        if requirements_hash:
-            key_parts.append(f"req_{requirements_hash}")
-        if user_id:
-            key_parts.append(f"user_{user_id}")
-        return ":".join(key_parts)
+    """
+    Расчет стоимости заказа: базовая цена типа работы, множитель сложности,
+    срочность, дополнительные требования и лучшая скидка пользователя.
+    Считает PricingEngine по данным каталога в памяти процесса.
+    """
 
     @staticmethod
-    def _hash_requirements(requirements):
-        """Создает хэш из дополнительных требований"""
-        if not requirements:
-            return None
-        
-        # Сортируем ключи для обеспечения одинакового хэша
-        # при одинаковых требованиях в разном порядке
-        sorted_items = sorted(requirements.items())
-        return ":".join(f"{k}={v}" for k, v in sorted_items)
+    def calculate_order_price(work_type, complexity, deadline, user=None, additional_requirements=None):
+        """Стоимость заказа, округленная до сотен рублей"""
+        return pricing_engine.price_many(
+            [(work_type.id, complexity.id, deadline, additional_requirements)],
+            user=user
+        )[0]
 
     @staticmethod
-    def calculate_order_price(work_type, complexity, deadline, user=None, additional_requirements=None):
+    def get_price_breakdown(work_type, complexity, deadline, user=None, additional_requirements=None):
         """
-        Рассчитывает стоимость заказа с учетом различных факторов:
-        - Базовая цена типа работы
-        - Множитель сложности
-        - Срочность (дедлайн)
-        - Дополнительные требования
-        - Скидки пользователя
+        Возвращает подробную разбивку цены по компонентам
         """
-        # Пробуем получить результат из кэша
-        requirements_hash = PricingService._hash_requirements(additional_requirements)
-        user_id = user.id if user else None
-        cache_key = PricingService._get_cache_key(
+        return pricing_engine.quote(
             work_type.id,
             complexity.id,
-            deadline.timestamp(),
-            requirements_hash,
-            user_id
+            deadline,
+            requirements=additional_requirements,
+            user=user
         )
-        
-        cached_result = cache.get(cache_key)
-        if cached_result is not None:
-            return Decimal(str(cached_result))
-        
-        # Если в кэше нет, рассчитываем
-        # Базовая цена
-        base_price = work_type.base_price
-        
-        # Применяем множитель сложности
-        price = base_price * complexity.multiplier
-        
-        # Рассчитываем коэффициент срочности
-        urgency_multiplier = PricingService._calculate_urgency_multiplier(
-            work_type.estimated_time,
-            deadline
-        )
-        price *= urgency_multiplier
-        
-        # Учитываем дополнительные требования
-        if additional_requirements:
-            requirements_multiplier = PricingService._calculate_requirements_multiplier(
-                additional_requirements
-            )
-            price *= requirements_multiplier
-
-        # Применяем скидки, если есть пользователь
-        discount_info = None
-        if user:
-            price, discount_info = PricingService._apply_discounts(
-                price,
-                work_type,
-                user
-            )
-        
-        # Округляем до сотен рублей
-        price = Decimal(round(float(price) / 100.0) * 100)
-        
-        # Сохраняем в кэш
-        cache.set(cache_key, str(price), PricingService.CACHE_TTL)
-        
-        return price
 
     @staticmethod
-    def get_price_breakdown(work_type, complexity, deadline, user=None, additional_requirements=None):
+    def _calculate_urgency_multiplier(estimated_time, deadline):
+        """Множитель срочности для нормы времени (часов) и дедлайна"""
+        return urgency_multiplier(estimated_time, deadline - timezone.now())
+
+    @staticmethod
+    def _calculate_requirements_multiplier(requirements):
+        """Множитель дополнительных требований (уникальность, оформление, материалы, презентация)"""
+        return REQUIREMENT_MULTIPLIERS[requirements_slot(requirements)]
+
+    @staticmethod
+    def invalidate_cache():
+        """Сбрасывает данные расчета цен: в этом процессе сразу, в остальных — по версии каталога"""
+        pricing_engine.invalidate()
+        CatalogSnapshotService.bump_version()
+
+class CatalogCounterService:
+    """
+    Денормализованные счетчики каталога. Счетчики заказов меняются
+    инкрементально по событиям 'order.changed', счетчики тем и экспертов
+    предмета пересчитываются при изменении тем и специализаций.
+    reconcile() сверяет все счетчики с фактическими данными.
+    """
+
+    # Связь заказа -> модель каталога, в которой считаются заказы
+    ORDER_DIMENSIONS = (
+        ('subject', Subject),
+        ('topic', Topic),
+        ('work_type', WorkType),
+        ('complexity', Complexity),
+    )
+
+    @staticmethod
+    def apply_order_changes(payloads):
         """
-        Возвращает подробную разбивку цены по компонентам
+        Применяет пачку событий 'order.changed': изменения суммируются
+        по строкам каталога, затем каждая строка обновляется одним UPDATE
         """
-        # Пробуем получить разбивку из кэша
-        requirements_hash = PricingService._hash_requirements(additional_requirements)
-        user_id = user.id if user else None
-        cache_key = f"breakdown:{PricingService._get_cache_key(work_type.id, complexity.id, deadline.timestamp(), requirements_hash, user_id)}"
-        
-        cached_result = cache.get(cache_key)
-        if cached_result is not None:
-            return {k: Decimal(str(v)) for k, v in cached_result.items()}
-        
-        # Если в кэше нет, рассчитываем
-        base_price = work_type.base_price
-        complexity_price = base_price * complexity.multiplier
-        
-        urgency_multiplier = PricingService._calculate_urgency_multiplier(
-            work_type.estimated_time,
-            deadline
+        deltas = defaultdict(lambda: [0, 0])
+        tracked = {'status'} | {f'{link}_id' for link, _ in CatalogCounterService.ORDER_DIMENSIONS}
+
+        for payload in payloads:
+            created = payload['created']
+            changed = set(payload['changed_fields'])
+            if not created and not changed & tracked:
+                continue
+            previous = payload['previous']
+            is_completed = payload['status'] == 'completed'
+            was_completed = previous.get('status', payload['status']) == 'completed'
+
+            for link, model in CatalogCounterService.ORDER_DIMENSIONS:
+                field = f'{link}_id'
+                current_id = payload.get(field)
+                if current_id is not None:
+                    delta = deltas[(model, current_id)]
+                    delta[0] += 1
+                    delta[1] += is_completed
+                if created:
+                    continue
+                previous_id = previous.get(field) if field in changed else current_id
+                if previous_id is not None:
+                    delta = deltas[(model, previous_id)]
+                    delta[0] -= 1
+                    delta[1] -= was_completed
+
+        # Фиксированный порядок обновления строк исключает взаимоблокировки
+        for (model, pk), (orders, completed) in sorted(
+            deltas.items(), key=lambda item: (item[0][0]._meta.label, item[0][1])
+        ):
+            if orders or completed:
+                model.objects.filter(pk=pk).update(
+                    orders_count=Greatest(F('orders_count') + orders, Value(0)),
+                    completed_orders_count=Greatest(F('completed_orders_count') + completed, Value(0))
+                )
+
+    @staticmethod
+    def refresh_subject_membership(subject_id):
+        """Пересчитывает количество тем и экспертов предмета"""
+        from apps.experts.models import Specialization
+
+        topics = Topic.objects.filter(subject_id=subject_id).aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True))
         )
-        urgency_price = complexity_price * urgency_multiplier
-        
-        requirements_price = Decimal('0')
-        if additional_requirements:
-            requirements_multiplier = PricingService._calculate_requirements_multiplier(
-                additional_requirements
-            )
-            requirements_price = urgency_price * (requirements_multiplier - 1)
-        
-        # Применяем скидки
-        discount_amount = Decimal('0')
-        discount_details = None
-        if user:
-            final_price = urgency_price + requirements_price
-            discounted_price, discount_info = PricingService._apply_discounts(
-                final_price,
-                work_type,
-                user
-            )
-            if discount_info:
-                discount_amount = final_price - discounted_price
-                discount_details = discount_info
-        else:
-            discounted_price = urgency_price + requirements_price
-        
-        # Округляем до сотен рублей
-        final_price = Decimal(round(float(discounted_price) / 100.0) * 100)
-        
-        result = {
-            'base_price': base_price,
-            'complexity_adjustment': complexity_price - base_price,
-            'urgency_adjustment': urgency_price - complexity_price,
-            'requirements_adjustment': requirements_price,
-            'discount_amount': discount_amount,
-            'final_price': final_price
-        }
-        
-        if discount_details:
-            result['discount_details'] = discount_details
-        
-        # Сохраняем в кэш
-        cache.set(
-            cache_key,
-            {k: str(v) if isinstance(v, Decimal) else v for k, v in result.items()},
-            PricingService.CACHE_TTL
+        experts = Specialization.objects.filter(subject_id=subject_id).aggregate(
+            total=Count('id'),
+            verified=Count('id', filter=Q(is_verified=True))
+        )
+        Subject.objects.filter(pk=subject_id).update(
+            topics_count=topics['total'],
+            active_topics_count=topics['active'],
+            experts_count=experts['total'],
+            verified_experts_count=experts['verified']
         )
-        
-        return result
 
     @staticmethod
-    def _calculate_urgency_multiplier(estimated_time, deadline):
-        """
-        Рассчитывает множитель срочности на основе:
-        - Стандартного времени выполнения
-        - Фактического времени до дедлайна
-        """
-        now = timezone.now()
-        hours_until_deadline = (deadline - now).total_seconds() / 3600
-        
-        # Проверяем, что дедлайн не в прошлом
-        if hours_until_deadline <= 0:
-            raise ValueError("Дедлайн не может быть в прошлом")
-        
-        # Проверяем, что estimated_time больше 0
-        if estimated_time <= 0:
-            return Decimal('1.0')
-        
-        # Если времени меньше стандартного
-        if hours_until_deadline < estimated_time:
-            # Максимальный множитель 2.0 при критически малом времени
-            urgency = 2.0 - (hours_until_deadline / estimated_time)
-            return Decimal(min(2.0, max(1.0, urgency)))
-        
-        # Если времени больше стандартного, возможна небольшая скидка
-        if hours_until_deadline > estimated_time * 2:
-            # Минимальный множитель 0.9 при большом запасе времени
-            return Decimal('0.9')
-        
-        return Decimal('1.0')
+    def _count(queryset, link):
+        """Коррелированный подзапрос количества строк, связанных с OuterRef('pk')"""
+        rows = queryset.filter(**{link: OuterRef('pk')}).order_by().values(link)
+        return Coalesce(Subquery(rows.annotate(v=Count('pk')).values('v')), 0)
 
     @staticmethod
-    def _calculate_requirements_multiplier(requirements):
-        """
-        Рассчитывает множитель на основе дополнительных требований:
-        - Уникальность текста
-        - Специальное форматирование
-        - Дополнительные материалы
-        и т.д.
-        """
-        multiplier = Decimal('1.0')
-        
-        if requirements.get('uniqueness'):
-            # Повышенная уникальность текста
-            uniqueness = int(requirements['uniqueness'])
-            if uniqueness > 90:
-                multiplier *= Decimal('1.2')
-            elif uniqueness > 80:
-                multiplier *= Decimal('1.1')
-        
-        if requirements.get('formatting'):
-            # Специальные требования к форматированию
-            multiplier *= Decimal('1.1')
-        
-        if requirements.get('additional_materials'):
-            # Необходимость изучения дополнительных материалов
-            multiplier *= Decimal('1.15')
-        
-        if requirements.get('presentation'):
-            # Требуется презентация
-            multiplier *= Decimal('1.25')
-        
-        return multiplier
+    def _actual_counters(link, model):
+        from apps.experts.models import Specialization
+        from apps.orders.models import Order
+
+        count = CatalogCounterService._count
+        counters = {
+            'orders_count': count(Order.objects.all(), link),
+            'completed_orders_count': count(Order.objects.filter(status='completed'), link),
+        }
+        if model is Subject:
+            # Специализация уникальна для пары эксперт-предмет
+            counters.update(
+                topics_count=count(Topic.objects.all(), 'subject'),
+                active_topics_count=count(Topic.objects.filter(is_active=True), 'subject'),
+                experts_count=count(Specialization.objects.all(), 'subject'),
+                verified_experts_count=count(Specialization.objects.filter(is_verified=True), 'subject'),
+            )
+        return counters
 
     @staticmethod
-    def _apply_discounts(price, work_type, user):
+    def reconcile():
         """
-        Применяет подходящие скидки к цене
-        Возвращает (цена_со_скидкой, информация_о_скидке)
+        Сверяет счетчики каталога с фактическими данными и исправляет
+        расхождения. Возвращает количество исправленных строк.
         """
-        # Получаем все активные скидки для данного типа работы
-        discounts = DiscountRule.objects.filter(
-            models.Q(work_types=work_type) | models.Q(work_types=None),
-            is_active=True
-        ).order_by('-value')  # Сначала проверяем большие скидки
-        
-        best_discount = None
-        max_discount_amount = Decimal('0')
-        
-        for discount in discounts:
-            if discount.is_valid_for_user(user):
-                discount_amount = discount.calculate_discount(price)
-                if discount_amount > max_discount_amount:
-                    max_discount_amount = discount_amount
-                    best_discount = discount
-        
-        if best_discount:
-            discounted_price = price - max_discount_amount
-            discount_info = {
-                'name': best_discount.name,
-                'type': best_discount.discount_type,
-                'value': best_discount.value,
-                'amount': max_discount_amount
-            }
-            return discounted_price, discount_info
-        
-        return price, None
+        fixed = 0
+        for link, model in CatalogCounterService.ORDER_DIMENSIONS:
+            counters = CatalogCounterService._actual_counters(link, model)
+            mismatch = Q()
+            for field in counters:
+                mismatch |= ~Q(**{field: F(f'actual_{field}')})
+            rows = model.objects.annotate(
+                **{f'actual_{field}': expression for field, expression in counters.items()}
+            ).filter(mismatch).values('pk', *(f'actual_{field}' for field in counters))
+
+            with transaction.atomic():
+                for row in rows:
+                    model.objects.filter(pk=row['pk']).update(
+                        **{field: row[f'actual_{field}'] for field in counters}
+                    )
+                    fixed += 1
+        return fixed
+
+
+CATALOG_VERSION_KEY = 'catalog_snapshot_version'
+_local_snapshot = {}
+
+
+class CatalogSnapshotService:
+    """
+    Снимок активного каталога для формы заказа: категории -> предметы -> темы,
+    типы работ и сложности одним JSON. Готовый JSON хранится в Redis и в памяти
+    процесса под номером версии; версия увеличивается при сохранении
+    или удалении любой модели каталога.
+    """
 
     @staticmethod
-    def invalidate_cache(work_type_id=None, complexity_id=None):
+    def get_version():
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version is None:
+            # Начальная версия от времени: после очистки Redis номера не повторяются
+            cache.add(CATALOG_VERSION_KEY, int(time.time()), None)
+            version = cache.get(CATALOG_VERSION_KEY) or 0
+        return version
+
+    @staticmethod
+    def bump_version():
+        try:
+            cache.incr(CATALOG_VERSION_KEY)
+        except ValueError:
+            cache.set(CATALOG_VERSION_KEY, int(time.time()), None)
+
+    @staticmethod
+    def etag(body):
         """
-        Инвалидирует кэш цен для указанного типа работы и/или сложности.
-        Если параметры не указаны, инвалидирует весь кэш цен.
+        ETag по содержимому снимка, а не по версии: без Redis версия не
+        читается и не меняется, а снимок в памяти пересобирается
         """
-        if work_type_id is None and complexity_id is None:
-            # Инвалидируем весь кэш цен
-            cache.delete_pattern("price:*")
-            cache.delete_pattern("breakdown:price:*")
-        else:
-            # Инвалидируем только конкретные записи
-            pattern_parts = ["price"]
-            if work_type_id:
-                pattern_parts.append(f"wt_{work_type_id}")
-            if complexity_id:
-                pattern_parts.append(f"cx_{complexity_id}")
-            pattern = ":".join(pattern_parts) + "*"
-            
-            cache.delete_pattern(pattern)
-            cache.delete_pattern(f"breakdown:{pattern}") 
\ No newline at end of file
+        return f'"catalog-{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+    @staticmethod
+    def build():
+        """Собирает дерево каталога пятью запросами без аннотаций"""
+        topics = defaultdict(list)
+        for topic in Topic.objects.filter(is_active=True).order_by('name').values(
+            'id', 'subject_id', 'name', 'slug', 'complexity_level'
+        ):
+            topics[topic.pop('subject_id')].append(topic)
+
+        subjects = defaultdict(list)
+        for subject in Subject.objects.filter(is_active=True).order_by('name').values(
+            'id', 'category_id', 'name', 'slug', 'icon', 'min_price'
+        ):
+            subject['topics'] = topics.get(subject['id'], [])
+            subjects[subject.pop('category_id')].append(subject)
+
+        categories = [
+            dict(category, subjects=subjects.get(category['id'], []))
+            for category in SubjectCategory.objects.order_by('order', 'name').values('id', 'name', 'slug')
+        ]
+        return {
+            'categories': [category for category in categories if category['subjects']],
+            'uncategorized_subjects': subjects.get(None, []),
+            'work_types': list(
+                WorkType.objects.filter(is_active=True).order_by('name').values(
+                    'id', 'name', 'slug', 'base_price', 'estimated_time', 'icon'
+                )
+            ),
+            'complexities': list(
+                Complexity.objects.filter(is_active=True).order_by('multiplier').values(
+                    'id', 'name', 'slug', 'multiplier', 'icon'
+                )
+            ),
+        }
+
+    @staticmethod
+    def get_snapshot(version=None):
+        """Возвращает (версия, JSON в байтах) текущего снимка"""
+        version = version if version is not None else CatalogSnapshotService.get_version()
+        local = _local_snapshot.get('current')
+        if local and local[0] == version and local[2] > time.monotonic():
+            return version, local[1]
+
+        key = f'catalog_snapshot:{version}'
+        body = cache.get(key)
+        if body is None:
+            data = {'version': version, **CatalogSnapshotService.build()}
+            body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+            cache.set(key, body, getattr(settings, 'CATALOG_SNAPSHOT_TIMEOUT', 60 * 60 * 24))
+
+        # Локальная копия живет ограниченное время на случай недоступности Redis
+        expires = time.monotonic() + getattr(settings, 'CATALOG_SNAPSHOT_LOCAL_TIMEOUT', 30)
+        _local_snapshot['current'] = (version, body, expires)
+        return version, body
@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .models import SubjectCategory, Subject, Topic, WorkType, Complexity, DiscountRule
+from .services import CatalogCounterService, CatalogSnapshotService
+
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+def update_subject_topic_counters(sender, instance, **kwargs):
+    """Пересчитывает количество тем предмета"""
+    CatalogCounterService.refresh_subject_membership(instance.subject_id)
+
+
+@receiver(post_save, sender=SubjectCategory)
+@receiver(post_delete, sender=SubjectCategory)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=WorkType)
+@receiver(post_delete, sender=WorkType)
+@receiver(post_save, sender=Complexity)
+@receiver(post_delete, sender=Complexity)
+@receiver(post_save, sender=DiscountRule)
+@receiver(post_delete, sender=DiscountRule)
+@receiver(m2m_changed, sender=DiscountRule.work_types.through)
+def bump_catalog_snapshot(sender, **kwargs):
+    """
+    Новая версия каталога после фиксации изменения. По версии обновляются
+    снимок каталога, поисковый индекс и данные расчета цен (правила скидок
+    в снимок не входят, но нужны PricingEngine).
+    """
+    if kwargs.get('action', 'post').startswith('pre'):
+        return
+    transaction.on_commit(CatalogSnapshotService.bump_version)
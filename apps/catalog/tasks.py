@@ -0,0 +1,65 @@
+from celery import shared_task
+from django.conf import settings
+import logging
+from .analytics import DiscountAnalyticsService
+from .campaigns import DiscountCampaignService
+from .loyalty import ClientLoyaltyService
+from .services import CatalogCounterService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def reconcile_catalog_counters(self):
+    """Сверяет денормализованные счетчики каталога с фактическими данными"""
+    try:
+        fixed = CatalogCounterService.reconcile()
+        if fixed:
+            logger.warning(f"Исправлены счетчики каталога: {fixed} строк")
+    except Exception as e:
+        logger.error(f"Ошибка сверки счетчиков каталога: {str(e)}")
+        raise self.retry(exc=e, countdown=600)
+    return fixed
+
+
+@shared_task(bind=True)
+def rollup_discount_usage(self, days=2):
+    """Пересобирает дневные итоги скидок за последние дни (включая текущий)"""
+    try:
+        return DiscountAnalyticsService.rollup_recent(days)
+    except Exception as e:
+        logger.error(f"Ошибка расчета итогов скидок: {str(e)}")
+        raise self.retry(exc=e, countdown=600)
+
+
+@shared_task(bind=True)
+def reconcile_client_loyalty(self):
+    """Сверяет агрегаты лояльности клиентов с выполненными заказами"""
+    try:
+        fixed = ClientLoyaltyService.reconcile()
+        if fixed:
+            logger.warning(f"Исправлены агрегаты лояльности клиентов: {fixed} строк")
+    except Exception as e:
+        logger.error(f"Ошибка сверки агрегатов лояльности: {str(e)}")
+        raise self.retry(exc=e, countdown=600)
+    return fixed
+
+
+@shared_task(bind=True)
+def send_discount_campaign(self, campaign_id):
+    """
+    Отправляет рассылку о скидках. По истечении DISCOUNT_CAMPAIGN_TIME_LIMIT
+    продолжение ставится отдельной задачей, чтобы не занимать воркер надолго.
+    """
+    try:
+        campaign = DiscountCampaignService.run(
+            campaign_id,
+            time_limit=getattr(settings, 'DISCOUNT_CAMPAIGN_TIME_LIMIT', 600)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка рассылки о скидках #{campaign_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=300)
+
+    if campaign is not None and campaign.status == 'paused':
+        send_discount_campaign.delay(campaign_id)
+    return campaign.sent_count if campaign else 0
@@ -1,3 +1,473 @@
-from django.test import TestCase
+import smtplib
+from datetime import datetime, time, timedelta
+from unittest import mock
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.core.outbox import OutboxService
+from apps.orders.models import Order
+from .campaigns import DiscountCampaignService
+from .analytics import DiscountAnalyticsService, build_sketch, estimate_cardinality
+from .loyalty import ClientLoyaltyService, DiscountSegmentService
+from .models import SubjectCategory, Subject, Topic, WorkType, Complexity, DiscountRule, ClientLoyalty, DiscountCampaign
+from .pricing import pricing_engine, round_price
+from .search import catalog_index, stem
+from .services import CatalogCounterService, PricingService, _local_snapshot
 
-# Create your tests here.
+User = get_user_model()
+
+
+class CatalogCounterTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.subject = Subject.objects.create(name='Математика', slug='math')
+        self.algebra = Topic.objects.create(subject=self.subject, name='Алгебра', slug='algebra')
+        self.geometry = Topic.objects.create(subject=self.subject, name='Геометрия', slug='geometry', is_active=False)
+        self.work_type = WorkType.objects.create(name='Курсовая', slug='coursework')
+
+    def _refresh(self):
+        for obj in (self.subject, self.algebra, self.geometry, self.work_type):
+            obj.refresh_from_db()
+
+    def test_topic_counters_follow_topics(self):
+        self.subject.refresh_from_db()
+        self.assertEqual((self.subject.topics_count, self.subject.active_topics_count), (2, 1))
+
+    def test_order_counters_follow_order_transitions(self):
+        order = Order.objects.create(
+            client=self.client_user, subject=self.subject, topic=self.algebra, work_type=self.work_type
+        )
+        order.status = 'completed'
+        order.save()
+        order.topic = self.geometry
+        order.save()
+        OutboxService.relay()
+
+        self._refresh()
+        self.assertEqual((self.subject.orders_count, self.subject.completed_orders_count), (1, 1))
+        self.assertEqual((self.algebra.orders_count, self.algebra.completed_orders_count), (0, 0))
+        self.assertEqual((self.geometry.orders_count, self.geometry.completed_orders_count), (1, 1))
+        self.assertEqual(self.work_type.orders_count, 1)
+
+    def test_retried_event_is_counted_once(self):
+        from apps.core.outbox import _handlers_cache
+
+        _handlers_cache.clear()
+        self.addCleanup(_handlers_cache.clear)
+        Order.objects.create(client=self.client_user, subject=self.subject, topic=self.algebra)
+        # Другой обработчик того же события один раз падает, событие повторяется
+        with mock.patch('apps.users.outbox.partner_accounting', side_effect=[ValueError('сбой'), None]):
+            self.assertEqual(OutboxService.relay(), {'processed': 0, 'failed': 1})
+            self.assertEqual(OutboxService.relay(), {'processed': 1, 'failed': 0})
+
+        self._refresh()
+        self.assertEqual(self.subject.orders_count, 1)
+        self.assertEqual(self.algebra.orders_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        Order.objects.create(client=self.client_user, subject=self.subject, topic=self.algebra)
+        OutboxService.relay()
+        Subject.objects.filter(pk=self.subject.pk).update(orders_count=10, experts_count=3)
+
+        self.assertEqual(CatalogCounterService.reconcile(), 1)
+        self.assertEqual(CatalogCounterService.reconcile(), 0)
+        self._refresh()
+        self.assertEqual((self.subject.orders_count, self.subject.experts_count), (1, 0))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogSnapshotTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        _local_snapshot.clear()
+        self.addCleanup(_local_snapshot.clear)
+        category = SubjectCategory.objects.create(name='Точные науки', slug='exact')
+        self.subject = Subject.objects.create(name='Математика', slug='math', category=category)
+        Topic.objects.create(subject=self.subject, name='Алгебра', slug='algebra')
+        Topic.objects.create(subject=self.subject, name='Архив', slug='archive', is_active=False)
+        self.url = reverse('catalog:catalog-snapshot-list')
+
+    def test_snapshot_contains_active_tree(self):
+        data = self.client.get(self.url).json()
+        subject = data['categories'][0]['subjects'][0]
+        self.assertEqual(subject['name'], 'Математика')
+        self.assertEqual([topic['slug'] for topic in subject['topics']], ['algebra'])
+
+    def test_etag_and_version_bump(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        for header in (f'"other", W/{first["ETag"]}', '*'):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject=self.subject, name='Геометрия', slug='geometry')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        topics = response.json()['categories'][0]['subjects'][0]['topics']
+        self.assertEqual(len(topics), 2)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_etag_changes_without_version(self):
+        # Без Redis версия не читается: ETag меняется вместе с пересобранным снимком
+        first = self.client.get(self.url)
+        Topic.objects.create(subject=self.subject, name='Геометрия', slug='geometry')
+        _local_snapshot.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CatalogSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_index.clear()
+        self.addCleanup(catalog_index.clear)
+        self.subject = Subject.objects.create(name='Математика', slug='math')
+        self.topic = Topic.objects.create(
+            subject=self.subject, name='Линейная алгебра', slug='linear-algebra', keywords='матрицы, определители'
+        )
+        Topic.objects.create(subject=self.subject, name='Теория вероятностей', slug='probability')
+
+    def test_stem_normalises_inflections(self):
+        self.assertEqual(stem('алгебра'), stem('алгебре'))
+        self.assertEqual(stem('матрицы'), stem('матрицами'))
+
+    def test_morphology_prefix_and_typos(self):
+        names = lambda query: [doc['name'] for doc in catalog_index.search(query)]
+        self.assertEqual(names('задачи по линейной алгебре'), [])
+        self.assertEqual(names('по линейной алгебре'), ['Линейная алгебра'])
+        self.assertEqual(names('матрицами'), ['Линейная алгебра'])
+        self.assertEqual(names('вероят'), ['Теория вероятностей'])
+        self.assertEqual(names('алгибра'), ['Линейная алгебра'])
+
+    def test_index_follows_topic_changes(self):
+        catalog_index.search('алгебра')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.name = 'Аналитическая геометрия'
+            self.topic.save()
+        self.assertEqual(catalog_index.search('алгебра'), [])
+
+        response = self.client.get(reverse('catalog:topic-autocomplete'), {'q': 'геом'})
+        self.assertEqual([doc['id'] for doc in response.data['topics']], [self.topic.id])
+
+
+    def test_search_results_keep_relevance_order(self):
+        Topic.objects.create(subject=self.subject, name='Теория матриц', slug='matrices')
+        url = reverse('catalog:topic-list')
+        names = lambda params: [topic['name'] for topic in self.client.get(url, params).data['results']]
+        # Совпадение в названии весит больше, чем в ключевых словах
+        self.assertEqual(names({'search': 'матрицы'}), ['Теория матриц', 'Линейная алгебра'])
+        self.assertEqual(names({'search': 'матрицы', 'ordering': 'name'}), ['Линейная алгебра', 'Теория матриц'])
+
+    def test_keywords_filter_and_autocomplete_limit(self):
+        url = reverse('catalog:topic-list')
+        names = lambda params: [topic['name'] for topic in self.client.get(url, params).data['results']]
+        self.assertEqual(names({'keywords': 'определители, вероятность'}), ['Линейная алгебра'])
+        # Название темы не ключевое слово
+        self.assertEqual(names({'keywords': 'алгебра'}), [])
+
+        response = self.client.get(reverse('catalog:topic-autocomplete'), {'q': 'алгебра', 'limit': -5})
+        self.assertEqual(len(response.data['topics']), 1)
+
+class DiscountAnalyticsTests(APITestCase):
+    def setUp(self):
+        self.rule = DiscountRule.objects.create(name='Постоянный клиент', value=Decimal('10'))
+        self.clients = [
+            User.objects.create_user(username=f'client{i}', password='pass', role='client') for i in range(3)
+        ]
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def _order(self, client, day, amount):
+        order = Order.objects.create(client=client, discount=self.rule, discount_amount=amount)
+        created_at = timezone.make_aware(datetime.combine(day, time(12)))
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+
+    def test_sketch_estimate_is_close(self):
+        self.assertEqual(estimate_cardinality(build_sketch([])), 0)
+        self.assertAlmostEqual(estimate_cardinality(build_sketch(range(5000))), 5000, delta=250)
+
+    def test_statistics_from_rollups(self):
+        self._order(self.clients[0], self.yesterday, Decimal('100'))
+        self._order(self.clients[1], self.yesterday, Decimal('50'))
+        self._order(self.clients[0], self.today, Decimal('30'))
+        self._order(self.clients[2], self.today, Decimal('20'))
+        self.assertEqual(DiscountAnalyticsService.rollup_recent(), 2)
+
+        stats = DiscountAnalyticsService.get_statistics(self.yesterday, self.today)
+        rule = stats['discounts'][0]
+        self.assertEqual((rule['orders_count'], rule['users_count']), (4, 3))
+        self.assertEqual(rule['total_discount_amount'], Decimal('200'))
+        self.assertEqual([day['orders_count'] for day in stats['daily']], [2, 2])
+        self.assertEqual(stats['totals']['avg_discount'], Decimal('50.00'))
+
+        staff = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_authenticate(staff)
+        url = reverse('catalog:discountrule-statistics')
+        response = self.client.get(url, {'date_from': str(self.today), 'date_to': str(self.today)})
+        self.assertEqual(response.data['totals']['orders_count'], 2)
+        response = self.client.get(url, {'date_from': str(self.today), 'date_to': str(self.yesterday)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_discount_applied_to_old_order_reaches_rollup(self):
+        week_ago = self.today - timedelta(days=7)
+        order = Order.objects.create(client=self.clients[0], title='Курсовая', budget=Decimal('1000'))
+        Order.objects.filter(pk=order.pk).update(
+            created_at=timezone.make_aware(datetime.combine(week_ago, time(12)))
+        )
+        order.refresh_from_db()
+        OutboxService.relay()
+
+        # Скидка применена сегодня: день заказа вне окна rollup_recent
+        self.assertTrue(order.apply_discount(self.rule))
+        OutboxService.relay()
+        stats = DiscountAnalyticsService.get_statistics(week_ago, week_ago)
+        self.assertEqual(stats['totals']['total_discount'], Decimal('100'))
+
+        order.remove_discount()
+        OutboxService.relay()
+        self.assertEqual(DiscountAnalyticsService.get_statistics(week_ago, week_ago)['totals']['orders_count'], 0)
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DiscountSegmentTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.rule = DiscountRule.objects.create(
+            name='Постоянный клиент', value=Decimal('10'), min_orders=2, min_total_spent=Decimal('1000')
+        )
+        self.loyal = User.objects.create_user(username='loyal', password='pass', role='client')
+        self.newbie = User.objects.create_user(username='newbie', password='pass', role='client')
+
+    def _complete(self, client, budget):
+        order = Order.objects.create(client=client, budget=budget)
+        order.status = 'completed'
+        order.save()
+        return order
+
+    def test_loyalty_follows_order_changes(self):
+        self._complete(self.loyal, Decimal('600'))
+        order = self._complete(self.loyal, Decimal('300'))
+        self._complete(self.newbie, Decimal('5000'))
+        OutboxService.relay()
+        self.assertEqual(DiscountSegmentService.queryset(self.rule).count(), 0)
+
+        order.budget = Decimal('500')
+        order.save()
+        OutboxService.relay()
+        loyalty = ClientLoyalty.objects.get(user=self.loyal)
+        self.assertEqual((loyalty.completed_orders, loyalty.total_spent), (2, Decimal('1100')))
+        self.assertEqual(list(DiscountSegmentService.queryset(self.rule).values_list('user_id', flat=True)), [self.loyal.id])
+
+        order.status = 'revision'
+        order.save()
+        OutboxService.relay()
+        loyalty.refresh_from_db()
+        self.assertEqual((loyalty.completed_orders, loyalty.total_spent), (1, Decimal('600')))
+
+        ClientLoyalty.objects.filter(user=self.newbie).update(completed_orders=7)
+        self.assertEqual(ClientLoyaltyService.reconcile(), 1)
+        self.assertEqual(ClientLoyalty.objects.get(user=self.newbie).completed_orders, 1)
+
+    def test_retried_event_is_credited_once(self):
+        from apps.core.outbox import _handlers_cache
+
+        _handlers_cache.clear()
+        self.addCleanup(_handlers_cache.clear)
+        partner = User.objects.create_user(username='partner', password='pass', role='partner')
+        User.objects.filter(pk=self.loyal.pk).update(partner=partner)
+        self._complete(self.loyal, Decimal('600'))
+        # Обработчик счетчиков каталога падает на пачке и на первом событии
+        failures = [ValueError('сбой'), ValueError('сбой'), None, None]
+        with mock.patch('apps.catalog.outbox.update_order_counters', side_effect=failures):
+            self.assertEqual(OutboxService.relay(), {'processed': 1, 'failed': 1})
+            self.assertEqual(OutboxService.relay(), {'processed': 1, 'failed': 0})
+
+        loyalty = ClientLoyalty.objects.get(user=self.loyal)
+        self.assertEqual((loyalty.completed_orders, loyalty.total_spent), (1, Decimal('600')))
+        partner.refresh_from_db()
+        self.assertEqual(partner.active_referrals, 1)
+
+    def test_eligible_users_endpoints(self):
+        self._complete(self.loyal, Decimal('600'))
+        self._complete(self.loyal, Decimal('600'))
+        OutboxService.relay()
+        staff = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.force_authenticate(staff)
+
+        url = reverse('catalog:discount-rule-eligible-users', args=[self.rule.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['username'], 'loyal')
+        self.assertEqual(self.client.get(url, {'count_only': 'true'}).data, {'count': 1})
+
+        response = self.client.get(reverse('catalog:discount-rule-export-eligible-users', args=[self.rule.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'user_id,username,email,completed_orders,total_spent')
+        self.assertEqual(lines[1].split(',')[:2], [str(self.loyal.id), 'loyal'])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    DISCOUNT_CAMPAIGN_BATCH_SIZE=2,
+    DISCOUNT_CAMPAIGN_RATE=0
+)
+class DiscountCampaignTests(TestCase):
+    def setUp(self):
+        DiscountRule.objects.create(name='Новичок', value=Decimal('5'))
+        DiscountRule.objects.create(name='Постоянный клиент', value=Decimal('10'), min_orders=2)
+        self.clients = [
+            User.objects.create_user(username=f'client{i}', email=f'client{i}@example.com', password='pass', role='client')
+            for i in range(5)
+        ]
+        ClientLoyalty.objects.create(user=self.clients[0], completed_orders=3, total_spent=Decimal('3000'))
+        User.objects.create_user(username='expert', email='expert@example.com', password='pass', role='expert')
+
+    def test_campaign_sends_batches_and_completes(self):
+        campaign = DiscountCampaign.objects.create(kind='available')
+        # Захват, рассылка, правила с типами работ и по два запроса на пачку клиентов
+        with self.assertNumQueries(12):
+            DiscountCampaignService.run(campaign.pk)
+
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count), ('completed', 5))
+        self.assertEqual(campaign.last_user_id, self.clients[-1].id)
+        self.assertEqual([message.to for message in mail.outbox], [[client.email] for client in self.clients])
+        self.assertIn('Постоянный клиент', mail.outbox[0].body)
+        self.assertNotIn('Постоянный клиент', mail.outbox[1].body)
+        self.assertIsNone(DiscountCampaignService.run(campaign.pk))
+
+    def test_campaign_resumes_from_checkpoint(self):
+        campaign = DiscountCampaign.objects.create(kind='upcoming')
+        DiscountCampaignService.run(campaign.pk, time_limit=0)
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.last_user_id), ('paused', self.clients[1].id))
+
+        DiscountCampaignService.run(campaign.pk)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, 'completed')
+        # Клиенту с тремя заказами писать не о чем, остальным до скидки два заказа
+        self.assertEqual([message.to[0] for message in mail.outbox], [client.email for client in self.clients[1:]])
+        self.assertIn('2 заказ(ов)', mail.outbox[0].body)
+
+
+    @override_settings(DISCOUNT_CAMPAIGN_RATE=2)
+    def test_campaign_rate_is_limited_per_message(self):
+        campaign = DiscountCampaign.objects.create(kind='available')
+        with mock.patch('apps.core.ratelimit.time.sleep') as sleep:
+            DiscountCampaignService.run(campaign.pk)
+        # Пауза перед каждым письмом, кроме первого, а не одна на пачку
+        self.assertEqual(sleep.call_count, 4)
+
+    @override_settings(DISCOUNT_CAMPAIGN_BATCH_SIZE=5)
+    def test_batch_is_sent_in_one_call_and_failed_recipient_is_skipped(self):
+        refused = self.clients[2].email
+        calls = []
+
+        class Connection:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def send_messages(self, messages):
+                calls.append([])
+                for message in messages:
+                    if message.to == [refused]:
+                        raise smtplib.SMTPRecipientsRefused({refused: (550, b'No such user')})
+                    calls[-1].append(message.to[0])
+                return len(calls[-1])
+
+        campaign = DiscountCampaign.objects.create(kind='available')
+        with mock.patch('apps.catalog.campaigns.get_connection', return_value=Connection()):
+            DiscountCampaignService.run(campaign.pk)
+
+        campaign.refresh_from_db()
+        self.assertEqual(calls, [
+            [client.email for client in self.clients[:2]],
+            [client.email for client in self.clients[3:]],
+        ])
+        self.assertEqual((campaign.status, campaign.sent_count, campaign.failed_count), ('completed', 4, 1))
+        self.assertTrue(campaign.last_error.startswith(refused))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PricingEngineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pricing_engine.invalidate()
+        self.addCleanup(pricing_engine.invalidate)
+        self.work_type = WorkType.objects.create(name='Реферат', slug='essay', base_price=Decimal('1000'), estimated_time=10)
+        self.complexity = Complexity.objects.create(name='Сложная', slug='hard', multiplier=Decimal('1.5'))
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.now = timezone.now()
+
+    def test_round_price_is_decimal_half_even(self):
+        self.assertEqual(round_price(Decimal('1250')), Decimal('1200'))
+        self.assertEqual(round_price(Decimal('1350')), Decimal('1400'))
+        self.assertEqual(round_price(Decimal('1249.999')), Decimal('1200'))
+
+    def test_breakdown_and_batch_agree(self):
+        deadline = self.now + timedelta(hours=5)
+        requirements = {'uniqueness': 95, 'presentation': True}
+        quote = pricing_engine.quote(self.work_type.id, self.complexity.id, deadline, requirements, now=self.now)
+        # 1000 * 1.5 * срочность 1.5 * 1.2 * 1.25
+        self.assertEqual(quote['urgency_adjustment'], Decimal('750.00'))
+        self.assertEqual(quote['requirements_adjustment'], Decimal('1125.00'))
+        self.assertEqual(quote['final_price'], Decimal('3400'))
+        prices = pricing_engine.price_many(
+            [(self.work_type.id, self.complexity.id, deadline, requirements)] * 2, now=self.now
+        )
+        self.assertEqual(prices, [Decimal('3400')] * 2)
+        with self.assertRaises(ValueError):
+            pricing_engine.quote(self.work_type.id, self.complexity.id, self.now - timedelta(hours=1), now=self.now)
+
+    def test_best_discount_for_loyal_client(self):
+        DiscountRule.objects.create(name='Пять процентов', value=Decimal('5'))
+        DiscountRule.objects.create(name='Постоянный клиент', value=Decimal('20'), min_orders=3)
+        other = WorkType.objects.create(name='Диплом', slug='diploma', base_price=Decimal('1000'))
+        DiscountRule.objects.create(name='Дипломы', value=Decimal('50')).work_types.add(other)
+        deadline = timezone.now() + timedelta(hours=15)
+
+        quote = pricing_engine.quote(self.work_type.id, self.complexity.id, deadline, user=self.client_user)
+        self.assertEqual(quote['discount_details']['name'], 'Пять процентов')
+
+        ClientLoyalty.objects.create(user=self.client_user, completed_orders=3, total_spent=Decimal('9000'))
+        quote = pricing_engine.quote(self.work_type.id, self.complexity.id, deadline, user=self.client_user)
+        self.assertEqual(quote['discount_amount'], Decimal('300.00'))
+        self.assertEqual(quote['final_price'], Decimal('1200'))
+
+    def test_new_work_type_is_priced_before_version_check(self):
+        deadline = timezone.now() + timedelta(hours=15)
+        pricing_engine.quote(self.work_type.id, self.complexity.id, deadline)
+        loaded = pricing_engine.data
+        # Версия каталога еще не перечитана: новый тип работы находится перезагрузкой по промаху
+        work_type = WorkType.objects.create(name='Диплом', slug='diploma', base_price=Decimal('2000'), estimated_time=10)
+        quote = pricing_engine.quote(work_type.id, self.complexity.id, deadline)
+        self.assertEqual(quote['final_price'], Decimal('3000'))
+        # Загрузка подменила снимок, не изменив тот, что уже взяли расчеты
+        self.assertIsNot(pricing_engine.data, loaded)
+        self.assertEqual(loaded.base_prices, (Decimal('1000'),))
+        with self.assertRaises(ValueError):
+            pricing_engine.quote(work_type.id + 1, self.complexity.id, deadline)
+
+    def test_engine_reloads_on_catalog_change(self):
+        deadline = timezone.now() + timedelta(hours=15)
+        self.assertEqual(PricingService.calculate_order_price(self.work_type, self.complexity, deadline), Decimal('1500'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.work_type.base_price = Decimal('2000')
+            self.work_type.save()
+        with override_settings(PRICING_ENGINE_CHECK_INTERVAL=0):
+            self.assertEqual(PricingService.calculate_order_price(self.work_type, self.complexity, deadline), Decimal('3000'))
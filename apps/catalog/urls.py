@@ -4,7 +4,7 @@ from .views import (
     SubjectViewSet, TopicViewSet,
     WorkTypeViewSet, ComplexityViewSet,
     SubjectCategoryViewSet, DiscountRuleViewSet,
-    DiscountViewSet
+    DiscountViewSet, CatalogSnapshotViewSet
 )
 
 router = DefaultRouter()
@@ -14,6 +14,8 @@ router.register(r'work-types', WorkTypeViewSet)
 router.register(r'complexity-levels', ComplexityViewSet)
 router.register(r'categories', SubjectCategoryViewSet)
 router.register(r'discounts', DiscountViewSet)
+router.register(r'discount-rules', DiscountRuleViewSet, basename='discount-rule')
+router.register(r'snapshot', CatalogSnapshotViewSet, basename='catalog-snapshot')
 
 app_name = 'catalog'
 
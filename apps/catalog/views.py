@@ -1,5 +1,5 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Count, Q, Avg, F, Sum
+from django.db.models import Count, Q, Avg, F, Sum, Case, When, Value, IntegerField
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -10,14 +10,71 @@ from .serializers import (
     SubjectDetailSerializer, TopicDetailSerializer,
     WorkTypeSerializer, ComplexitySerializer,
     SubjectCategorySerializer, DiscountRuleSerializer,
-    DiscountProgressSerializer
+    DiscountProgressSerializer, EligibleClientSerializer
 )
-from .services import PricingService
+from .services import PricingService, CatalogSnapshotService
+from .search import catalog_index
+from .analytics import DiscountAnalyticsService
+from .loyalty import DiscountSegmentService
+from datetime import date, timedelta
 from .discount_notifications import DiscountNotificationService
 from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags
 
 # Create your views here.
 
+class CatalogIndexSearchFilter(filters.BaseFilterBackend):
+    """
+    Параметр search через поисковый индекс каталога (морфология, префикс
+    последнего слова, опечатки) вместо LIKE '%...%' по полям.
+    Тип документа индекса задается атрибутом search_kind представления.
+    Результаты упорядочены по релевантности, если порядок не задан
+    параметром ordering; поэтому фильтр стоит после OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get('search', '').strip()
+        if not query:
+            return queryset
+        ids = catalog_index.search_ids(query, kind=view.search_kind)
+        queryset = queryset.filter(id__in=ids)
+        if not ids or request.query_params.get(filters.OrderingFilter.ordering_param):
+            return queryset
+        return queryset.order_by(
+            Case(*[When(id=pk, then=Value(rank)) for rank, pk in enumerate(ids)], output_field=IntegerField())
+        )
+
+
+def etag_matches(etag, header):
+    """
+    Совпадение ETag со списком из If-None-Match: слабое сравнение
+    (префикс W/ не учитывается), * совпадает с любым ETag
+    """
+    etags = parse_etags(header or '')
+    if etags == ['*']:
+        return True
+    return etag.removeprefix('W/') in {value.removeprefix('W/') for value in etags}
+
+
+class CatalogSnapshotViewSet(viewsets.ViewSet):
+    """
+    Весь активный каталог одним ответом для формы заказа.
+    Поддерживает If-None-Match: при неизменном содержимом отвечает 304 без тела.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        _, body = CatalogSnapshotService.get_snapshot()
+        etag = CatalogSnapshotService.etag(body)
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
 class SubjectCategoryViewSet(viewsets.ModelViewSet):
     queryset = SubjectCategory.objects.all()
     serializer_class = SubjectCategorySerializer
@@ -37,9 +94,9 @@ class SubjectViewSet(viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     serializer_class = SubjectSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, CatalogIndexSearchFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['name', 'description', 'keywords']
+    search_kind = 'subject'
     ordering_fields = ['name', 'created_at', 'min_price']
     ordering = ['name']
 
@@ -49,20 +106,13 @@ class SubjectViewSet(viewsets.ModelViewSet):
         return SubjectSerializer
 
     def get_queryset(self):
-        queryset = Subject.objects.select_related('category').annotate(
-            topics_count=Count('topics'),
-            active_topics_annotated=Count('topics', filter=Q(topics__is_active=True)),
-            experts_count=Count('experts', distinct=True),
-            verified_experts_annotated=Count('experts', filter=Q(experts__is_verified=True), distinct=True),
-            orders_count=Count('orders'),
-            completed_orders_count=Count('orders', filter=Q(orders__status='completed')),
-            avg_rating=Avg('orders__expert_review__rating', filter=Q(orders__status='completed'))
-        )
+        # Счетчики тем, экспертов и заказов хранятся в строке предмета
+        queryset = Subject.objects.select_related('category')
         
         # Фильтрация по наличию экспертов
         has_experts = self.request.query_params.get('has_experts')
         if has_experts == 'true':
-            queryset = queryset.filter(verified_experts_annotated__gt=0)
+            queryset = queryset.filter(verified_experts_count__gt=0)
         
         # Фильтрация по ценовому диапазону
         min_price = self.request.query_params.get('min_price')
@@ -77,10 +127,7 @@ class SubjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def topics(self, request, pk=None):
         subject = self.get_object()
-        topics = Topic.objects.filter(subject=subject).annotate(
-            orders_count=Count('orders'),
-            completed_orders_count=Count('orders', filter=Q(orders__status='completed'))
-        )
+        topics = Topic.objects.filter(subject=subject).select_related('subject')
         
         # Фильтрация по активности
         is_active = request.query_params.get('is_active')
@@ -117,9 +164,9 @@ class TopicViewSet(viewsets.ModelViewSet):
     queryset = Topic.objects.all()
     serializer_class = TopicSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, CatalogIndexSearchFilter]
     filterset_fields = ['subject', 'is_active', 'complexity_level']
-    search_fields = ['name', 'description', 'keywords', 'subject__name']
+    search_kind = 'topic'
     ordering_fields = ['name', 'created_at', 'orders_count']
     ordering = ['subject__name', 'name']
 
@@ -129,23 +176,33 @@ class TopicViewSet(viewsets.ModelViewSet):
         return TopicSerializer
 
     def get_queryset(self):
-        queryset = Topic.objects.select_related('subject').annotate(
-            orders_count=Count('orders'),
-            completed_orders_count=Count('orders', filter=Q(orders__status='completed')),
-            avg_complexity=Avg('orders__complexity__multiplier')
-        )
+        queryset = Topic.objects.select_related('subject')
         
-        # Фильтрация по ключевым словам
+        # Фильтрация по ключевым словам темы (любое из перечисленных через запятую)
         keywords = self.request.query_params.get('keywords')
         if keywords:
-            keywords_list = [k.strip() for k in keywords.split(',')]
-            q_objects = Q()
-            for keyword in keywords_list:
-                q_objects |= Q(keywords__icontains=keyword)
-            queryset = queryset.filter(q_objects)
+            ids = set()
+            for keyword in keywords.split(','):
+                ids.update(catalog_index.search_ids(keyword, kind='topic', fields=('keywords',)))
+            queryset = queryset.filter(id__in=ids)
             
         return queryset
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def autocomplete(self, request):
+        """Подсказки тем и предметов по началу ввода (?q=...)"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            limit = 10
+        if len(query) < 2:
+            return Response({'subjects': [], 'topics': []})
+        return Response({
+            'subjects': catalog_index.search(query, kind='subject', limit=limit, active_only=True),
+            'topics': catalog_index.search(query, kind='topic', limit=limit, active_only=True),
+        })
+
     @action(detail=True, methods=['get'])
     def orders(self, request, pk=None):
         topic = self.get_object()
@@ -192,27 +249,29 @@ class DiscountRuleViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def eligible_users(self, request, pk=None):
-        """Возвращает список пользователей, подходящих под правило скидки"""
+        """
+        Клиенты, подходящие под правило скидки, постранично.
+        С параметром count_only=true возвращает только их количество.
+        """
         discount = self.get_object()
-        
-        from apps.users.models import User
-        eligible_users = User.objects.annotate(
-            completed_orders_count=Count(
-                'client_orders',
-                filter=Q(client_orders__status='completed')
-            ),
-            total_spent=Sum(
-                'client_orders__budget',
-                filter=Q(client_orders__status='completed')
-            )
-        ).filter(
-            completed_orders_count__gte=discount.min_orders,
-            total_spent__gte=discount.min_total_spent
+        if request.query_params.get('count_only') == 'true':
+            return Response({'count': DiscountSegmentService.count(discount)})
+
+        queryset = DiscountSegmentService.queryset(discount).select_related('user').order_by('user_id')
+        page = self.paginate_queryset(queryset)
+        serializer = EligibleClientSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='eligible-users/export')
+    def export_eligible_users(self, request, pk=None):
+        """Выгрузка всех подходящих под правило клиентов в CSV потоком"""
+        discount = self.get_object()
+        response = StreamingHttpResponse(
+            DiscountSegmentService.export_rows(discount),
+            content_type='text/csv'
         )
-        
-        from apps.users.serializers import UserListSerializer
-        serializer = UserListSerializer(eligible_users, many=True)
-        return Response(serializer.data)
+        response['Content-Disposition'] = f'attachment; filename=discount-{discount.pk}-clients.csv'
+        return response
 
     @action(detail=False, methods=['get'])
     def my_discounts(self, request):
@@ -403,53 +462,26 @@ class DiscountViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Получить статистику по использованию скидок (только для админов)"""
+        """
+        Статистика использования скидок за период (только для админов).
+        Параметры date_from и date_to (ГГГГ-ММ-ДД), по умолчанию последние 30 дней.
+        """
         if not request.user.is_staff:
             return Response(status=status.HTTP_403_FORBIDDEN)
 
-        now = timezone.now()
-        week_ago = now - timezone.timedelta(days=7)
-        month_ago = now - timezone.timedelta(days=30)
-
-        discounts_stats = []
-        for discount in self.queryset:
-            discount_orders = discount.orders.all()
-            stats = {
-                'id': discount.id,
-                'name': discount.name,
-                'users_count': discount_orders.values('user').distinct().count(),
-                'orders_count': discount_orders.count(),
-                'total_discount_amount': discount_orders.aggregate(
-                    total=Sum('discount_amount'))['total'] or 0,
-            }
-            stats['avg_discount_amount'] = (
-                stats['total_discount_amount'] / stats['orders_count']
-                if stats['orders_count'] > 0 else 0
+        today = timezone.localdate()
+        try:
+            date_from = date.fromisoformat(request.query_params.get('date_from') or str(today - timedelta(days=29)))
+            date_to = date.fromisoformat(request.query_params.get('date_to') or str(today))
+        except ValueError:
+            return Response(
+                {'error': 'Даты нужно указать в формате ГГГГ-ММ-ДД'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if date_from > date_to:
+            return Response(
+                {'error': 'date_from не может быть позже date_to'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            discounts_stats.append(stats)
 
-        return Response({
-            'discounts': discounts_stats,
-            'periods': {
-                'week': {
-                    'orders_count': Order.objects.filter(
-                        discount__isnull=False,
-                        created_at__gte=week_ago
-                    ).count(),
-                    'total_discount': Order.objects.filter(
-                        discount__isnull=False,
-                        created_at__gte=week_ago
-                    ).aggregate(total=Sum('discount_amount'))['total'] or 0,
-                },
-                'month': {
-                    'orders_count': Order.objects.filter(
-                        discount__isnull=False,
-                        created_at__gte=month_ago
-                    ).count(),
-                    'total_discount': Order.objects.filter(
-                        discount__isnull=False,
-                        created_at__gte=month_ago
-                    ).aggregate(total=Sum('discount_amount'))['total'] or 0,
-                }
-            }
-        })
+        return Response(DiscountAnalyticsService.get_statistics(date_from, date_to))
@@ -1,9 +1,9 @@
 from rest_framework import serializers
 from .models import Chat, Message
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import UserCardSerializer
 
 class MessageSerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
+    sender = UserCardSerializer(read_only=True)
     
     class Meta:
         model = Message
@@ -11,7 +11,7 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['sender', 'created_at']
 
 class ChatSerializer(serializers.ModelSerializer):
-    participants = UserSerializer(many=True, read_only=True)
+    participants = UserCardSerializer(many=True, read_only=True)
     messages = MessageSerializer(many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
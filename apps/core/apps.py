@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     verbose_name = 'Основное'
+
+    def ready(self):
+        from .renderers import instrument_serializers
+        instrument_serializers()
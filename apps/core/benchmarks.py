@@ -0,0 +1,241 @@
+"""
+Набор замеров производительности: расчет цен, подбор скидки,
+сериализация и список заказов.
+
+seed() наполняет базу правдоподобным каталогом, пользователями
+и заказами, run() замеряет время и количество запросов к базе.
+Команда run_benchmarks выполняет замеры на временной тестовой базе
+и сравнивает результаты с BASELINE_PATH: время может превышать
+базовое не больше чем на долю tolerance, количество запросов —
+не больше базового.
+"""
+import json
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.5
+
+# Количество строк при scale=1
+SEED_SIZES = {'clients': 200, 'experts': 40, 'orders': 1000}
+
+
+def seed(scale=1, rnd=None):
+    """Наполняет пустую базу данными для замеров"""
+    from apps.catalog.loyalty import ClientLoyaltyService
+    from apps.catalog.models import SubjectCategory, Subject, Topic, WorkType, Complexity, DiscountRule
+    from apps.orders.models import Order, Bid
+    from apps.users.models import User
+
+    rnd = rnd or random.Random(1)
+    now = timezone.now()
+
+    categories = SubjectCategory.objects.bulk_create([
+        SubjectCategory(name=f'Категория {i}', slug=f'category-{i}', order=i) for i in range(4)
+    ])
+    subjects = Subject.objects.bulk_create([
+        Subject(name=f'Предмет {i}', slug=f'subject-{i}', category=categories[i % len(categories)])
+        for i in range(20)
+    ])
+    topics = Topic.objects.bulk_create([
+        Topic(subject=subject, name=f'{subject.name}, тема {j}', slug=f'{subject.slug}-topic-{j}')
+        for subject in subjects for j in range(5)
+    ])
+    work_types = WorkType.objects.bulk_create([
+        WorkType(
+            name=f'Тип работы {i}', slug=f'work-type-{i}',
+            base_price=Decimal(500 * (i + 1)), estimated_time=24 * (i % 5 + 1)
+        )
+        for i in range(10)
+    ])
+    complexities = Complexity.objects.bulk_create([
+        Complexity(name=f'Сложность {i}', slug=f'complexity-{i}', multiplier=Decimal('1.00') + Decimal('0.25') * i)
+        for i in range(5)
+    ])
+    rules = DiscountRule.objects.bulk_create([
+        DiscountRule(
+            name=f'Скидка {i}',
+            discount_type='percentage' if i % 3 else 'fixed',
+            value=Decimal(5 + i * 2) if i % 3 else Decimal(200 + i * 50),
+            min_orders=i,
+            min_total_spent=Decimal(1000 * i),
+            valid_from=now - timedelta(days=30)
+        )
+        for i in range(8)
+    ])
+    for rule in rules[5:]:
+        rule.work_types.set(rnd.sample(work_types, 3))
+
+    password = make_password('benchmark')
+    clients = User.objects.bulk_create([
+        User(username=f'client{i}', email=f'client{i}@example.com', password=password, role='client')
+        for i in range(SEED_SIZES['clients'] * scale)
+    ])
+    experts = User.objects.bulk_create([
+        User(username=f'expert{i}', email=f'expert{i}@example.com', password=password, role='expert')
+        for i in range(SEED_SIZES['experts'] * scale)
+    ])
+    User.objects.create(username='staff', password=password, is_staff=True, is_superuser=True)
+
+    statuses = ['new'] * 4 + ['in_progress'] * 2 + ['review', 'revision', 'cancelled'] + ['completed'] * 4
+    orders = []
+    for i in range(SEED_SIZES['orders'] * scale):
+        topic = rnd.choice(topics)
+        status = rnd.choice(statuses)
+        orders.append(Order(
+            client=rnd.choice(clients),
+            expert=None if status == 'new' else rnd.choice(experts),
+            subject_id=topic.subject_id,
+            topic=topic,
+            work_type=rnd.choice(work_types),
+            complexity=rnd.choice(complexities),
+            title=f'Заказ {i}',
+            description='Описание заказа',
+            deadline=now + timedelta(hours=rnd.randint(6, 24 * 30)),
+            budget=Decimal(rnd.randrange(500, 20000, 100)),
+            status=status,
+        ))
+    orders = Order.objects.bulk_create(orders)
+    Bid.objects.bulk_create([
+        Bid(order=order, expert=expert, amount=order.budget)
+        for order in orders if order.status == 'new'
+        for expert in rnd.sample(experts, rnd.randint(0, 3))
+    ])
+    ClientLoyaltyService.reconcile()
+
+
+def _timed(func, number, repeat=3):
+    """Лучшее из repeat среднее время вызова func, мкс"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - started) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 10 ** 6, 1)
+
+
+def _queries(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def _cycle(items):
+    iterator = iter(())
+
+    def take():
+        nonlocal iterator
+        try:
+            return next(iterator)
+        except StopIteration:
+            iterator = iter(items)
+            return next(iterator)
+    return take
+
+
+def run(rnd=None):
+    """Выполняет замеры. Возвращает {метрика: значение}; *_us — мкс, *_queries — запросы"""
+    from apps.catalog.models import WorkType, Complexity
+    from apps.catalog.pricing import pricing_engine
+    from apps.catalog.services import PricingService
+    from apps.orders.models import Order
+    from apps.orders.serializers import OrderSerializer
+    from apps.orders.services import DiscountService
+    from apps.orders.views import OrderViewSet
+    from apps.users.models import User
+
+    rnd = rnd or random.Random(2)
+    now = timezone.now()
+    work_types = list(WorkType.objects.all())
+    complexities = list(Complexity.objects.all())
+    client = User.objects.filter(role='client', loyalty__completed_orders__gt=0).order_by('id').first()
+    staff = User.objects.get(username='staff')
+    requirements = (None, {'uniqueness': 95}, {'formatting': True, 'presentation': True})
+    quotes = [
+        (rnd.choice(work_types), rnd.choice(complexities), now + timedelta(hours=rnd.randint(2, 500)), rnd.choice(requirements))
+        for _ in range(500)
+    ]
+    metrics = {}
+
+    next_quote = _cycle(quotes)
+
+    def quote():
+        work_type, complexity, deadline, reqs = next_quote()
+        PricingService.get_price_breakdown(work_type, complexity, deadline, client, reqs)
+
+    quote()
+    metrics['pricing.quote_us'] = _timed(quote, 500)
+    metrics['pricing.quote_queries'] = _queries(quote)
+
+    batch = [(work_type.id, complexity.id, deadline, reqs) for work_type, complexity, deadline, reqs in quotes]
+    metrics['pricing.batch_quote_us'] = round(
+        _timed(lambda: pricing_engine.price_many(batch, user=client), 5) / len(batch), 2
+    )
+
+    orders = list(Order.objects.filter(status='new').select_related('client', 'work_type')[:50])
+    next_order = _cycle(orders)
+    metrics['discounts.best_discount_us'] = _timed(lambda: DiscountService.get_best_discount(next_order()), 50)
+    metrics['discounts.best_discount_queries'] = _queries(lambda: DiscountService.get_best_discount(orders[0]))
+
+    request = APIRequestFactory().get('/api/orders/orders/')
+    request.user = staff
+    view = OrderViewSet(request=request, format_kwarg=None)
+    page = list(view.get_queryset().order_by('-created_at')[:50])
+
+    def serialize():
+        OrderSerializer(page, many=True, context={'request': request}).data
+
+    serialize()
+    metrics['orders.serialize_50_us'] = _timed(serialize, 3)
+    metrics['orders.serialize_50_queries'] = _queries(serialize)
+
+    api = APIClient()
+    api.force_authenticate(staff)
+    url = reverse('order-list')
+
+    def order_list():
+        response = api.get(url)
+        assert response.status_code == 200, response.status_code
+
+    order_list()
+    metrics['orders.list_request_us'] = _timed(order_list, 5)
+    metrics['orders.list_request_queries'] = _queries(order_list)
+    return metrics
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not Path(path).exists():
+        return {'tolerance': DEFAULT_TOLERANCE, 'metrics': {}}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_baseline(metrics, path=BASELINE_PATH, tolerance=DEFAULT_TOLERANCE):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'tolerance': tolerance, 'metrics': metrics}, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def compare(metrics, baseline, tolerance=None):
+    """Список регрессий: (метрика, базовое значение, текущее значение)"""
+    tolerance = baseline.get('tolerance', DEFAULT_TOLERANCE) if tolerance is None else tolerance
+    regressions = []
+    for name, expected in baseline.get('metrics', {}).items():
+        actual = metrics.get(name)
+        if actual is None:
+            continue
+        limit = expected if name.endswith('_queries') else expected * (1 + tolerance)
+        if actual > limit:
+            regressions.append((name, expected, actual))
+    return regressions
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+
+_PROCESSING = 'processing'
+_DONE = 'done'
+
+
+def _cache_key(request, key):
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    raw = f'{user_id}:{request.method}:{request.path}:{key}'
+    return 'idempotency:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    """Отпечаток тела запроса: повтор ключа с другими данными — ошибка клиента"""
+    try:
+        payload = json.dumps(request.data, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        payload = repr(request.data)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Делает POST-действие DRF идемпотентным по заголовку Idempotency-Key.
+
+    Первый запрос с ключом выполняется, успешный ответ сохраняется в кэше
+    на IDEMPOTENCY_KEY_TTL секунд. Повтор с тем же ключом возвращает
+    сохраненный ответ без повторного выполнения. Пока первый запрос
+    обрабатывается, повтор получает 409, а повтор с другим телом — 422.
+    Без заголовка или при недоступном кэше действие выполняется как обычно.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24)
+        lock_timeout = getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60)
+
+        added = cache.add(
+            cache_key,
+            {'state': _PROCESSING, 'fingerprint': fingerprint},
+            timeout=lock_timeout
+        )
+        if added is False:
+            stored = cache.get(cache_key)
+            if stored is not None:
+                if stored['fingerprint'] != fingerprint:
+                    return Response(
+                        {'error': 'Ключ идемпотентности уже использован с другими параметрами'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if stored['state'] == _PROCESSING:
+                    return Response(
+                        {'error': 'Запрос с этим ключом идемпотентности еще обрабатывается'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                return Response(
+                    stored['data'],
+                    status=stored['status'],
+                    headers={REPLAY_HEADER: 'true'}
+                )
+        elif not added:
+            # Кэш недоступен (IGNORE_EXCEPTIONS): выполняем без защиты от повторов
+            logger.warning("Хранилище ключей идемпотентности недоступно")
+            return view_method(self, request, *args, **kwargs)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+
+        # Ошибки сервера не фиксируем, чтобы клиент мог повторить запрос
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, {
+                'state': _DONE,
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'data': response.data,
+            }, timeout=ttl)
+        return response
+
+    return wrapper
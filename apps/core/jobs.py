@@ -0,0 +1,148 @@
+"""
+Периодические задачи, обрабатывающие данные пачками.
+
+Одновременно выполняется только один экземпляр задачи: его держит
+lease-блокировка в Redis (JobLock), которая продлевается после каждой
+пачки. Если воркер завис или убит, блокировка истекает через lease
+секунд, и следующий запуск из beat забирает задачу. Запуск, не
+получивший блокировку, сразу завершается.
+
+Позиция прохода сохраняется в JobCheckpoint после каждой пачки,
+поэтому прерванный проход продолжается с места остановки, а не
+начинается с начала. Обработанные строки каждой пачки передаются
+в метрики задач (record_rows).
+"""
+import logging
+import time
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from redis.exceptions import LockError
+from .models import JobCheckpoint
+from .task_metrics import record_rows
+
+logger = logging.getLogger(__name__)
+
+
+class LockLost(Exception):
+    """Блокировка истекла и, возможно, захвачена другим экземпляром задачи"""
+
+
+class JobLock:
+    """
+    Lease-блокировка задачи: истекает через lease секунд, если ее
+    не продлевать вызовом heartbeat(). Без Redis (в тестах) —
+    на cache.add.
+    """
+
+    def __init__(self, name, lease):
+        self.key = f'job_lock:{name}'
+        self.lease = lease
+        self.token = uuid4().hex
+        # Продление и освобождение сверяют токен владельца атомарно (скрипт Lua)
+        self._lock = cache.lock(self.key, timeout=lease, thread_local=False) if hasattr(cache, 'lock') else None
+
+    def acquire(self):
+        if self._lock is not None:
+            return self._lock.acquire(blocking=False)
+        return cache.add(self.key, self.token, self.lease)
+
+    def heartbeat(self):
+        """Продлевает блокировку на lease секунд; False, если она уже потеряна"""
+        if self._lock is not None:
+            try:
+                return self._lock.extend(self.lease, replace_ttl=True)
+            except LockError:
+                return False
+        if cache.get(self.key) != self.token:
+            return False
+        cache.set(self.key, self.token, self.lease)
+        return True
+
+    def release(self):
+        if self._lock is not None:
+            try:
+                self._lock.release()
+            except LockError:
+                pass
+        elif cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+class ChunkedJob:
+    """
+    Основа периодической задачи с пачками и сохранением позиции.
+
+    Наследник задает name и реализует:
+    - start() — позицию нового прохода (словарь, сериализуемый в JSON);
+    - process_chunk(position) — обрабатывает одну пачку и возвращает
+      (следующая позиция или None, если проход завершен; обработано строк).
+
+    Незавершенный проход, начатый больше stale_after секунд назад,
+    не продолжается, а начинается заново (для задач, которым важна
+    актуальность, а не полнота прохода). Между пачками задача ждет
+    pause секунд, чтобы не загружать базу.
+    """
+    name = None
+    lease = None
+    chunk_size = None
+    stale_after = None
+    pause = None
+
+    def __init__(self):
+        self.lease = self.lease or getattr(settings, 'JOB_LOCK_LEASE', 300)
+        self.chunk_size = self.chunk_size or getattr(settings, 'JOB_CHUNK_SIZE', 200)
+        self.checkpoint = None
+
+    def start(self):
+        return {}
+
+    def process_chunk(self, position):
+        raise NotImplementedError
+
+    def _checkpoint(self):
+        checkpoint, _ = JobCheckpoint.objects.get_or_create(name=self.name)
+        now = timezone.now()
+        stale = (
+            self.stale_after is not None and checkpoint.started_at is not None
+            and (now - checkpoint.started_at).total_seconds() > self.stale_after
+        )
+        if checkpoint.started_at is None or checkpoint.finished_at is not None or stale:
+            checkpoint.position = self.start()
+            checkpoint.started_at = now
+            checkpoint.finished_at = None
+            checkpoint.processed = 0
+            checkpoint.save()
+        else:
+            logger.info(f"Задача {self.name} продолжает проход с позиции {checkpoint.position}")
+        return checkpoint
+
+    def run(self):
+        """
+        Выполняет (или продолжает) проход. Возвращает количество строк,
+        обработанных за проход, или None, если задача уже выполняется.
+        """
+        lock = JobLock(self.name, self.lease)
+        if not lock.acquire():
+            logger.info(f"Задача {self.name} уже выполняется, запуск пропущен")
+            return None
+        try:
+            checkpoint = self.checkpoint = self._checkpoint()
+            while True:
+                position, processed = self.process_chunk(checkpoint.position)
+                checkpoint.processed += processed
+                record_rows(processed)
+                if position is None:
+                    checkpoint.finished_at = timezone.now()
+                else:
+                    checkpoint.position = position
+                checkpoint.save(update_fields=['position', 'processed', 'finished_at', 'updated_at'])
+                if position is None:
+                    return checkpoint.processed
+                if not lock.heartbeat():
+                    raise LockLost(f"Задача {self.name} потеряла блокировку")
+                if self.pause:
+                    time.sleep(self.pause)
+        finally:
+            lock.release()
@@ -0,0 +1,35 @@
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from config.celery import app
+from apps.core.task_metrics import TaskEventsMonitor, start_http_server
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Экспортер метрик задач Celery: читает события воркеров и beat из брокера '
+        'и отдает метрики в формате Prometheus по HTTP (/metrics)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=settings.CELERY_EXPORTER_PORT, help='Порт HTTP')
+        parser.add_argument('--address', default=settings.CELERY_EXPORTER_ADDRESS, help='Адрес HTTP')
+
+    def handle(self, *args, **options):
+        monitor = TaskEventsMonitor()
+        start_http_server(options['port'], options['address'])
+        self.stdout.write(f"Метрики задач: http://{options['address']}:{options['port']}/metrics")
+
+        while True:
+            try:
+                with app.connection() as connection:
+                    receiver = app.events.Receiver(connection, handlers={'*': monitor.on_event})
+                    receiver.capture(limit=None, timeout=None, wakeup=True)
+            except (KeyboardInterrupt, SystemExit):
+                return
+            except Exception as e:
+                logger.error(f"Ошибка чтения событий Celery: {str(e)}")
+                time.sleep(5)
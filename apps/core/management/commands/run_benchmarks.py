@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from apps.core import benchmarks
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры производительности на временной тестовой базе с сравнением '
+        'с apps/core/benchmark_baseline.json; при регрессии завершается с ошибкой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Множитель объема тестовых данных')
+        parser.add_argument('--tolerance', type=float, help='Допустимое замедление, доля (по умолчанию из базового файла)')
+        parser.add_argument('--update-baseline', action='store_true', help='Записать результаты как базовые')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Замеры не зависят от доступности Redis
+            with override_settings(CACHES=LOCMEM_CACHE):
+                benchmarks.seed(options['scale'])
+                metrics = benchmarks.run()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        baseline = benchmarks.load_baseline()
+        for name, value in sorted(metrics.items()):
+            expected = baseline['metrics'].get(name)
+            self.stdout.write(f'{name:<36} {value:>12}' + (f'  (базовое {expected})' if expected is not None else ''))
+
+        if options['update_baseline']:
+            tolerance = options['tolerance'] if options['tolerance'] is not None else baseline.get(
+                'tolerance', benchmarks.DEFAULT_TOLERANCE
+            )
+            benchmarks.save_baseline(metrics, tolerance=tolerance)
+            self.stdout.write(self.style.SUCCESS(f'Базовые значения записаны в {benchmarks.BASELINE_PATH}'))
+            return
+
+        regressions = benchmarks.compare(metrics, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Регрессия производительности: ' + ', '.join(
+                f'{name} {expected} -> {actual}' for name, expected, actual in regressions
+            ))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,113 @@
+import logging
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .metrics import registry, collect_request_stats, record_query
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = registry.counter('http_requests_total', 'HTTP-запросы', ('view', 'method', 'status'))
+DURATION = registry.histogram('http_request_duration_seconds', 'Время обработки HTTP-запроса', ('view',))
+DB_QUERIES = registry.histogram(
+    'http_request_db_queries', 'Запросов к базе на HTTP-запрос', ('view',),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+)
+DB_DURATION = registry.histogram('http_request_db_duration_seconds', 'Время запросов к базе на HTTP-запрос', ('view',))
+CACHE = registry.counter('http_request_cache_total', 'Обращения к кэшу при HTTP-запросах', ('view', 'result'))
+SERIALIZE_DURATION = registry.histogram(
+    'http_request_serialize_duration_seconds', 'Время serializer.data на HTTP-запрос', ('view',)
+)
+RENDER_DURATION = registry.histogram(
+    'http_request_render_duration_seconds', 'Время сериализации ответа в JSON', ('view',)
+)
+BUDGET_EXCEEDED = registry.counter(
+    'http_query_budget_exceeded_total', 'Превышения бюджета запросов к базе', ('view',)
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def describe_view(view_func, method):
+    """(класс представления, действие, имя для метрик) по функции представления"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        module = getattr(view_func, '__module__', '')
+        return None, None, f"{module}.{getattr(view_func, '__name__', type(view_func).__name__)}"
+    actions = getattr(view_func, 'actions', None)
+    action = actions.get(method.lower(), method.lower()) if actions else method.lower()
+    return cls, action, f'{cls.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Метрики HTTP-запросов: количество и время запросов к базе, попадания
+    и промахи кэша, время serializer.data и рендеринга JSON и общее время.
+    Значения пишутся в метрики Prometheus (apps.core.metrics), а при
+    SERVER_TIMING_HEADER — в заголовок Server-Timing, только для
+    сотрудников и адресов METRICS_ALLOWED_IPS.
+
+    Бюджет запросов к базе задается атрибутом представления
+    query_budgets = {'list': 10, ...} по действиям (для обычных
+    представлений — по HTTP-методам). При превышении пишется
+    предупреждение, а при QUERY_BUDGET_RAISE (включает TestRunner) — исключение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with collect_request_stats() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        view = getattr(request, '_metrics_view', 'unresolved')
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        DURATION.observe(duration, view=view)
+        DB_QUERIES.observe(stats.queries, view=view)
+        DB_DURATION.observe(stats.db_time, view=view)
+        if stats.cache_hits:
+            CACHE.inc(stats.cache_hits, view=view, result='hit')
+        if stats.cache_misses:
+            CACHE.inc(stats.cache_misses, view=view, result='miss')
+        if stats.serialize_time:
+            SERIALIZE_DURATION.observe(stats.serialize_time, view=view)
+        if stats.render_time:
+            RENDER_DURATION.observe(stats.render_time, view=view)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', False) and self.can_see_timings(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+                f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+                f'serialize;dur={stats.serialize_time * 1000:.1f}',
+                f'render;dur={stats.render_time * 1000:.1f}',
+                f'total;dur={duration * 1000:.1f}',
+            ])
+
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and stats.queries > budget:
+            BUDGET_EXCEEDED.inc(view=view)
+            message = f'{view}: {stats.queries} запросов к базе при бюджете {budget} ({request.path})'
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(f'Превышен бюджет запросов: {message}')
+        return response
+
+    @staticmethod
+    def can_see_timings(request):
+        """Server-Timing раскрывает устройство сервиса: только сотрудникам и доверенным адресам"""
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        cls, action, name = describe_view(view_func, request.method)
+        request._metrics_view = name
+        budgets = getattr(cls or view_func, 'query_budgets', None) or {}
+        request._query_budget = budgets.get(action or request.method.lower())
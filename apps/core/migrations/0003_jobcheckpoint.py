@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:44
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Задача')),
+                ('position', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Позиция')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Обработано за проход')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало прохода')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершение прохода')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Позиция периодической задачи',
+                'verbose_name_plural': 'Позиции периодических задач',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_jobcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='delivered_handlers',
+            field=models.JSONField(blank=True, default=list, verbose_name='Выполнившие обработчики'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.text import slugify
+from django.core.serializers.json import DjangoJSONEncoder
 
 class StaticPage(models.Model):
     """Модель для статических страниц (О нас, Контакты, и т.д.)"""
@@ -81,3 +82,46 @@ class Contact(models.Model):
 
     def __str__(self):
         return f"{self.subject} от {self.name}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Событие transactional outbox: записывается в той же транзакции,
+    что и изменение состояния, и доставляется обработчикам фоновым релеем
+    """
+    event_type = models.CharField("Тип события", max_length=100, db_index=True)
+    payload = models.JSONField("Данные", default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField("Создано", auto_now_add=True)
+    processed_at = models.DateTimeField("Обработано", null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    # Пути обработчиков, уже выполнивших событие: при повторе они пропускаются
+    delivered_handlers = models.JSONField("Выполнившие обработчики", default=list, blank=True)
+
+    class Meta:
+        verbose_name = "Событие outbox"
+        verbose_name_plural = "События outbox"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.id}"
+
+
+class JobCheckpoint(models.Model):
+    """Позиция прохода периодической задачи, обрабатывающей данные пачками"""
+    name = models.CharField("Задача", max_length=100, unique=True)
+    position = models.JSONField("Позиция", default=dict, encoder=DjangoJSONEncoder)
+    processed = models.PositiveIntegerField("Обработано за проход", default=0)
+    started_at = models.DateTimeField("Начало прохода", null=True, blank=True)
+    finished_at = models.DateTimeField("Завершение прохода", null=True, blank=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    class Meta:
+        verbose_name = "Позиция периодической задачи"
+        verbose_name_plural = "Позиции периодических задач"
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,114 @@
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers_cache = {}
+
+
+class OutboxService:
+    """
+    Transactional outbox: побочные эффекты (уведомления, статистика,
+    партнерские начисления) записываются событием в той же транзакции,
+    что и изменение состояния, и выполняются релеем после фиксации.
+
+    Обработчики задаются настройкой OUTBOX_HANDLERS
+    ({'order.changed': ['apps.experts.outbox.refresh_statistics', ...]})
+    и получают список payload событий одного типа. Доставка учитывается
+    по каждому обработчику: путь успешно выполнившего обработчика
+    сохраняется в delivered_handlers события в той же транзакции, что
+    и результат обработчика, поэтому при повторе события после сбоя
+    другого обработчика он не вызывается снова.
+    """
+
+    @staticmethod
+    def publish(event_type, **payload):
+        """Записывает событие. Вызывать внутри транзакции изменения состояния."""
+        return OutboxEvent.objects.create(event_type=event_type, payload=payload)
+
+    @staticmethod
+    def get_handlers(event_type):
+        """Список (путь, обработчик) для типа события"""
+        handlers = _handlers_cache.get(event_type)
+        if handlers is None:
+            paths = getattr(settings, 'OUTBOX_HANDLERS', {}).get(event_type, [])
+            handlers = [(path, import_string(path)) for path in paths]
+            _handlers_cache[event_type] = handlers
+        return handlers
+
+    @staticmethod
+    def _dispatch(path, handler, events, errors):
+        """
+        Вызывает обработчик для событий, которые он еще не выполнил; при
+        ошибке повторяет по одному событию. Успешные события отмечаются
+        путем обработчика.
+        """
+        events = [event for event in events if path not in event.delivered_handlers]
+        if not events:
+            return
+        try:
+            with transaction.atomic():
+                handler([event.payload for event in events])
+        except Exception as e:
+            if len(events) == 1:
+                errors.setdefault(events[0].id, f"{path}: {e}")
+                return
+        else:
+            for event in events:
+                event.delivered_handlers.append(path)
+            return
+
+        for event in events:
+            try:
+                with transaction.atomic():
+                    handler([event.payload])
+            except Exception as e:
+                errors.setdefault(event.id, f"{path}: {e}")
+            else:
+                event.delivered_handlers.append(path)
+
+    @staticmethod
+    def relay(batch_size=None):
+        """
+        Доставляет пачку необработанных событий обработчикам.
+        Возвращает количество доставленных и ошибочных событий.
+        """
+        batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 200)
+        max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True, attempts__lt=max_attempts)
+                .order_by('id')[:batch_size]
+            )
+            if not events:
+                return {'processed': 0, 'failed': 0}
+
+            groups = OrderedDict()
+            for event in events:
+                groups.setdefault(event.event_type, []).append(event)
+
+            errors = {}
+            for event_type, group in groups.items():
+                for path, handler in OutboxService.get_handlers(event_type):
+                    OutboxService._dispatch(path, handler, group, errors)
+
+            now = timezone.now()
+            for event in events:
+                event.attempts += 1
+                if event.id in errors:
+                    event.last_error = errors[event.id]
+                else:
+                    event.processed_at = now
+                    event.last_error = ''
+            OutboxEvent.objects.bulk_update(events, ['attempts', 'processed_at', 'last_error', 'delivered_handlers'])
+
+        for event_id, error in errors.items():
+            logger.warning(f"Событие outbox {event_id} не обработано: {error}")
+        return {'processed': len(events) - len(errors), 'failed': len(errors)}
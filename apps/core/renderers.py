@@ -0,0 +1,46 @@
+import time
+from functools import wraps
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+from .metrics import current_stats
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """JSONRenderer, учитывающий время сериализации в статистике текущего запроса"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats = current_stats()
+            if stats is not None:
+                stats.render_time += time.perf_counter() - started
+
+
+def instrument_serializers():
+    """
+    Учитывает время serializer.data (преобразование объектов в словари)
+    в статистике текущего запроса. Оно проходит внутри представления,
+    до рендерера, и включает запросы к базе, сделанные полями.
+    Вложенные вызовы .data учитываются один раз, во внешнем.
+    """
+    data = BaseSerializer.data.fget
+    if getattr(data, 'instrumented', False):
+        return
+
+    @wraps(data)
+    def timed_data(serializer):
+        stats = current_stats()
+        if stats is None or stats.serializing:
+            return data(serializer)
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return data(serializer)
+        finally:
+            stats.serializing = False
+            stats.serialize_time += time.perf_counter() - started
+
+    timed_data.instrumented = True
+    BaseSerializer.data = property(timed_data)
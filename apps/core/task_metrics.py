@@ -0,0 +1,190 @@
+"""
+Метрики задач Celery и периодических задач beat.
+
+Задачи выполняются в дочерних процессах воркеров, поэтому метрики
+собираются не в них, а в отдельном процессе-экспортере (команда
+celery_exporter) по событиям Celery из брокера: task-sent (публикация,
+в том числе из beat), task-received, task-started, task-succeeded,
+task-failed, task-retried, task-revoked. Экспортер видит задачи всех
+воркеров, поэтому замечает и перекрытия: запуск задачи, пока
+предыдущий запуск той же задачи еще выполняется.
+
+Количество обработанных строк задача сообщает сама вызовом
+record_rows(count) — событием task-rows.
+"""
+import logging
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from celery import current_task
+from .metrics import registry, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+TASKS = registry.counter('celery_tasks_total', 'Завершенные запуски задач', ('task', 'state'))
+DURATION = registry.histogram(
+    'celery_task_duration_seconds', 'Время выполнения задачи', ('task',), buckets=DURATION_BUCKETS
+)
+QUEUE_LAG = registry.histogram(
+    'celery_task_queue_lag_seconds', 'Ожидание задачи в очереди от публикации (или eta) до запуска',
+    ('task',), buckets=DURATION_BUCKETS
+)
+RETRIES = registry.counter('celery_task_retries_total', 'Повторы задач', ('task',))
+ROWS = registry.counter('celery_task_rows_processed_total', 'Строк обработано задачами', ('task',))
+RUNNING = registry.gauge('celery_task_running', 'Выполняющиеся сейчас запуски задачи', ('task',))
+OVERLAPS = registry.counter(
+    'celery_task_overlaps_total', 'Запуски задачи, пока выполнялся предыдущий запуск', ('task',)
+)
+LAST_SUCCESS = registry.gauge(
+    'celery_task_last_success_timestamp_seconds', 'Время последнего успешного завершения задачи', ('task',)
+)
+
+ROWS_EVENT = 'task-rows'
+
+
+def record_rows(count):
+    """
+    Сообщает экспортеру количество строк, обработанных текущей задачей.
+    Вне воркера (прямой вызов задачи, тесты) ничего не делает.
+    """
+    task = current_task._get_current_object()
+    if not count or task is None or task.request.called_directly or task.request.is_eager:
+        return
+    try:
+        task.send_event(ROWS_EVENT, rows=count, retry=False)
+    except Exception as e:
+        logger.warning(f"Не удалось отправить метрику задачи {task.name}: {str(e)}")
+
+
+def _timestamp(value):
+    """eta события (ISO 8601) в секундах эпохи"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class TaskEventsMonitor:
+    """
+    Превращает события Celery в метрики. Состояние запусков хранится
+    по uuid задачи до завершения, не больше max_tracked записей.
+    """
+
+    def __init__(self, max_tracked=10000):
+        self.max_tracked = max_tracked
+        self.tasks = {}  # uuid -> {'name', 'queued_at', 'started_at'}
+        self.running = {}  # имя задачи -> количество выполняющихся запусков
+        self._lock = threading.Lock()
+
+    def on_event(self, event):
+        handler = getattr(self, '_on_' + event.get('type', '').replace('-', '_'), None)
+        if handler is not None and event.get('uuid'):
+            with self._lock:
+                handler(event)
+
+    def _track(self, event):
+        state = self.tasks.get(event['uuid'])
+        if state is None:
+            if len(self.tasks) >= self.max_tracked:
+                # Запуски, о завершении которых экспортер не узнал
+                self.tasks.pop(next(iter(self.tasks)))
+            state = self.tasks[event['uuid']] = {'name': None, 'queued_at': None, 'started_at': None}
+        if event.get('name'):
+            state['name'] = event['name']
+        return state
+
+    def _queued(self, event):
+        state = self._track(event)
+        eta = _timestamp(event.get('eta'))
+        state['queued_at'] = max(event['timestamp'], eta) if eta else event['timestamp']
+
+    def _on_task_sent(self, event):
+        self._queued(event)
+
+    def _on_task_received(self, event):
+        # Без task-sent (публикация без событий) ожидание считается от получения воркером
+        state = self.tasks.get(event['uuid'])
+        if state is None or state['queued_at'] is None:
+            self._queued(event)
+        else:
+            self._track(event)
+
+    def _on_task_started(self, event):
+        state = self._track(event)
+        name = state['name'] or 'unknown'
+        if state['queued_at'] is not None:
+            QUEUE_LAG.observe(max(0.0, event['timestamp'] - state['queued_at']), task=name)
+        state['queued_at'] = None
+        state['started_at'] = event['timestamp']
+        if self.running.get(name):
+            OVERLAPS.inc(task=name)
+        self.running[name] = self.running.get(name, 0) + 1
+        RUNNING.set(self.running[name], task=name)
+
+    def _finish(self, event, result):
+        state = self.tasks.get(event['uuid'])
+        name = state['name'] if state and state['name'] else 'unknown'
+        TASKS.inc(task=name, state=result)
+        if state is None or state['started_at'] is None:
+            return state
+        runtime = event.get('runtime')
+        if runtime is None:
+            runtime = max(0.0, event['timestamp'] - state['started_at'])
+        DURATION.observe(runtime, task=name)
+        state['started_at'] = None
+        self.running[name] = max(0, self.running.get(name, 0) - 1)
+        RUNNING.set(self.running[name], task=name)
+        return state
+
+    def _on_task_succeeded(self, event):
+        self._finish(event, 'succeeded')
+        state = self.tasks.pop(event['uuid'], None)
+        if state and state['name']:
+            LAST_SUCCESS.set(event['timestamp'], task=state['name'])
+
+    def _on_task_failed(self, event):
+        self._finish(event, 'failed')
+        self.tasks.pop(event['uuid'], None)
+
+    def _on_task_revoked(self, event):
+        self._finish(event, 'revoked')
+        self.tasks.pop(event['uuid'], None)
+
+    def _on_task_retried(self, event):
+        # Запуск завершен; повтор будет опубликован с тем же uuid
+        state = self._finish(event, 'retried')
+        if state and state['name']:
+            RETRIES.inc(task=state['name'])
+
+    def _on_task_rows(self, event):
+        state = self.tasks.get(event['uuid'])
+        name = state['name'] if state and state['name'] else 'unknown'
+        ROWS.inc(int(event.get('rows') or 0), task=name)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_http_server(port, address='127.0.0.1'):
+    """Отдает метрики процесса по HTTP (/metrics) из фонового потока"""
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
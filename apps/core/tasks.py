@@ -0,0 +1,21 @@
+from celery import shared_task
+import logging
+from .outbox import OutboxService
+from .task_metrics import record_rows
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def relay_outbox(self, max_batches=20):
+    """Доставляет события outbox обработчикам"""
+    processed = 0
+    for _ in range(max_batches):
+        stats = OutboxService.relay()
+        processed += stats['processed']
+        if not stats['processed'] and not stats['failed']:
+            break
+    record_rows(processed)
+    if processed:
+        logger.info(f"Доставлено событий outbox: {processed}")
+    return processed
@@ -1,3 +1,282 @@
-from django.test import TestCase
+from unittest import mock
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.experts.models import ExpertStatistics
+from apps.orders.models import Order, Transaction, Dispute
+from .models import OutboxEvent
+from .outbox import OutboxService
 
-# Create your tests here.
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+        self.order = Order.objects.create(client=self.client_user, title='Эссе', budget=Decimal('500.00'))
+        self.url = reverse('order-take', args=[self.order.id])
+        self.client.force_authenticate(self.expert)
+
+    def test_replay_returns_stored_response(self):
+        first = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='take-1')
+        second = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='take-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Transaction.objects.filter(order=self.order).count(), 1)
+
+    def test_key_reuse_with_other_payload_is_rejected(self):
+        self.client.post(self.url, {'note': 'a'}, format='json', HTTP_IDEMPOTENCY_KEY='take-2')
+        response = self.client.post(self.url, {'note': 'b'}, format='json', HTTP_IDEMPOTENCY_KEY='take-2')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_without_key_action_runs_again(self):
+        self.client.post(self.url, {}, format='json')
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def _failing_handler(payloads):
+    if any(payload.get('fail') for payload in payloads):
+        raise ValueError('сбой обработчика')
+
+
+_recorded_payloads = []
+
+
+def _recording_handler(payloads):
+    _recorded_payloads.extend(payloads)
+
+
+class OutboxTests(APITestCase):
+    def setUp(self):
+        from apps.core.outbox import _handlers_cache
+        _handlers_cache.clear()
+        self.addCleanup(_handlers_cache.clear)
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+
+    def test_order_transition_is_relayed_to_expert_statistics(self):
+        order = Order.objects.create(client=self.client_user, expert=self.expert, title='Эссе')
+        order.status = 'completed'
+        order.save()
+
+        self.assertEqual(OutboxService.relay(), {'processed': 2, 'failed': 0})
+        self.assertEqual(ExpertStatistics.objects.get(expert=self.expert).completed_orders, 1)
+        self.assertFalse(OutboxEvent.objects.filter(processed_at__isnull=True).exists())
+
+    @override_settings(OUTBOX_HANDLERS={'test.event': ['apps.core.tests._failing_handler']})
+    def test_failed_event_does_not_block_batch(self):
+        OutboxService.publish('test.event', fail=False)
+        failing = OutboxService.publish('test.event', fail=True)
+
+        self.assertEqual(OutboxService.relay(), {'processed': 1, 'failed': 1})
+        failing.refresh_from_db()
+        self.assertIsNone(failing.processed_at)
+        self.assertEqual(failing.attempts, 1)
+        self.assertIn('сбой обработчика', failing.last_error)
+
+    @override_settings(OUTBOX_HANDLERS={
+        'test.event': ['apps.core.tests._recording_handler', 'apps.core.tests._failing_handler']
+    })
+    def test_retry_skips_handlers_that_already_succeeded(self):
+        _recorded_payloads.clear()
+        event = OutboxService.publish('test.event', fail=True)
+
+        self.assertEqual(OutboxService.relay(), {'processed': 0, 'failed': 1})
+        event.refresh_from_db()
+        self.assertEqual(event.delivered_handlers, ['apps.core.tests._recording_handler'])
+
+        OutboxEvent.objects.filter(pk=event.pk).update(payload={'fail': False})
+        self.assertEqual(OutboxService.relay(), {'processed': 1, 'failed': 0})
+        self.assertEqual(len(_recorded_payloads), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.delivered_handlers, [
+            'apps.core.tests._recording_handler', 'apps.core.tests._failing_handler'
+        ])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BenchmarkQueryBudgetTests(APITestCase):
+    """Количество запросов в замерах не превышает базовые значения из репозитория"""
+
+    def test_query_counts_within_baseline(self):
+        from django.core.cache import cache
+        from . import benchmarks
+
+        cache.clear()
+        benchmarks.seed()
+        metrics = benchmarks.run()
+        baseline = benchmarks.load_baseline()
+        query_baseline = {
+            'metrics': {name: value for name, value in baseline['metrics'].items() if name.endswith('_queries')}
+        }
+        self.assertTrue(query_baseline['metrics'])
+        self.assertEqual(benchmarks.compare(metrics, query_baseline), [])
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        from .metrics import registry
+        registry.clear()
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        Order.objects.create(client=self.client_user, title='Эссе', budget=Decimal('500.00'))
+        self.client.force_authenticate(self.client_user)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_and_prometheus_metrics(self):
+        response = self.client.get(reverse('order-list'), REMOTE_ADDR='127.0.0.1')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(response['Server-Timing'], r'serialize;dur=[\d.]+')
+
+        metrics = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertIn('http_requests_total{view="OrderViewSet.list",method="GET",status="200"} 1', metrics.content.decode())
+        self.assertIn('http_request_db_queries_count{view="OrderViewSet.list"} 1', metrics.content.decode())
+        self.assertIn('http_request_serialize_duration_seconds_count{view="OrderViewSet.list"} 1', metrics.content.decode())
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code, 404)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_only_for_staff_and_allowed_ips(self):
+        response = self.client.get(reverse('order-list'), REMOTE_ADDR='10.0.0.1')
+        self.assertNotIn('Server-Timing', response)
+
+        self.client.force_authenticate(User.objects.create_user(username='staff', password='pass', is_staff=True))
+        response = self.client.get(reverse('order-list'), REMOTE_ADDR='10.0.0.1')
+        self.assertIn('Server-Timing', response)
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('order-list'), REMOTE_ADDR='127.0.0.1'))
+
+    def test_available_queries_do_not_grow_with_page(self):
+        expert = User.objects.create_user(username='expert', password='pass', role='expert')
+        self.client.force_authenticate(expert)
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('order-available'))
+        for number in range(9):
+            order = Order.objects.create(client=self.client_user, title=f'Эссе {number}', budget=Decimal('500.00'))
+            Dispute.objects.create(order=order, reason='Спор')
+        with CaptureQueriesContext(connection) as page:
+            response = self.client.get(reverse('order-available'))
+
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(len(page.captured_queries), len(single.captured_queries))
+
+    def test_query_budget(self):
+        from apps.orders.views import OrderViewSet
+        from .middleware import QueryBudgetExceeded
+
+        with mock.patch.object(OrderViewSet, 'query_budgets', {'list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('order-list'))
+            with override_settings(QUERY_BUDGET_RAISE=False), self.assertLogs('apps.core.middleware', 'WARNING'):
+                self.assertEqual(self.client.get(reverse('order-list')).status_code, status.HTTP_200_OK)
+
+
+class TaskMetricsTests(SimpleTestCase):
+    def setUp(self):
+        from .metrics import registry
+        from .task_metrics import TaskEventsMonitor
+        registry.clear()
+        self.monitor = TaskEventsMonitor()
+
+    def send(self, type_, uuid, timestamp, **fields):
+        self.monitor.on_event({'type': type_, 'uuid': uuid, 'timestamp': timestamp, **fields})
+
+    def test_lag_duration_rows_and_overlap(self):
+        from . import task_metrics
+        name = 'apps.notifications.tasks.check_deadlines'
+
+        self.send('task-sent', 'a', 100.0, name=name)
+        self.send('task-received', 'a', 101.0, name=name)
+        self.send('task-started', 'a', 103.0)
+        self.send('task-rows', 'a', 104.0, rows=7)
+        # Следующий запуск из beat начался до завершения предыдущего
+        self.send('task-sent', 'b', 110.0, name=name)
+        self.send('task-started', 'b', 110.5)
+        self.send('task-succeeded', 'a', 115.0, runtime=12.0)
+
+        self.assertEqual(task_metrics.QUEUE_LAG.count(task=name), 2)
+        self.assertEqual(task_metrics.QUEUE_LAG._values[(name,)][2], 3.5)
+        self.assertEqual(task_metrics.DURATION._values[(name,)][2], 12.0)
+        self.assertEqual(task_metrics.ROWS.value(task=name), 7)
+        self.assertEqual(task_metrics.OVERLAPS.value(task=name), 1)
+        self.assertEqual(task_metrics.RUNNING.value(task=name), 1)
+        self.assertIn(f'celery_task_overlaps_total{{task="{name}"}} 1', task_metrics.registry.render())
+
+    def test_retry_is_counted_and_run_again(self):
+        from . import task_metrics
+        name = 'apps.experts.tasks.update_all_experts_statistics'
+
+        self.send('task-received', 'a', 100.0, name=name)
+        self.send('task-started', 'a', 100.0)
+        self.send('task-retried', 'a', 101.0)
+        self.send('task-received', 'a', 101.0, name=name, eta='1970-01-01T00:06:41+00:00')
+        self.send('task-started', 'a', 402.0)
+        self.send('task-failed', 'a', 403.0)
+
+        self.assertEqual(task_metrics.RETRIES.value(task=name), 1)
+        self.assertEqual(task_metrics.TASKS.value(task=name, state='failed'), 1)
+        self.assertEqual(task_metrics.QUEUE_LAG._values[(name,)][2], 1.0)
+        self.assertEqual(task_metrics.OVERLAPS.value(task=name), 0)
+        self.assertEqual(task_metrics.RUNNING.value(task=name), 0)
+        self.assertEqual(self.monitor.tasks, {})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ChunkedJobTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.experts = [
+            User.objects.create_user(username=f'expert{i}', password='pass', role='expert') for i in range(5)
+        ]
+
+    def test_interrupted_pass_resumes_from_checkpoint(self):
+        from apps.experts.jobs import ExpertStatisticsJob
+        from apps.experts.services import ExpertStatisticsService
+        from .models import JobCheckpoint
+
+        job = ExpertStatisticsJob()
+        job.chunk_size = 2
+        update = ExpertStatisticsService.update_expert_statistics
+        calls = []
+
+        def fail_on_fourth(expert):
+            calls.append(expert.id)
+            if len(calls) == 4:
+                raise KeyboardInterrupt
+            return update(expert)
+
+        with mock.patch.object(ExpertStatisticsService, 'update_expert_statistics', side_effect=fail_on_fourth):
+            with self.assertRaises(KeyboardInterrupt):
+                job.run()
+        self.assertEqual(JobCheckpoint.objects.get(name=job.name).position, {'last_id': self.experts[1].id})
+
+        # Блокировка снята, проход продолжается с третьего эксперта
+        with mock.patch.object(ExpertStatisticsService, 'update_expert_statistics', side_effect=update) as updated:
+            self.assertEqual(job.run(), 5)
+        self.assertEqual([call.args[0] for call in updated.call_args_list], self.experts[2:])
+        self.assertIsNotNone(JobCheckpoint.objects.get(name=job.name).finished_at)
+
+    def test_overlapping_run_is_skipped(self):
+        from apps.experts.jobs import ExpertStatisticsJob
+        from .jobs import JobLock
+
+        lock = JobLock(ExpertStatisticsJob.name, 60)
+        self.assertTrue(lock.acquire())
+        self.assertIsNone(ExpertStatisticsJob().run())
+        lock.release()
+        self.assertEqual(ExpertStatisticsJob().run(), 5)
@@ -9,5 +9,6 @@ router.register(r'faq/questions', views.FAQViewSet)
 router.register(r'contacts', views.ContactViewSet)
 
 urlpatterns = [
+    path('metrics/', views.metrics, name='metrics'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
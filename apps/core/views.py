@@ -3,9 +3,12 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from .models import StaticPage, FAQCategory, FAQ, Contact
 from .serializers import StaticPageSerializer, FAQCategorySerializer, FAQSerializer, ContactSerializer
 from apps.notifications.services import NotificationService
+from .metrics import registry, CONTENT_TYPE
 
 # Create your views here.
 
@@ -60,3 +63,10 @@ class ContactViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         contact = serializer.save()
         NotificationService.notify_new_contact(contact)
+
+
+def metrics(request):
+    """Метрики процесса в формате Prometheus; доступны с адресов METRICS_ALLOWED_IPS"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
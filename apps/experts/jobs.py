@@ -0,0 +1,30 @@
+import logging
+from apps.core.jobs import ChunkedJob
+from .services import ExpertStatisticsService
+
+logger = logging.getLogger(__name__)
+
+
+class ExpertStatisticsJob(ChunkedJob):
+    """Пересчет статистики всех экспертов пачками по возрастанию id"""
+    name = 'update_all_experts_statistics'
+
+    def start(self):
+        return {'last_id': 0}
+
+    def process_chunk(self, position):
+        from apps.users.models import User
+
+        experts = list(
+            User.objects.filter(role='expert', id__gt=position['last_id']).order_by('id')[:self.chunk_size]
+        )
+        if not experts:
+            return None, 0
+        updated = 0
+        for expert in experts:
+            try:
+                ExpertStatisticsService.update_expert_statistics(expert)
+                updated += 1
+            except Exception as e:
+                logger.error(f"Ошибка обновления статистики эксперта {expert.id}: {str(e)}")
+        return {'last_id': experts[-1].id}, updated
@@ -304,14 +304,9 @@ class ExpertStatistics(models.Model):
         else:
             self.success_rate = 0
         
-        # Обновляем общий заработок
-        from apps.orders.models import Transaction
-        earnings = Transaction.objects.filter(
-            user=self.expert,
-            type='payout'
-        ).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-        self.total_earnings = earnings
+        # Обновляем общий заработок по итогам журнала проводок
+        from apps.orders.ledger import LedgerService
+        from apps.orders.models import TransactionType
+        self.total_earnings = LedgerService.get_totals(self.expert, TransactionType.PAYOUT)
         
         self.save()
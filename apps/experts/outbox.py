@@ -0,0 +1,23 @@
+from apps.users.models import User
+from .services import ExpertStatisticsService
+
+
+def refresh_statistics(payloads):
+    """
+    Обработчик outbox 'order.changed': пересчитывает статистику экспертов,
+    затронутых сменой статуса или исполнителя. Каждый эксперт считается
+    один раз на пачку событий.
+    """
+    expert_ids = set()
+    for payload in payloads:
+        changed = set(payload['changed_fields'])
+        if not changed & {'status', 'expert_id'}:
+            continue
+        expert_ids.add(payload['expert_id'])
+        if 'expert_id' in changed:
+            # Прежний исполнитель тоже теряет заказ в статистике
+            expert_ids.add(payload['previous'].get('expert_id'))
+    expert_ids.discard(None)
+
+    for expert in User.objects.filter(id__in=expert_ids, role='expert'):
+        ExpertStatisticsService.update_expert_statistics(expert)
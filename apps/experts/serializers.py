@@ -1,11 +1,11 @@
 from rest_framework import serializers
 from .models import Specialization, ExpertDocument, ExpertReview, ExpertStatistics, ExpertRating
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import UserCardSerializer
 from apps.catalog.serializers import SubjectSerializer
 from apps.catalog.models import Subject
 
 class SpecializationSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     subject_id = serializers.PrimaryKeyRelatedField(
         write_only=True,
@@ -20,7 +20,7 @@ class SpecializationSerializer(serializers.ModelSerializer):
         read_only_fields = ['expert', 'is_verified']
 
 class ExpertDocumentSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
     document_type_display = serializers.CharField(
         source='get_document_type_display',
         read_only=True
@@ -40,8 +40,8 @@ class ExpertDocumentSerializer(serializers.ModelSerializer):
         return None
 
 class ExpertReviewSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
-    client = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
+    client = UserCardSerializer(read_only=True)
 
     class Meta:
         model = ExpertReview
@@ -71,8 +71,8 @@ class ExpertReviewSerializer(serializers.ModelSerializer):
         return data
 
 class ExpertRatingSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
-    client = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
+    client = UserCardSerializer(read_only=True)
     
     class Meta:
         model = ExpertRating
@@ -103,7 +103,7 @@ class ExpertRatingSerializer(serializers.ModelSerializer):
         return data
 
 class ExpertStatisticsSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
     
     class Meta:
         model = ExpertStatistics
@@ -115,7 +115,7 @@ class ExpertStatisticsSerializer(serializers.ModelSerializer):
         read_only_fields = fields 
 
 class ExpertMatchSerializer(serializers.ModelSerializer):
-    expert = UserSerializer()
+    expert = UserCardSerializer()
     relevance_score = serializers.FloatField()
     current_workload = serializers.IntegerField()
     avg_rating = serializers.FloatField()
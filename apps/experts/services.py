@@ -2,7 +2,8 @@ from django.db.models import Avg, Count, Q, Sum, F, ExpressionWrapper, FloatFiel
 from django.utils import timezone
 from datetime import timedelta
 from .models import ExpertStatistics, Specialization
-from apps.orders.models import Order
+from apps.orders.models import Order, TransactionType
+from apps.orders.ledger import LedgerService
 
 
 class ExpertMatchingService:
@@ -119,14 +120,8 @@ class ExpertStatisticsService:
             status='cancelled'
         ).count()
 
-        # Подсчет заработка
-        total_earnings = Order.objects.filter(
-            expert=expert,
-            status='completed',
-            payment_status='paid'
-        ).aggregate(
-            total=Sum('expert_payment')
-        )['total'] or 0
+        # Заработок берется из помесячных итогов журнала проводок
+        total_earnings = LedgerService.get_totals(expert, TransactionType.PAYOUT)
 
         # Средний рейтинг
         average_rating = expert.reviews.filter(
@@ -143,9 +138,8 @@ class ExpertStatisticsService:
             success_rate = 0
 
         # Обновление статистики
-        statistics.orders_completed = orders_completed
-        statistics.orders_in_progress = orders_in_progress
-        statistics.orders_cancelled = orders_cancelled
+        statistics.total_orders = orders_completed + orders_in_progress + orders_cancelled
+        statistics.completed_orders = orders_completed
         statistics.total_earnings = total_earnings
         statistics.average_rating = round(average_rating, 2)
         statistics.success_rate = round(success_rate, 2)
@@ -153,17 +147,3 @@ class ExpertStatisticsService:
         statistics.save()
 
         return statistics
-
-    @staticmethod
-    def update_all_experts_statistics():
-        """Обновляет статистику всех экспертов"""
-        from apps.users.models import User
-        experts = User.objects.filter(role='expert')
-        updated_count = 0
-        for expert in experts:
-            try:
-                ExpertStatisticsService.update_expert_statistics(expert)
-                updated_count += 1
-            except Exception as e:
-                print(f"Ошибка обновления статистики эксперта {expert.id}: {str(e)}")
-        return updated_count 
\ No newline at end of file
@@ -1,22 +1,30 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from apps.orders.models import Order
-from .models import ExpertReview
+from django.db import transaction
+from apps.catalog.services import CatalogCounterService
+from apps.users.services import UserCardService
+from .models import ExpertReview, ExpertStatistics, Specialization
 from .tasks import update_expert_statistics
 
 
-@receiver(post_save, sender=Order)
-def update_expert_stats_on_order_change(sender, instance, **kwargs):
-    """
-    Обновляет статистику эксперта при изменении заказа
-    """
-    if instance.expert_id:
-        update_expert_statistics.delay(instance.expert_id)
-
-
 @receiver(post_save, sender=ExpertReview)
 def update_expert_stats_on_review_change(sender, instance, **kwargs):
     """
-    Обновляет статистику эксперта при добавлении или изменении отзыва
+    Обновляет статистику эксперта при добавлении или изменении отзыва.
+    Задача ставится после фиксации транзакции, чтобы не читать незафиксированные данные.
     """
-    update_expert_statistics.delay(instance.expert_id) 
\ No newline at end of file
+    expert_id = instance.expert_id
+    transaction.on_commit(lambda: update_expert_statistics.delay(expert_id))
+ 
+
+@receiver(post_save, sender=ExpertStatistics)
+def invalidate_expert_card(sender, instance, **kwargs):
+    """Рейтинг в карточке эксперта берется из статистики"""
+    UserCardService.invalidate(instance.expert_id)
+
+
+@receiver(post_save, sender=Specialization)
+@receiver(post_delete, sender=Specialization)
+def update_subject_expert_counters(sender, instance, **kwargs):
+    """Пересчитывает количество экспертов предмета"""
+    CatalogCounterService.refresh_subject_membership(instance.subject_id)
@@ -1,5 +1,6 @@
 from celery import shared_task
 import logging
+from .jobs import ExpertStatisticsJob
 from .services import ExpertStatisticsService
 
 logger = logging.getLogger(__name__)
@@ -23,10 +24,16 @@ def update_expert_statistics(self, expert_id):
 
 @shared_task(bind=True)
 def update_all_experts_statistics(self):
-    """Обновляет статистику всех экспертов"""
+    """
+    Обновляет статистику всех экспертов. Пока выполняется один запуск,
+    следующие пропускаются; прерванный проход продолжается с последней пачки.
+    """
     try:
-        updated_count = ExpertStatisticsService.update_all_experts_statistics()
+        updated_count = ExpertStatisticsJob().run()
+        if updated_count is None:
+            return None
         logger.info(f"Обновлена статистика {updated_count} экспертов")
     except Exception as e:
         logger.error(f"Ошибка массового обновления статистики: {str(e)}")
-        raise self.retry(exc=e, countdown=300) 
\ No newline at end of file
+        raise self.retry(exc=e, countdown=300)
+    return updated_count
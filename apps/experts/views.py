@@ -13,9 +13,13 @@ from .serializers import (
 from apps.notifications.services import NotificationService
 from rest_framework.parsers import MultiPartParser, FormParser
 from .services import ExpertMatchingService
-from apps.orders.models import Order, Transaction
+from apps.orders.models import Order
+from apps.orders.ledger import LedgerService
+from apps.orders.escrow import EscrowService
+from apps.core.idempotency import idempotent
+from apps.core.outbox import OutboxService
 from apps.users.models import User
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 # Create your views here.
@@ -322,18 +326,8 @@ class ExpertDashboardViewSet(viewsets.ViewSet):
         if created:
             stats.update_statistics()
         
-        # Дополнительная статистика
-        total_earnings = Transaction.objects.filter(
-            user=request.user,
-            type='payout'
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
-        
-        monthly_earnings = Transaction.objects.filter(
-            user=request.user,
-            type='payout',
-            timestamp__month=timezone.now().month,
-            timestamp__year=timezone.now().year
-        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        # Заработок из помесячных итогов журнала
+        earnings = LedgerService.get_earnings(request.user)
         
         active_orders_count = Order.objects.filter(
             expert=request.user,
@@ -358,8 +352,8 @@ class ExpertDashboardViewSet(viewsets.ViewSet):
         ).count()
         
         return Response({
-            'total_earnings': float(total_earnings),
-            'monthly_earnings': float(monthly_earnings),
+            'total_earnings': float(earnings['total']),
+            'monthly_earnings': float(earnings['monthly']),
             'active_orders': active_orders_count,
             'completed_orders': completed_orders_count,
             'average_rating': float(avg_rating),
@@ -587,6 +581,7 @@ class ExpertDashboardViewSet(viewsets.ViewSet):
         })
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def take_order(self, request):
         """Взять заказ в работу"""
         if request.user.role != 'expert':
@@ -627,10 +622,11 @@ class ExpertDashboardViewSet(viewsets.ViewSet):
         # Назначаем эксперта на заказ
         order.expert = request.user
         order.status = 'in_progress'
-        order.save()
-        
-        # Отправляем уведомление клиенту
-        NotificationService.notify_expert_assigned(order)
+        with transaction.atomic():
+            order.save()
+            EscrowService.hold(order)
+            # Уведомление клиенту отправит релей outbox
+            OutboxService.publish('order.taken', order_id=order.id)
         
         return Response({
             'detail': 'Заказ успешно взят в работу',
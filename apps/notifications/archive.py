@@ -0,0 +1,122 @@
+"""
+Архив уведомлений.
+
+Уведомления старше NOTIFICATION_ARCHIVE_AFTER_DAYS переносит в таблицу
+NotificationArchive задача archive_notifications (NotificationArchiveJob),
+поэтому основная таблица, которую лента сортирует по -created_at, остается
+небольшой. Архив разбит по месяцам: старые месяцы команда
+export_notification_archive выгружает в файлы JSONL, сжатые gzip,
+и удаляет из базы.
+
+Лента уведомлений (NotificationFeed) листается сначала по основной
+таблице, затем по архиву, так что клиент не видит границы между ними.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+from functools import cached_property
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+# Поля уведомления, сохраняемые в архиве и в файлах выгрузки
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'type', 'title', 'message', 'related_object_id',
+                  'related_object_type', 'is_read', 'created_at')
+
+
+def archive_month(created_at):
+    """Месяц архива (первое число) для времени создания уведомления"""
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+def recent_notifications(notifications):
+    """
+    Уведомления основной таблицы для ленты. Уведомления со сроком действия
+    не архивируются и остаются в основной таблице до очистки; старше
+    NOTIFICATION_ARCHIVE_AFTER_DAYS они в ленту не выводятся, иначе
+    оказались бы перед более новыми архивными.
+    """
+    days = getattr(settings, 'NOTIFICATION_ARCHIVE_AFTER_DAYS', 30)
+    return notifications.exclude(
+        expires_at__isnull=False, created_at__lt=timezone.now() - timedelta(days=days)
+    )
+
+
+class NotificationFeed:
+    """
+    Уведомления пользователя для Paginator: сначала основная таблица,
+    затем архив. recent должен содержать только уведомления не старше
+    архивных (см. recent_notifications), тогда порядок по -created_at
+    сохраняется и на границе таблиц. Архивные строки имеют те же поля,
+    что и Notification, и выводятся тем же сериализатором.
+    """
+
+    def __init__(self, recent, archived):
+        self.recent = recent
+        self.archived = archived
+
+    @cached_property
+    def recent_count(self):
+        return self.recent.count()
+
+    def count(self):
+        return self.recent_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError("Лента уведомлений поддерживает только срезы без шага")
+        start = key.start or 0
+        stop = self.count() if key.stop is None else key.stop
+        items = []
+        # Пока страница в пределах основной таблицы, архив не запрашивается
+        if start < self.recent_count:
+            items.extend(self.recent[start:min(stop, self.recent_count)])
+        if stop > self.recent_count:
+            items.extend(self.archived[max(0, start - self.recent_count):stop - self.recent_count])
+        return items
+
+
+class NotificationArchiveService:
+    @staticmethod
+    def export_path(directory, month):
+        return Path(directory) / f'notifications-{month:%Y-%m}.jsonl.gz'
+
+    @staticmethod
+    def export_month(month, directory, chunk_size=2000):
+        """
+        Выгружает месяц архива в файл JSONL, сжатый gzip. Строки читаются
+        из базы потоком по chunk_size; файл пишется под временным именем
+        и переименовывается после записи. Возвращает (путь, строк).
+        """
+        from .models import NotificationArchive
+
+        path = NotificationArchiveService.export_path(directory, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + '.tmp')
+        rows = NotificationArchive.objects.filter(month=month).order_by('id').values(*ARCHIVE_FIELDS)
+        exported = 0
+        with gzip.open(temporary, 'wt', encoding='utf-8') as file:
+            for row in rows.iterator(chunk_size=chunk_size):
+                file.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+                exported += 1
+        os.replace(temporary, path)
+        return path, exported
+
+    @staticmethod
+    def delete_month(month, batch_size=1000):
+        """Удаляет месяц архива пачками по первичному ключу; возвращает количество строк"""
+        from .models import NotificationArchive
+
+        deleted = 0
+        while True:
+            pks = list(
+                NotificationArchive.objects.filter(month=month).order_by().values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return deleted
+            deleted += NotificationArchive.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,173 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.core.jobs import ChunkedJob
+from apps.orders.models import Order
+from .archive import ARCHIVE_FIELDS, archive_month
+from .models import Notification, NotificationArchive, NotificationType
+from .services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# За сколько часов до дедлайна напоминать, по возрастанию
+DEADLINE_REMINDER_HOURS = (2, 6, 12, 24)
+
+
+class DeadlineReminderJob(ChunkedJob):
+    """
+    Напоминания о приближающихся дедлайнах. Заказ получает напоминание
+    с наименьшим порогом, в который попадает его дедлайн, если за это
+    время напоминаний о нем еще не было.
+    """
+    name = 'check_deadlines'
+    # Проход, прерванный больше получаса назад (интервал beat), устарел
+    stale_after = 30 * 60
+
+    def start(self):
+        return {'now': timezone.now().isoformat(), 'last_id': 0}
+
+    def process_chunk(self, position):
+        now = parse_datetime(position['now'])
+        orders = list(
+            Order.objects.filter(
+                status__in=['in_progress', 'revision'],
+                deadline__gt=now,
+                deadline__lte=now + timedelta(hours=DEADLINE_REMINDER_HOURS[-1]),
+                id__gt=position['last_id']
+            ).select_related('client', 'expert').order_by('id')[:self.chunk_size]
+        )
+        if not orders:
+            return None, 0
+
+        last_reminders = dict(
+            Notification.objects.filter(
+                type=NotificationType.DEADLINE_SOON,
+                related_object_type='order',
+                related_object_id__in=[order.id for order in orders],
+                created_at__gte=now - timedelta(hours=DEADLINE_REMINDER_HOURS[-1])
+            ).values('related_object_id').annotate(
+                last=Max('created_at')
+            ).values_list('related_object_id', 'last')
+        )
+
+        sent = 0
+        for order in orders:
+            hours = next(h for h in DEADLINE_REMINDER_HOURS if order.deadline <= now + timedelta(hours=h))
+            last = last_reminders.get(order.id)
+            if last is not None and last >= now - timedelta(hours=hours):
+                continue
+            try:
+                NotificationService.notify_deadline_soon(order, hours)
+                sent += 1
+            except Exception as e:
+                logger.error(f"Ошибка отправки уведомления о дедлайне для заказа {order.id}: {str(e)}")
+        return {'now': position['now'], 'last_id': orders[-1].id}, sent
+
+
+class NotificationRetentionJob(ChunkedJob):
+    """
+    Удаление старых прочитанных и истекших уведомлений.
+
+    Шаги прохода: прочитанные уведомления каждого типа из
+    NOTIFICATION_RETENTION_DAYS старше своего срока, прочитанные
+    уведомления остальных типов старше NOTIFICATION_RETENTION_DEFAULT_DAYS
+    (индекс is_read, created_at), истекшие уведомления (индекс expires_at);
+    затем те же сроки хранения — для архива уведомлений.
+    На каждом шаге первичные ключи выбираются пачками по chunk_size
+    и удаляются отдельным коротким DELETE по первичному ключу.
+    Количество удаленных по шагам копится в позиции прохода (counts).
+    """
+    name = 'cleanup_old_notifications'
+
+    def __init__(self):
+        super().__init__()
+        self.chunk_size = getattr(settings, 'NOTIFICATION_CLEANUP_BATCH_SIZE', 1000)
+        self.pause = getattr(settings, 'NOTIFICATION_CLEANUP_PAUSE', 0.5)
+
+    @staticmethod
+    def steps():
+        """Шаги прохода: (название для отчета, модель, тип или None — прочие типы, срок хранения в днях)"""
+        retention = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {})
+        windows = [
+            *retention.items(),
+            (None, getattr(settings, 'NOTIFICATION_RETENTION_DEFAULT_DAYS', 30)),
+        ]
+        return [
+            *[(type or 'default', Notification, type, days) for type, days in windows],
+            ('expired', Notification, None, None),
+            *[(f"archive:{type or 'default'}", NotificationArchive, type, days) for type, days in windows],
+        ]
+
+    @staticmethod
+    def queryset(step, now):
+        label, model, type, days = NotificationRetentionJob.steps()[step]
+        if days is None:
+            return model.objects.filter(expires_at__lt=now).order_by('expires_at')
+        notifications = model.objects.filter(is_read=True, created_at__lt=now - timedelta(days=days))
+        if type is None:
+            notifications = notifications.exclude(type__in=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', {}))
+        else:
+            notifications = notifications.filter(type=type)
+        return notifications.order_by('created_at')
+
+    def start(self):
+        return {'now': timezone.now().isoformat(), 'step': 0, 'counts': {}}
+
+    def process_chunk(self, position):
+        steps = self.steps()
+        step = position['step']
+        if step >= len(steps):
+            return None, 0
+
+        now = parse_datetime(position['now'])
+        label, model = steps[step][:2]
+        pks = list(self.queryset(step, now).values_list('pk', flat=True)[:self.chunk_size])
+        # Без каскадов и сигналов Django удаляет одним DELETE ... WHERE id IN (...)
+        deleted = model.objects.filter(pk__in=pks).delete()[0] if pks else 0
+
+        counts = {**position['counts'], label: position['counts'].get(label, 0) + deleted}
+        if len(pks) < self.chunk_size:
+            step += 1
+        return {'now': position['now'], 'step': step, 'counts': counts}, deleted
+
+
+class NotificationArchiveJob(ChunkedJob):
+    """
+    Перенос уведомлений старше NOTIFICATION_ARCHIVE_AFTER_DAYS в архив
+    пачками по первичному ключу: вставка в архив и удаление из основной
+    таблицы — в одной транзакции. Уведомления со сроком действия
+    (expires_at) не архивируются: их удаляет очистка.
+    """
+    name = 'archive_notifications'
+
+    def __init__(self):
+        super().__init__()
+        self.chunk_size = getattr(settings, 'NOTIFICATION_ARCHIVE_BATCH_SIZE', 1000)
+        self.pause = getattr(settings, 'NOTIFICATION_CLEANUP_PAUSE', 0.5)
+
+    def start(self):
+        days = getattr(settings, 'NOTIFICATION_ARCHIVE_AFTER_DAYS', 30)
+        return {'cutoff': (timezone.now() - timedelta(days=days)).isoformat(), 'last_id': 0}
+
+    def process_chunk(self, position):
+        rows = list(
+            Notification.objects.filter(
+                created_at__lt=parse_datetime(position['cutoff']),
+                expires_at__isnull=True,
+                id__gt=position['last_id']
+            ).order_by('id').values(*ARCHIVE_FIELDS)[:self.chunk_size]
+        )
+        if not rows:
+            return None, 0
+
+        with transaction.atomic():
+            # Повтор пачки после сбоя до сохранения позиции не создает дублей
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(month=archive_month(row['created_at']), **row) for row in rows
+            ], ignore_conflicts=True)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        return {'cutoff': position['cutoff'], 'last_id': rows[-1]['id']}, len(rows)
@@ -0,0 +1,43 @@
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.notifications.archive import NotificationArchiveService
+from apps.notifications.models import NotificationArchive
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает старые месяцы архива уведомлений в файлы JSONL (gzip) '
+        'и удаляет их из базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help='Первый месяц, который остается в базе, ГГГГ-ММ '
+                 '(по умолчанию — NOTIFICATION_ARCHIVE_EXPORT_MONTHS месяцев назад)'
+        )
+        parser.add_argument('--dir', help='Каталог файлов (по умолчанию NOTIFICATION_ARCHIVE_DIR)')
+        parser.add_argument('--keep', action='store_true', help='Только выгрузить, не удаляя из базы')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = date.fromisoformat(options['before'] + '-01')
+            except ValueError:
+                raise CommandError('Месяц нужно указать в формате ГГГГ-ММ')
+        else:
+            today = timezone.localdate()
+            index = today.year * 12 + today.month - 1 - settings.NOTIFICATION_ARCHIVE_EXPORT_MONTHS
+            before = date(index // 12, index % 12 + 1, 1)
+        directory = options['dir'] or settings.NOTIFICATION_ARCHIVE_DIR
+
+        months = NotificationArchive.objects.filter(
+            month__lt=before
+        ).order_by('month').values_list('month', flat=True).distinct()
+        for month in months:
+            path, exported = NotificationArchiveService.export_month(month, directory)
+            deleted = 0 if options['keep'] else NotificationArchiveService.delete_month(month)
+            self.stdout.write(f'{month:%Y-%m}: выгружено {exported} в {path}, удалено из базы {deleted}')
+        self.stdout.write(self.style.SUCCESS(f'Архив уведомлений до {before:%Y-%m} выгружен'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_alter_notification_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID уведомления')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('type', models.CharField(choices=[('new_order', 'Новый заказ'), ('order_taken', 'Заказ принят'), ('file_uploaded', 'Загружен файл'), ('new_comment', 'Новый комментарий'), ('status_changed', 'Изменен статус'), ('deadline_soon', 'Скоро дедлайн'), ('document_verified', 'Документ проверен'), ('specialization_verified', 'Специализация подтверждена'), ('review_received', 'Получен отзыв'), ('new_rating', 'Новый рейтинг'), ('rating_milestone', 'Достижение рейтинга'), ('payment_received', 'Получена оплата'), ('order_completed', 'Заказ завершен'), ('new_contact', 'Новое обращение')], max_length=30, verbose_name='Тип уведомления')),
+                ('title', models.CharField(max_length=255, verbose_name='Заголовок')),
+                ('message', models.TextField(verbose_name='Сообщение')),
+                ('related_object_id', models.IntegerField(blank=True, null=True, verbose_name='ID связанного объекта')),
+                ('related_object_type', models.CharField(blank=True, max_length=50, null=True, verbose_name='Тип связанного объекта')),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('created_at', models.DateTimeField(verbose_name='Создано')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'verbose_name': 'Архивное уведомление',
+                'verbose_name_plural': 'Архивные уведомления',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient', '-created_at'], name='notificatio_recipie_914bcc_idx'), models.Index(fields=['is_read', 'created_at'], name='notificatio_is_read_7b3c15_idx'), models.Index(fields=['month'], name='notificatio_month_6eaefd_idx')],
+            },
+        ),
+    ]
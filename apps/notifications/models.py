@@ -87,4 +87,44 @@ class Notification(models.Model):
     def is_expired(self):
         if self.expires_at:
             return timezone.now() > self.expires_at
-        return False 
\ No newline at end of file
+        return False 
+
+class NotificationArchive(models.Model):
+    """
+    Архив уведомлений старше NOTIFICATION_ARCHIVE_AFTER_DAYS. Хранит только
+    поля, нужные ленте уведомлений; строки разбиты по месяцам создания
+    (month), месяц целиком выгружается в файл и удаляется командой
+    export_notification_archive.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID уведомления")
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications',
+        verbose_name="Получатель"
+    )
+    month = models.DateField(verbose_name="Месяц")
+    type = models.CharField(
+        max_length=30,
+        choices=NotificationType.choices,
+        verbose_name="Тип уведомления"
+    )
+    title = models.CharField(max_length=255, verbose_name="Заголовок")
+    message = models.TextField(verbose_name="Сообщение")
+    related_object_id = models.IntegerField(null=True, blank=True, verbose_name="ID связанного объекта")
+    related_object_type = models.CharField(max_length=50, null=True, blank=True, verbose_name="Тип связанного объекта")
+    is_read = models.BooleanField(default=False, verbose_name="Прочитано")
+    created_at = models.DateTimeField(verbose_name="Создано")
+
+    class Meta:
+        verbose_name = "Архивное уведомление"
+        verbose_name_plural = "Архивные уведомления"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['is_read', 'created_at']),
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_type_display()})"
@@ -0,0 +1,77 @@
+"""
+Обработчики outbox-событий, рассылающие уведомления.
+Каждый получает список payload событий одного типа и загружает
+связанные объекты одним запросом.
+"""
+from apps.orders.models import Order, Bid, Dispute
+from .services import NotificationService
+
+
+def _orders(payloads):
+    return Order.objects.select_related('client', 'expert').in_bulk(
+        {payload['order_id'] for payload in payloads}
+    )
+
+
+def _disputes(payloads):
+    return Dispute.objects.select_related('order__client', 'order__expert', 'arbitrator').in_bulk(
+        {payload['dispute_id'] for payload in payloads}
+    )
+
+
+def order_taken(payloads):
+    orders = _orders(payloads)
+    for payload in payloads:
+        order = orders.get(payload['order_id'])
+        if order:
+            NotificationService.notify_order_taken(order)
+
+
+def order_status_changed(payloads):
+    orders = _orders(payloads)
+    for payload in payloads:
+        order = orders.get(payload['order_id'])
+        if order:
+            NotificationService.notify_status_changed(order, payload['old_status'])
+
+
+def bid_created(payloads):
+    bids = Bid.objects.select_related('order__client', 'expert').in_bulk(
+        {payload['bid_id'] for payload in payloads}
+    )
+    for payload in payloads:
+        bid = bids.get(payload['bid_id'])
+        if bid:
+            NotificationService.notify_new_bid(bid)
+
+
+def dispute_created(payloads):
+    disputes = _disputes(payloads)
+    for payload in payloads:
+        dispute = disputes.get(payload['dispute_id'])
+        if dispute:
+            NotificationService.notify_dispute_created(dispute)
+
+
+def arbitrator_assigned(payloads):
+    disputes = _disputes(payloads)
+    for payload in payloads:
+        dispute = disputes.get(payload['dispute_id'])
+        if dispute:
+            NotificationService.notify_arbitrator_assigned(dispute)
+
+
+def dispute_resolved(payloads):
+    disputes = _disputes(payloads)
+    for payload in payloads:
+        dispute = disputes.get(payload['dispute_id'])
+        if dispute:
+            NotificationService.notify_dispute_resolved(dispute)
+
+
+def payment_completed(payloads):
+    orders = _orders(payloads)
+    for payload in payloads:
+        order = orders.get(payload['order_id'])
+        if order:
+            NotificationService.notify_payment_received(order)
@@ -55,6 +55,18 @@ class NotificationService:
             related_object_type='order'
         )
 
+    @staticmethod
+    def notify_new_bid(bid):
+        # Уведомляем клиента о новой ставке по его заказу
+        NotificationService.create_notification(
+            recipient=bid.order.client,
+            type=NotificationType.NEW_ORDER,  # Используем существующий тип
+            title="Новая ставка по заказу",
+            message=f"Эксперт {bid.expert} предложил {bid.amount} ₽ за заказ '{bid.order.title or 'Без названия'}'",
+            related_object_id=bid.order_id,
+            related_object_type='order'
+        )
+
     @staticmethod
     def notify_file_uploaded(order_file):
         # Уведомляем заинтересованных пользователей о новом файле
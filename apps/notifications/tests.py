@@ -0,0 +1,139 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from apps.orders.models import Order
+from .archive import NotificationArchiveService, archive_month
+from .jobs import DeadlineReminderJob, NotificationArchiveJob, NotificationRetentionJob
+from .models import Notification, NotificationArchive
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, NOTIFICATION_ARCHIVE_BATCH_SIZE=3, NOTIFICATION_CLEANUP_PAUSE=0)
+class NotificationArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='client', password='pass', role='client')
+        now = timezone.now()
+        # 12 уведомлений, по одному в 5 дней: 6 новее 30 дней и 6 старше
+        self.notifications = [
+            Notification.objects.create(
+                recipient=self.user, type='new_comment', title=f'Уведомление {i}', message='-',
+                created_at=now - timedelta(days=5 * i, hours=1)
+            )
+            for i in range(12)
+        ]
+        self.notifications[-1].expires_at = now - timedelta(days=1)
+        self.notifications[-1].save()
+
+    def test_old_notifications_are_moved_to_archive(self):
+        self.assertEqual(NotificationArchiveJob().run(), 5)
+        self.assertEqual(Notification.objects.count(), 7)
+        archived = NotificationArchive.objects.get(pk=self.notifications[6].pk)
+        self.assertEqual(archived.title, 'Уведомление 6')
+        self.assertEqual(archived.month, archive_month(self.notifications[6].created_at))
+
+    def test_feed_pages_into_archive(self):
+        NotificationArchiveJob().run()
+        self.client.force_authenticate(self.user)
+        titles = []
+        url = reverse('notification-list')
+        while url:
+            response = self.client.get(url).json()
+            self.assertEqual(response['count'], 11)
+            titles += [item['title'] for item in response['results']]
+            url = response['next']
+        # Старое уведомление со сроком действия не архивируется и в ленту не попадает
+        self.assertEqual(titles, [n.title for n in self.notifications[:11]])
+
+    def test_archived_notification_detail_actions(self):
+        NotificationArchiveJob().run()
+        self.client.force_authenticate(self.user)
+        pk = self.notifications[8].pk
+        url = reverse('notification-detail', args=[pk])
+        self.assertEqual(self.client.get(url).json()['title'], 'Уведомление 8')
+        response = self.client.post(reverse('notification-mark-read', args=[pk]))
+        self.assertTrue(response.json()['is_read'])
+        self.assertTrue(NotificationArchive.objects.get(pk=pk).is_read)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(NotificationArchive.objects.filter(pk=pk).exists())
+
+    def test_export_month_to_jsonl(self):
+        NotificationArchiveJob().run()
+        month = NotificationArchive.objects.order_by('month').values_list('month', flat=True).first()
+        rows = NotificationArchive.objects.filter(month=month).count()
+        with tempfile.TemporaryDirectory() as directory:
+            path, exported = NotificationArchiveService.export_month(month, directory, chunk_size=2)
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                lines = [json.loads(line) for line in file]
+        self.assertEqual(exported, rows)
+        self.assertEqual(len(lines), rows)
+        self.assertEqual(NotificationArchiveService.delete_month(month, batch_size=1), rows)
+        self.assertFalse(NotificationArchive.objects.filter(month=month).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class NotificationJobTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+
+    def test_deadline_reminders_are_not_repeated(self):
+        order = Order.objects.create(
+            client=self.client_user, expert=self.expert, title='Эссе', status='in_progress',
+            deadline=timezone.now() + timedelta(hours=5)
+        )
+        Order.objects.create(
+            client=self.client_user, title='Курсовая', status='in_progress', deadline=timezone.now() + timedelta(days=3)
+        )
+
+        self.assertEqual(DeadlineReminderJob().run(), 1)
+        self.assertEqual(DeadlineReminderJob().run(), 0)
+        reminders = Notification.objects.filter(related_object_type='order', related_object_id=order.id)
+        self.assertEqual(reminders.count(), 2)
+        self.assertIn('6 часов', reminders.first().message)
+
+    @override_settings(NOTIFICATION_CLEANUP_BATCH_SIZE=2, NOTIFICATION_CLEANUP_PAUSE=0)
+    def test_retention_deletes_in_batches(self):
+        now = timezone.now()
+
+        def notify(type, days_ago, is_read=True, **fields):
+            return Notification.objects.create(
+                recipient=self.expert, type=type, title='-', message='-',
+                is_read=is_read, created_at=now - timedelta(days=days_ago), **fields
+            )
+
+        for _ in range(3):
+            notify('new_order', 40)
+        kept = [
+            notify('order_taken', 40),  # Срок хранения 90 дней
+            notify('new_comment', 40, is_read=False),
+            notify('new_comment', 10),
+        ]
+        notify('new_comment', 40)
+        notify('deadline_soon', 1, is_read=False, expires_at=now - timedelta(hours=1))
+
+        job = NotificationRetentionJob()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(job.run(), 5)
+        self.assertEqual(job.checkpoint.position['counts'], {
+            'new_order': 3, 'order_taken': 0, 'order_completed': 0, 'review_received': 0,
+            'default': 1, 'expired': 1, 'archive:new_order': 0, 'archive:order_taken': 0,
+            'archive:order_completed': 0, 'archive:review_received': 0, 'archive:default': 0
+        })
+        self.assertCountEqual(Notification.objects.values_list('pk', flat=True), [n.pk for n in kept])
+        deletes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 4)
+        self.assertTrue(all('IN' in sql for sql in deletes))
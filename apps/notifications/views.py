@@ -1,24 +1,50 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
+from django.http import Http404
 from django.utils import timezone
-from .models import Notification
+from .archive import NotificationFeed, recent_notifications
+from .models import Notification, NotificationArchive
 from .serializers import NotificationSerializer
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Лента — основная таблица, затем архив, поэтому всегда по -created_at
+    ordering_fields = []
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
 
+    def get_object(self):
+        # Перенесенное в архив уведомление сохраняет id: его можно получить,
+        # отметить прочитанным и удалить так же, как уведомление из основной таблицы
+        try:
+            return super().get_object()
+        except Http404:
+            return get_object_or_404(
+                NotificationArchive.objects.filter(recipient=self.request.user),
+                pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            )
+
+    def list(self, request, *args, **kwargs):
+        # За последними уведомлениями лента продолжается архивом
+        feed = NotificationFeed(
+            recent_notifications(self.filter_queryset(self.get_queryset())),
+            self.filter_queryset(NotificationArchive.objects.filter(recipient=request.user))
+        )
+        page = self.paginate_queryset(feed)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
     def perform_create(self, serializer):
         serializer.save(recipient=self.request.user)
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         self.get_queryset().update(is_read=True)
+        NotificationArchive.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
         return Response(status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
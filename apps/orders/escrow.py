@@ -0,0 +1,167 @@
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum, DecimalField, Value
+from django.db.models.functions import Coalesce
+from .ledger import LedgerService
+from .models import Order, Transaction, TransactionType
+
+ZERO = Decimal('0.00')
+
+
+def held_totals(prefix=''):
+    """Выражения для подсчета удержанных средств заказа по его проводкам"""
+    amount = f'{prefix}amount'
+    type = f'{prefix}type'
+    output = DecimalField(max_digits=12, decimal_places=2)
+    held_in = Coalesce(
+        Sum(amount, filter=Q(**{type: TransactionType.HOLD})),
+        Value(ZERO),
+        output_field=output
+    )
+    held_out = Coalesce(
+        Sum(amount, filter=Q(**{f'{type}__in': [TransactionType.RELEASE, TransactionType.REFUND]})),
+        Value(ZERO),
+        output_field=output
+    )
+    return held_in, held_out
+
+
+class EscrowService:
+    """
+    Escrow заказа поверх журнала проводок:
+    - принятие ставки / взятие заказа: HOLD бюджета у клиента
+    - завершение: заказ попадает в пакетную выплату (RELEASE, PAYOUT, COMMISSION)
+    - решение спора: выплата исполнителю или REFUND клиенту
+    Методы вызываются внутри той же транзакции, что и изменение заказа.
+    """
+
+    @staticmethod
+    def commission_for(amount):
+        """Комиссия платформы с суммы выплаты"""
+        rate = Decimal(str(getattr(settings, 'PLATFORM_COMMISSION_RATE', '10')))
+        return (Decimal(amount) * rate / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def held_amount(order):
+        """Сумма, удерживаемая в escrow по заказу"""
+        held_in, held_out = held_totals()
+        totals = Transaction.objects.filter(order=order).aggregate(
+            held_in=held_in,
+            held_out=held_out
+        )
+        return totals['held_in'] - totals['held_out']
+
+    @staticmethod
+    def _lock(order):
+        Order.objects.select_for_update().filter(pk=order.pk).values_list('pk', flat=True).first()
+
+    @staticmethod
+    def hold(order):
+        """
+        Приводит удержание по заказу к текущему бюджету:
+        доудерживает разницу или возвращает излишек клиенту.
+        """
+        with transaction.atomic():
+            EscrowService._lock(order)
+            delta = Decimal(order.budget) - EscrowService.held_amount(order)
+            if delta > 0:
+                return LedgerService.post(order.client, order, delta, TransactionType.HOLD)
+            if delta < 0:
+                return LedgerService.post(order.client, order, -delta, TransactionType.REFUND)
+        return None
+
+    @staticmethod
+    def release(order):
+        """Выплачивает исполнителю удержанные средства за вычетом комиссии"""
+        if not order.expert_id:
+            raise ValueError("У заказа нет исполнителя для выплаты")
+        with transaction.atomic():
+            EscrowService._lock(order)
+            held = EscrowService.held_amount(order)
+            if held <= 0:
+                return []
+            return LedgerService.transfer(
+                order,
+                order.client,
+                order.expert,
+                held,
+                commission=EscrowService.commission_for(held)
+            )
+
+    @staticmethod
+    def refund(order):
+        """Возвращает клиенту удержанные по заказу средства"""
+        with transaction.atomic():
+            EscrowService._lock(order)
+            held = EscrowService.held_amount(order)
+            if held <= 0:
+                return None
+            return LedgerService.post(order.client, order, held, TransactionType.REFUND)
+
+    @staticmethod
+    def payable_orders():
+        """Завершенные заказы с удержанными средствами и без открытого спора"""
+        held_in, held_out = held_totals('transactions__')
+        return Order.objects.filter(
+            status='completed',
+            expert__isnull=False
+        ).exclude(
+            dispute__resolved=False
+        ).annotate(
+            held_in=held_in,
+            held_out=held_out
+        ).filter(
+            held_in__gt=F('held_out')
+        ).order_by('id')
+
+    @staticmethod
+    def payout_batch(limit=500):
+        """
+        Пакетная выплата по завершенным заказам: блокирует пачку заказов,
+        записывает все проводки одним INSERT и обновляет балансы по
+        пользователям, а не по заказам. Возвращает количество и сумму выплат.
+        """
+        with transaction.atomic():
+            candidates = list(EscrowService.payable_orders().values_list('id', flat=True)[:limit])
+            if not candidates:
+                return {'orders': 0, 'amount': ZERO}
+
+            # Сначала блокировка, затем пересчет удержанного: пока ждали блокировку,
+            # заказ мог быть выплачен или возвращен другим процессом
+            locked = list(
+                Order.objects.select_for_update().filter(id__in=candidates).order_by('id').values_list('id', flat=True)
+            )
+            held_by_order = {
+                order_id: held_in - held_out
+                for order_id, held_in, held_out in EscrowService.payable_orders().filter(
+                    id__in=locked
+                ).values_list('id', 'held_in', 'held_out')
+            }
+            orders = Order.objects.filter(id__in=list(held_by_order)).order_by('id').only('id', 'client_id', 'expert_id')
+
+            postings = []
+            total = ZERO
+            for order in orders:
+                held = held_by_order[order.id]
+                commission = EscrowService.commission_for(held)
+                entry_id = uuid.uuid4()
+                postings.append(Transaction(
+                    user_id=order.client_id, order=order, amount=held,
+                    type=TransactionType.RELEASE, entry_id=entry_id
+                ))
+                postings.append(Transaction(
+                    user_id=order.expert_id, order=order, amount=held - commission,
+                    type=TransactionType.PAYOUT, entry_id=entry_id
+                ))
+                if commission:
+                    postings.append(Transaction(
+                        user_id=order.expert_id, order=order, amount=commission,
+                        type=TransactionType.COMMISSION, entry_id=entry_id
+                    ))
+                total += held
+
+            LedgerService.post_many(postings)
+        return {'orders': len(held_by_order), 'amount': total}
+
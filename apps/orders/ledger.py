@@ -0,0 +1,159 @@
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import Transaction, TransactionType, LedgerMonthlyRollup
+
+User = get_user_model()
+
+# Влияние проводки на счета пользователя: (balance, frozen_balance)
+LEDGER_EFFECTS = {
+    TransactionType.HOLD: (0, 1),        # средства клиента заморожены в escrow
+    TransactionType.RELEASE: (0, -1),    # escrow клиента разморожен в пользу исполнителя
+    TransactionType.PAYOUT: (1, 0),      # зачисление исполнителю
+    TransactionType.COMMISSION: (0, 0),  # комиссия платформы, справочная проводка
+    TransactionType.REFUND: (0, -1),     # escrow возвращен клиенту
+}
+
+
+def month_start(moment=None):
+    """Первое число месяца (по локальному времени) для помесячных итогов"""
+    return timezone.localdate(moment).replace(day=1)
+
+
+class LedgerService:
+    @staticmethod
+    def post(user, order, amount, type):
+        """Создает одиночную проводку и обновляет балансы пользователя"""
+        return LedgerService.post_many([
+            Transaction(user=user, order=order, amount=amount, type=type)
+        ])[0]
+
+    @staticmethod
+    def transfer(order, payer, payee, amount, commission=Decimal('0')):
+        """
+        Переводит замороженные средства заказа от плательщика получателю.
+        Операция двойной записи: RELEASE у плательщика равен сумме
+        PAYOUT и COMMISSION у получателя.
+        """
+        amount = Decimal(amount)
+        commission = Decimal(commission)
+        if commission < 0 or commission > amount:
+            raise ValueError("Комиссия должна быть в пределах суммы перевода")
+
+        postings = [
+            Transaction(user=payer, order=order, amount=amount, type=TransactionType.RELEASE),
+            Transaction(user=payee, order=order, amount=amount - commission, type=TransactionType.PAYOUT),
+        ]
+        if commission:
+            postings.append(
+                Transaction(user=payee, order=order, amount=commission, type=TransactionType.COMMISSION)
+            )
+        return LedgerService.post_many(postings)
+
+    @staticmethod
+    def post_many(postings):
+        """
+        Атомарно записывает проводки одной операции:
+        - добавляет строки журнала одним INSERT
+        - обновляет balance/frozen_balance через F() под блокировкой строк
+        - увеличивает помесячные итоги
+        """
+        if not postings:
+            return []
+
+        entry_id = uuid.uuid4()
+        balance_deltas = defaultdict(lambda: [Decimal('0'), Decimal('0')])
+        rollup_deltas = defaultdict(lambda: [Decimal('0'), 0])
+
+        for posting in postings:
+            if posting.type not in LEDGER_EFFECTS:
+                raise ValueError(f"Неизвестный тип проводки: {posting.type}")
+            if posting.amount is None or Decimal(posting.amount) <= 0:
+                raise ValueError("Сумма проводки должна быть больше 0")
+            posting.amount = Decimal(posting.amount)
+            if posting.entry_id is None:
+                posting.entry_id = entry_id
+
+            balance_sign, frozen_sign = LEDGER_EFFECTS[posting.type]
+            deltas = balance_deltas[posting.user_id]
+            deltas[0] += posting.amount * balance_sign
+            deltas[1] += posting.amount * frozen_sign
+
+            rollup = rollup_deltas[(posting.user_id, posting.type)]
+            rollup[0] += posting.amount
+            rollup[1] += 1
+
+        month = month_start()
+        with transaction.atomic():
+            # Блокируем счета в фиксированном порядке, чтобы избежать взаимоблокировок
+            list(
+                User.objects.select_for_update()
+                .filter(id__in=balance_deltas.keys())
+                .order_by('id')
+                .values_list('id', flat=True)
+            )
+            created = Transaction.objects.bulk_create(postings)
+
+            for user_id, (balance_delta, frozen_delta) in balance_deltas.items():
+                if balance_delta or frozen_delta:
+                    User.objects.filter(id=user_id).update(
+                        balance=F('balance') + balance_delta,
+                        frozen_balance=F('frozen_balance') + frozen_delta
+                    )
+
+            for (user_id, type), (total, count) in rollup_deltas.items():
+                LedgerService._bump_rollup(user_id, month, type, total, count)
+
+        return created
+
+    @staticmethod
+    def _bump_rollup(user_id, month, type, total, count):
+        """Увеличивает помесячный итог, создавая строку при первой проводке"""
+        lookup = {'user_id': user_id, 'month': month, 'type': type}
+        updated = LedgerMonthlyRollup.objects.filter(**lookup).update(
+            total=F('total') + total,
+            entries_count=F('entries_count') + count
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                LedgerMonthlyRollup.objects.create(total=total, entries_count=count, **lookup)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            LedgerMonthlyRollup.objects.filter(**lookup).update(
+                total=F('total') + total,
+                entries_count=F('entries_count') + count
+            )
+
+    @staticmethod
+    def get_totals(user, type, month=None):
+        """Итог проводок пользователя по типу за все время или за месяц (date)"""
+        rollups = LedgerMonthlyRollup.objects.filter(user=user, type=type)
+        if month is not None:
+            rollups = rollups.filter(month=month.replace(day=1))
+        return rollups.aggregate(total=Sum('total'))['total'] or Decimal('0')
+
+    @staticmethod
+    def get_earnings(user):
+        """Заработок исполнителя: всего и за текущий месяц"""
+        current_month = month_start()
+        totals = LedgerMonthlyRollup.objects.filter(
+            user=user,
+            type=TransactionType.PAYOUT
+        ).values_list('month', 'total')
+
+        total_earnings = Decimal('0')
+        monthly_earnings = Decimal('0')
+        for month, total in totals:
+            total_earnings += total
+            if month == current_month:
+                monthly_earnings = total
+        return {
+            'total': total_earnings,
+            'monthly': monthly_earnings,
+        }
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.orders.ledger import LEDGER_EFFECTS, month_start
+from apps.orders.models import Transaction, LedgerMonthlyRollup
+
+User = get_user_model()
+
+
+class _GroupStream:
+    """Поток строк, упорядоченных и сгруппированных по user_id (первый элемент строки)"""
+
+    def __init__(self, rows):
+        self._groups = groupby(rows, key=itemgetter(0))
+        self._current = next(self._groups, None)
+
+    def take(self, user_id):
+        while self._current is not None and self._current[0] < user_id:
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != user_id:
+            return []
+        rows = list(self._current[1])
+        self._current = next(self._groups, None)
+        return rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает balance/frozen_balance и помесячные итоги по журналу проводок '
+        'за один потоковый проход и сообщает о расхождениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Привести балансы и итоги в соответствие с журналом'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Размер пачки при чтении из базы'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fix = options['fix']
+
+        users = User.objects.order_by('id').values_list(
+            'id', 'balance', 'frozen_balance'
+        ).iterator(chunk_size=chunk_size)
+        postings = _GroupStream(
+            Transaction.objects.order_by('user_id').values_list(
+                'user_id', 'type', 'amount', 'timestamp'
+            ).iterator(chunk_size=chunk_size)
+        )
+        rollups = _GroupStream(
+            LedgerMonthlyRollup.objects.order_by('user_id').values_list(
+                'user_id', 'month', 'type', 'total', 'entries_count'
+            ).iterator(chunk_size=chunk_size)
+        )
+
+        checked = 0
+        mismatched = 0
+        skipped = 0
+        for user_id, balance, frozen_balance in users:
+            checked += 1
+            expected_balance = Decimal('0')
+            expected_frozen = Decimal('0')
+            expected_rollups = defaultdict(lambda: [Decimal('0'), 0])
+
+            user_postings = postings.take(user_id)
+            for _, type, amount, timestamp in user_postings:
+                balance_sign, frozen_sign = LEDGER_EFFECTS[type]
+                expected_balance += amount * balance_sign
+                expected_frozen += amount * frozen_sign
+                rollup = expected_rollups[(month_start(timestamp), type)]
+                rollup[0] += amount
+                rollup[1] += 1
+
+            actual_rollups = {
+                (month, type): [total, count]
+                for _, month, type, total, count in rollups.take(user_id)
+            }
+
+            balances_ok = balance == expected_balance and frozen_balance == expected_frozen
+            rollups_ok = actual_rollups == dict(expected_rollups)
+            if balances_ok and rollups_ok:
+                continue
+
+            mismatched += 1
+            if not balances_ok:
+                self.stdout.write(self.style.WARNING(
+                    f'Пользователь {user_id}: balance {balance} (ожидается {expected_balance}), '
+                    f'frozen_balance {frozen_balance} (ожидается {expected_frozen})'
+                ))
+            if not rollups_ok:
+                self.stdout.write(self.style.WARNING(
+                    f'Пользователь {user_id}: помесячные итоги не совпадают с журналом'
+                ))
+
+            if fix:
+                # Без проводок баланс остался с времени до журнала: выводить его не из чего
+                fix_balances = not balances_ok and bool(user_postings)
+                if not balances_ok and not user_postings:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Пользователь {user_id}: нет проводок, баланс не исправляется'
+                    ))
+                self._fix_user(user_id, expected_balance, expected_frozen, expected_rollups, fix_balances)
+
+        summary = f'Проверено пользователей: {checked}, расхождений: {mismatched}'
+        if mismatched and not fix:
+            self.stdout.write(self.style.ERROR(summary))
+        else:
+            if mismatched:
+                summary += ' (исправлено' + (f', балансов без проводок пропущено: {skipped}' if skipped else '') + ')'
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def _fix_user(self, user_id, balance, frozen_balance, rollups, fix_balances):
+        with transaction.atomic():
+            if fix_balances:
+                User.objects.filter(id=user_id).update(
+                    balance=balance,
+                    frozen_balance=frozen_balance
+                )
+            LedgerMonthlyRollup.objects.filter(user_id=user_id).delete()
+            LedgerMonthlyRollup.objects.bulk_create([
+                LedgerMonthlyRollup(
+                    user_id=user_id,
+                    month=month,
+                    type=type,
+                    total=total,
+                    entries_count=count
+                )
+                for (month, type), (total, count) in rollups.items()
+            ])
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_bid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('type', models.CharField(choices=[('hold', 'Заморозка'), ('release', 'Разморозка'), ('payout', 'Выплата'), ('commission', 'Комиссия'), ('refund', 'Возврат')], max_length=20, verbose_name='Тип проводки')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Количество проводок')),
+            ],
+            options={
+                'verbose_name': 'Итоги журнала за месяц',
+                'verbose_name_plural': 'Итоги журнала по месяцам',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='entry_id',
+            field=models.UUIDField(blank=True, db_index=True, help_text='Общий идентификатор проводок одной операции', null=True, verbose_name='Операция'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'timestamp'], name='orders_tran_user_id_fb0fb6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['order', 'type'], name='orders_tran_order_i_a40a7e_idx'),
+        ),
+        migrations.AddField(
+            model_name='ledgermonthlyrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ledgermonthlyrollup',
+            unique_together={('user', 'month', 'type')},
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_discountdailyrollup'),
+        ('orders', '0010_ledgermonthlyrollup_transaction_entry_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['discount', 'created_at'], name='orders_orde_discoun_20a224_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Transaction = apps.get_model('orders', 'Transaction')
+    LedgerMonthlyRollup = apps.get_model('orders', 'LedgerMonthlyRollup')
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(month=TruncMonth('timestamp', output_field=DateField()))
+        .values('user_id', 'month', 'type')
+        .annotate(total=Sum('amount'), entries_count=Count('id'))
+    )
+    # Итоги целиком выводятся из журнала: строки, созданные после 0010, пересобираются
+    LedgerMonthlyRollup.objects.all().delete()
+    LedgerMonthlyRollup.objects.bulk_create([
+        LedgerMonthlyRollup(
+            user_id=row['user_id'],
+            month=row['month'],
+            type=row['type'],
+            total=row['total'],
+            entries_count=row['entries_count']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_order_discount_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,10 @@
 from django.core.validators import FileExtensionValidator
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from apps.catalog.models import Subject, Topic, WorkType, Complexity, DiscountRule
 from .utils import FileValidator, get_file_path
+from .signals import order_changed
 import os
 
 
@@ -156,14 +157,85 @@ class Order(models.Model):
         blank=True
     )
 
+    # Поля, изменения которых отслеживаются между загрузкой и сохранением
+    TRACKED_FIELDS = (
+        'status', 'expert_id', 'client_id', 'budget',
+        'subject_id', 'topic_id', 'work_type_id', 'complexity_id',
+        'discount_id', 'discount_amount',
+    )
+
     class Meta:
         verbose_name = "Заказ"
         verbose_name_plural = "Заказы"
         ordering = ['-created_at']
+        indexes = [
+            # Дневные итоги скидок (DiscountAnalyticsService.rollup_day)
+            models.Index(fields=['discount', 'created_at']),
+        ]
 
     def __str__(self):
         return f"{self.title or 'Без названия'} ({self.get_status_display()})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self):
+        # Отложенные (deferred) поля не загружены и не отслеживаются
+        return {field: self.__dict__[field] for field in self.TRACKED_FIELDS if field in self.__dict__}
+
+    @property
+    def changed_fields(self):
+        """Отслеживаемые поля, значения которых отличаются от загруженных из базы"""
+        loaded = getattr(self, '_loaded_values', None)
+        current = self._tracked_values()
+        if loaded is None:
+            return set(current)
+        return {field for field, value in current.items() if field not in loaded or loaded[field] != value}
+
+    def get_loaded_value(self, field):
+        """Значение поля на момент загрузки из базы (None для нового заказа)"""
+        return getattr(self, '_loaded_values', {}).get(field)
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        refreshed = self._tracked_values()
+        if fields is not None:
+            names = {self._meta.get_field(name).attname for name in fields}
+            refreshed = {field: value for field, value in refreshed.items() if field in names}
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **refreshed}
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        previous = dict(getattr(self, '_loaded_values', {}))
+        changed = self.changed_fields
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            saved = {self._meta.get_field(name).attname for name in update_fields}
+            changed &= saved
+        # Изменение заказа и события подписчиков фиксируются одной транзакцией
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            current = self._tracked_values()
+            if update_fields is not None:
+                # Несохраненные изменения остаются изменениями
+                current = {field: value for field, value in current.items() if field in saved}
+                self._loaded_values = {**previous, **current}
+            else:
+                self._loaded_values = current
+
+            if created or changed:
+                order_changed.send(
+                    sender=self.__class__,
+                    instance=self,
+                    created=created,
+                    changed_fields=changed,
+                    previous=previous
+                )
+
     def get_status_display(self):
         return self.status.capitalize()
 
@@ -295,15 +367,75 @@ class TransactionType(models.TextChoices):
     REFUND = "refund", "Возврат"
 
 class Transaction(models.Model):
+    """
+    Проводка журнала. Проводки только добавляются: исправления
+    оформляются новыми проводками, а не изменением существующих.
+    """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="transactions")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     type = models.CharField(max_length=20, choices=TransactionType.choices)
     timestamp = models.DateTimeField(auto_now_add=True)
+    entry_id = models.UUIDField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="Операция",
+        help_text="Общий идентификатор проводок одной операции"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'type', 'timestamp']),
+            models.Index(fields=['order', 'type']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} — {self.get_type_display()} — {self.amount}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Проводки журнала нельзя изменять")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Проводки журнала нельзя удалять")
+
+
+class LedgerMonthlyRollup(models.Model):
+    """Помесячные итоги проводок пользователя по типам"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ledger_rollups',
+        verbose_name="Пользователь"
+    )
+    month = models.DateField(verbose_name="Месяц")
+    type = models.CharField(
+        max_length=20,
+        choices=TransactionType.choices,
+        verbose_name="Тип проводки"
+    )
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Сумма"
+    )
+    entries_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество проводок"
+    )
+
+    class Meta:
+        verbose_name = "Итоги журнала за месяц"
+        verbose_name_plural = "Итоги журнала по месяцам"
+        unique_together = ('user', 'month', 'type')
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.type}: {self.total}"
+
 class Bid(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="bids", verbose_name="Заказ")
     expert = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="bids", verbose_name="Эксперт")
@@ -3,11 +3,11 @@ from .models import Order, Transaction, Dispute, OrderFile, OrderComment, Bid
 from apps.catalog.models import Subject, Topic, WorkType, Complexity
 from apps.catalog.serializers import SubjectSerializer, TopicSerializer, WorkTypeSerializer, ComplexitySerializer, DiscountRuleSerializer
 from apps.catalog.services import PricingService
-from apps.users.serializers import UserSerializer
+from apps.users.serializers import UserCardSerializer
 from django.utils import timezone
 
 class OrderFileSerializer(serializers.ModelSerializer):
-    uploaded_by = UserSerializer(read_only=True)
+    uploaded_by = UserCardSerializer(read_only=True)
     file_type_display = serializers.CharField(source='get_file_type_display', read_only=True)
     file_url = serializers.SerializerMethodField()
     filename = serializers.CharField(read_only=True)
@@ -40,7 +40,7 @@ class OrderFileSerializer(serializers.ModelSerializer):
         return "0 B"
 
 class OrderCommentSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = UserCardSerializer(read_only=True)
 
     class Meta:
         model = OrderComment
@@ -48,7 +48,7 @@ class OrderCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['author']
 
 class BidSerializer(serializers.ModelSerializer):
-    expert = UserSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
 
     class Meta:
         model = Bid
@@ -63,8 +63,8 @@ class OrderPriceBreakdownSerializer(serializers.Serializer):
     final_price = serializers.DecimalField(max_digits=10, decimal_places=2)
 
 class OrderSerializer(serializers.ModelSerializer):
-    client = UserSerializer(read_only=True)
-    expert = UserSerializer(read_only=True)
+    client = UserCardSerializer(read_only=True)
+    expert = UserCardSerializer(read_only=True)
     subject = SubjectSerializer(read_only=True)
     topic = TopicSerializer(read_only=True)
     work_type = WorkTypeSerializer(read_only=True)
@@ -228,7 +228,7 @@ class OrderSerializer(serializers.ModelSerializer):
         return data
 
 class TransactionSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = UserCardSerializer(read_only=True)
     type_display = serializers.CharField(source='get_type_display', read_only=True)
     
     class Meta:
@@ -237,7 +237,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ['timestamp']
 
 class DisputeSerializer(serializers.ModelSerializer):
-    arbitrator = UserSerializer(read_only=True)
+    arbitrator = UserCardSerializer(read_only=True)
     order = serializers.SerializerMethodField()
     
     class Meta:
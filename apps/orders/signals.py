@@ -0,0 +1,31 @@
+from django.dispatch import Signal, receiver
+from apps.core.outbox import OutboxService
+
+# Отправляется после сохранения заказа, если заказ создан или изменились
+# отслеживаемые поля (Order.TRACKED_FIELDS).
+# Аргументы: instance, created, changed_fields (set), previous (dict значений при загрузке)
+order_changed = Signal()
+
+
+@receiver(order_changed)
+def publish_order_changed(sender, instance, created, changed_fields, previous, **kwargs):
+    """
+    Записывает событие изменения заказа в outbox в транзакции сохранения.
+    Статистика экспертов, партнерские начисления, счетчики каталога
+    и агрегаты лояльности клиентов обрабатываются релеем.
+    """
+    OutboxService.publish(
+        'order.changed',
+        order_id=instance.pk,
+        created=created,
+        changed_fields=sorted(changed_fields),
+        previous=previous,
+        status=instance.status,
+        client_id=instance.client_id,
+        expert_id=instance.expert_id,
+        subject_id=instance.subject_id,
+        topic_id=instance.topic_id,
+        work_type_id=instance.work_type_id,
+        complexity_id=instance.complexity_id,
+        budget=instance.budget
+    )
@@ -0,0 +1,26 @@
+from celery import shared_task
+from django.conf import settings
+import logging
+from apps.core.task_metrics import record_rows
+from .escrow import EscrowService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def process_escrow_payouts(self):
+    """Пакетно выплачивает исполнителям средства по завершенным заказам"""
+    batch_size = getattr(settings, 'ESCROW_PAYOUT_BATCH_SIZE', 500)
+    total_orders = 0
+    try:
+        while True:
+            result = EscrowService.payout_batch(limit=batch_size)
+            total_orders += result['orders']
+            if result['orders'] < batch_size:
+                break
+        record_rows(total_orders)
+        logger.info(f"Выплачено по {total_orders} заказам")
+    except Exception as e:
+        logger.error(f"Ошибка пакетной выплаты: {str(e)}")
+        raise self.retry(exc=e, countdown=300)
+    return total_orders
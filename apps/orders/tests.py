@@ -1,3 +1,227 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from .models import Order, Transaction, TransactionType, LedgerMonthlyRollup, Dispute
+from .ledger import LedgerService, month_start
+from .escrow import EscrowService
+from apps.core.models import OutboxEvent
 
-# Create your tests here.
+User = get_user_model()
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+        self.order = Order.objects.create(client=self.client_user, title='Курсовая', budget=Decimal('1000.00'))
+
+    def test_hold_freezes_client_funds(self):
+        """Заморозка увеличивает frozen_balance клиента и итоги месяца"""
+        LedgerService.post(self.client_user, self.order, Decimal('1000.00'), TransactionType.HOLD)
+
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('1000.00'))
+        self.assertEqual(self.client_user.balance, Decimal('0.00'))
+        rollup = LedgerMonthlyRollup.objects.get(user=self.client_user, type=TransactionType.HOLD)
+        self.assertEqual(rollup.total, Decimal('1000.00'))
+        self.assertEqual(rollup.entries_count, 1)
+
+    def test_transfer_is_balanced(self):
+        """Перевод: RELEASE у клиента равен PAYOUT и COMMISSION у исполнителя"""
+        LedgerService.post(self.client_user, self.order, Decimal('1000.00'), TransactionType.HOLD)
+        postings = LedgerService.transfer(
+            self.order, self.client_user, self.expert, Decimal('1000.00'), commission=Decimal('100.00')
+        )
+
+        self.assertEqual(len({p.entry_id for p in postings}), 1)
+        self.client_user.refresh_from_db()
+        self.expert.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('0.00'))
+        self.assertEqual(self.expert.balance, Decimal('900.00'))
+        self.assertEqual(LedgerService.get_earnings(self.expert), {
+            'total': Decimal('900.00'),
+            'monthly': Decimal('900.00'),
+        })
+        self.assertEqual(
+            LedgerService.get_totals(self.expert, TransactionType.COMMISSION, month=month_start()),
+            Decimal('100.00')
+        )
+
+    def test_postings_are_append_only(self):
+        posting = LedgerService.post(self.client_user, self.order, Decimal('10.00'), TransactionType.HOLD)
+        posting.amount = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            posting.save()
+        with self.assertRaises(ValueError):
+            posting.delete()
+
+    def test_postings_api_is_read_only(self):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from .views import TransactionViewSet
+
+        LedgerService.post(self.client_user, self.order, Decimal('10.00'), TransactionType.HOLD)
+        for method in ('create', 'update', 'partial_update', 'destroy'):
+            self.assertFalse(hasattr(TransactionViewSet, method))
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, self.expert)
+        response = TransactionViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_rejects_non_positive_amount(self):
+        with self.assertRaises(ValueError):
+            LedgerService.post(self.client_user, self.order, Decimal('0'), TransactionType.HOLD)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_verify_ledger_detects_and_fixes_drift(self):
+        LedgerService.post(self.client_user, self.order, Decimal('500.00'), TransactionType.HOLD)
+        User.objects.filter(id=self.client_user.id).update(frozen_balance=Decimal('1.00'))
+
+        out = StringIO()
+        call_command('verify_ledger', stdout=out)
+        self.assertIn('расхождений: 1', out.getvalue())
+
+        # Баланс до журнала: проводок нет, --fix его не обнуляет
+        User.objects.filter(id=self.expert.id).update(balance=Decimal('700.00'))
+
+        out = StringIO()
+        call_command('verify_ledger', '--fix', stdout=out)
+        self.assertIn('балансов без проводок пропущено: 1', out.getvalue())
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('500.00'))
+        self.expert.refresh_from_db()
+        self.assertEqual(self.expert.balance, Decimal('700.00'))
+
+        out = StringIO()
+        call_command('verify_ledger', stdout=out)
+        self.assertIn('расхождений: 1', out.getvalue())
+
+    def test_rollups_are_built_from_existing_postings(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        LedgerService.transfer(self.order, self.client_user, self.expert, Decimal('300.00'), Decimal('30.00'))
+        LedgerService.post(self.client_user, self.order, Decimal('100.00'), TransactionType.HOLD)
+        LedgerMonthlyRollup.objects.all().delete()
+
+        import_module('apps.orders.migrations.0012_build_ledger_rollups').build_rollups(apps, None)
+
+        self.assertEqual(LedgerService.get_earnings(self.expert), {'total': Decimal('270.00'), 'monthly': Decimal('270.00')})
+        self.assertEqual(LedgerService.get_totals(self.client_user, TransactionType.HOLD), Decimal('100.00'))
+
+
+class EscrowTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+
+    def _order(self, budget='1000.00', status='in_progress'):
+        return Order.objects.create(
+            client=self.client_user, expert=self.expert, title='Реферат',
+            budget=Decimal(budget), status=status
+        )
+
+    def test_hold_follows_budget(self):
+        order = self._order()
+        EscrowService.hold(order)
+        EscrowService.hold(order)
+        self.assertEqual(EscrowService.held_amount(order), Decimal('1000.00'))
+
+        order.budget = Decimal('800.00')
+        EscrowService.hold(order)
+        self.assertEqual(EscrowService.held_amount(order), Decimal('800.00'))
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('800.00'))
+
+    def test_payout_batch_skips_open_disputes(self):
+        paid = self._order(status='completed')
+        disputed = self._order(status='completed')
+        EscrowService.hold(paid)
+        EscrowService.hold(disputed)
+        Dispute.objects.create(order=disputed, reason='Работа не соответствует')
+
+        result = EscrowService.payout_batch()
+
+        self.assertEqual(result, {'orders': 1, 'amount': Decimal('1000.00')})
+        self.assertEqual(EscrowService.held_amount(paid), Decimal('0.00'))
+        self.assertEqual(EscrowService.held_amount(disputed), Decimal('1000.00'))
+        self.expert.refresh_from_db()
+        self.assertEqual(self.expert.balance, Decimal('900.00'))
+        # Повторный запуск ничего не выплачивает
+        self.assertEqual(EscrowService.payout_batch()['orders'], 0)
+
+    def test_payout_batch_rechecks_held_amount_after_lock(self):
+        refunded = self._order(status='completed')
+        partially_refunded = self._order(status='completed')
+        paid = self._order(status='completed')
+        for order in (refunded, partially_refunded, paid):
+            EscrowService.hold(order)
+        select_for_update = Order.objects.select_for_update
+
+        def lock_after_concurrent_refunds(*args, **kwargs):
+            # Другой процесс возвращает средства между выбором заказов и блокировкой
+            LedgerService.post(self.client_user, refunded, Decimal('1000.00'), TransactionType.REFUND)
+            LedgerService.post(self.client_user, partially_refunded, Decimal('300.00'), TransactionType.REFUND)
+            return select_for_update(*args, **kwargs)
+
+        with mock.patch.object(Order.objects, 'select_for_update', side_effect=lock_after_concurrent_refunds):
+            result = EscrowService.payout_batch()
+
+        self.assertEqual(result, {'orders': 2, 'amount': Decimal('1700.00')})
+        self.assertFalse(Transaction.objects.filter(order=refunded, type=TransactionType.PAYOUT).exists())
+        self.assertEqual(
+            Transaction.objects.get(order=partially_refunded, type=TransactionType.PAYOUT).amount, Decimal('630.00')
+        )
+        for order in (refunded, partially_refunded, paid):
+            self.assertEqual(EscrowService.held_amount(order), Decimal('0.00'))
+        self.expert.refresh_from_db()
+        self.assertEqual(self.expert.balance, Decimal('1530.00'))
+
+    def test_refund_returns_held_funds(self):
+        order = self._order()
+        EscrowService.hold(order)
+        EscrowService.refund(order)
+
+        self.assertEqual(EscrowService.held_amount(order), Decimal('0.00'))
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('0.00'))
+        self.assertEqual(EscrowService.payout_batch()['orders'], 0)
+
+
+class OrderChangeTrackingTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+        self.order = Order.objects.create(client=self.client_user, expert=self.expert, title='Отчет')
+
+    def test_loaded_order_has_no_changes(self):
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual(order.changed_fields, set())
+        order.title = 'Новое название'
+        self.assertEqual(order.changed_fields, set())
+
+        events = OutboxEvent.objects.count()
+        order.save()
+        self.assertEqual(OutboxEvent.objects.count(), events)
+
+    def test_status_transition_reaches_receivers(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = 'completed'
+        self.assertEqual(order.changed_fields, {'status'})
+        self.assertEqual(order.get_loaded_value('status'), 'new')
+
+        order.save(update_fields=['status', 'updated_at'])
+        event = OutboxEvent.objects.filter(event_type='order.changed').last()
+        self.assertEqual(event.payload['changed_fields'], ['status'])
+        self.assertEqual(event.payload['previous']['status'], 'new')
+        self.assertEqual(order.changed_fields, set())
+
+    def test_unsaved_fields_stay_changed(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = 'in_progress'
+        order.budget = Decimal('10.00')
+        order.save(update_fields=['budget'])
+        self.assertEqual(order.changed_fields, {'status'})
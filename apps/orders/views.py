@@ -3,7 +3,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from .models import Order, Transaction, Dispute, OrderFile, OrderComment, Bid
 from .serializers import OrderSerializer, TransactionSerializer, DisputeSerializer, OrderFileSerializer, OrderCommentSerializer, BidSerializer
@@ -12,6 +12,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.http import FileResponse
 import mimetypes
 from .services import DiscountService
+from .escrow import EscrowService
+from apps.payments.refunds import RefundService
+from apps.core.idempotency import idempotent
+from apps.core.outbox import OutboxService
 from .models import DiscountRule
 
 # Create your views here.
@@ -20,12 +24,20 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Бюджет запросов к базе на страницу (RequestMetricsMiddleware): связи загружаются
+    # пачками (base_queryset), число запросов не зависит от размера страницы
+    query_budgets = {'list': 15, 'retrieve': 12, 'available': 15}
+
+    def base_queryset(self):
+        """Заказы со всеми связями, которые читает OrderSerializer"""
+        return self.queryset.prefetch_related(
+            'bids__expert__statistics', 'files', 'comments__author__statistics',
+            'subject__category', 'topic__subject', 'work_type', 'complexity', 'discount__work_types'
+        ).select_related('client__statistics', 'expert__statistics', 'dispute')
 
     def get_queryset(self):
         user = self.request.user
-        queryset = self.queryset.prefetch_related(
-            'bids__expert', 'files', 'comments', 'subject', 'topic', 'work_type', 'complexity'
-        ).select_related('client', 'expert')
+        queryset = self.base_queryset()
         
         if user.is_staff:
             return queryset
@@ -50,7 +62,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     def available(self, request):
         """Список доступных заказов для исполнителя (новые, без назначенного эксперта)."""
         user = request.user
-        queryset = self.queryset.filter(status='new', expert__isnull=True).exclude(client=user).prefetch_related('bids__expert', 'files', 'comments')
+        queryset = self.base_queryset().filter(status='new', expert__isnull=True).exclude(client=user)
         
         try:
             page = self.paginate_queryset(queryset)
@@ -73,6 +85,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @idempotent
     def take(self, request, pk=None):
         """Взять заказ в работу (только для роли expert)."""
         # Не используем get_object(), чтобы не упереться в get_queryset с фильтрацией по пользователю
@@ -90,7 +103,9 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Взять можно только заказ в статусе new.'}, status=status.HTTP_400_BAD_REQUEST)
         order.expert = user
         order.status = 'in_progress'
-        order.save(update_fields=['expert', 'status', 'updated_at'])
+        with transaction.atomic():
+            order.save(update_fields=['expert', 'status', 'updated_at'])
+            EscrowService.hold(order)
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -124,6 +139,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @idempotent
     def accept_bid(self, request, pk=None):
         """Клиент принимает ставку: назначает эксперта и фиксирует бюджет."""
         order = self.get_object()
@@ -143,13 +159,17 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Переводим заказ в in_progress, если он был в одном из допустимых статусов
         # Добавили поддержку перехода из waiting_payment, чтобы после принятия ставки
         # заказ гарантированно переходил в работу в типичных сценариях оплаты/подтверждения
-        if order.status in ['new', 'revision', 'review', 'waiting_payment']:
-            old_status = order.status
-            order.status = 'in_progress'
-            order.save(update_fields=['expert', 'budget', 'status', 'updated_at'])
-            NotificationService.notify_status_changed(order, old_status)
-        else:
-            order.save(update_fields=['expert', 'budget', 'updated_at'])
+        # Бюджет замораживается в escrow в той же транзакции, что и назначение эксперта
+        old_status = order.status
+        with transaction.atomic():
+            if order.status in ['new', 'revision', 'review', 'waiting_payment']:
+                order.status = 'in_progress'
+                order.save(update_fields=['expert', 'budget', 'status', 'updated_at'])
+            else:
+                order.save(update_fields=['expert', 'budget', 'updated_at'])
+            EscrowService.hold(order)
+            if order.status != old_status:
+                OutboxService.publish('order.status_changed', order_id=order.id, old_status=old_status)
         return Response(OrderSerializer(order).data)
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
@@ -217,6 +237,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Response(OrderSerializer(order).data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def take_order(self, request, pk=None):
         order = self.get_object()
         if order.status != 'new':
@@ -233,10 +254,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         old_status = order.status
         order.expert = request.user
         order.status = 'in_progress'
-        order.save()
-        
-        NotificationService.notify_order_taken(order)
-        NotificationService.notify_status_changed(order, old_status)
+        with transaction.atomic():
+            order.save()
+            EscrowService.hold(order)
+            OutboxService.publish('order.taken', order_id=order.id)
+            OutboxService.publish('order.status_changed', order_id=order.id, old_status=old_status)
         
         return Response(OrderSerializer(order).data)
 
@@ -256,9 +278,9 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         old_status = order.status
         order.status = 'completed'
-        order.save()
-        
-        NotificationService.notify_status_changed(order, old_status)
+        with transaction.atomic():
+            order.save()
+            OutboxService.publish('order.status_changed', order_id=order.id, old_status=old_status)
         
         return Response(OrderSerializer(order).data)
 
@@ -302,20 +324,22 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Создаем спор
-        dispute = Dispute.objects.create(
-            order=order,
-            reason=reason
-        )
-        
-        # Отправляем уведомление администраторам
-        from apps.notifications.services import NotificationService
-        NotificationService.notify_dispute_created(dispute)
+        # Создаем спор; администраторы получат уведомление через outbox
+        with transaction.atomic():
+            dispute = Dispute.objects.create(
+                order=order,
+                reason=reason
+            )
+            OutboxService.publish('dispute.created', dispute_id=dispute.id)
         
         serializer = DisputeSerializer(dispute)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Проводки журнала только для чтения: записываются исключительно
+    через LedgerService, который обновляет балансы и итоги месяцев
+    """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -352,16 +376,41 @@ class DisputeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # decision: 'expert' — выплатить исполнителю, 'client' — вернуть средства клиенту.
+        # Без решения заказ остается в текущем статусе, и завершенный заказ
+        # попадает в пакетную выплату.
+        decision = request.data.get('decision')
+        if decision not in (None, '', 'expert', 'client'):
+            return Response(
+                {"error": "decision должен быть 'expert' или 'client'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        order = dispute.order
+        if decision == 'expert' and not order.expert_id:
+            return Response(
+                {"error": "У заказа нет исполнителя"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         dispute.resolved = True
         # Не перезаписываем арбитра, если он уже назначен
         if not dispute.arbitrator:
             dispute.arbitrator = request.user
         dispute.result = request.data.get('result', '')
-        dispute.save()
-        
-        # Уведомляем участников о решении спора
-        from apps.notifications.services import NotificationService
-        NotificationService.notify_dispute_resolved(dispute)
+        with transaction.atomic():
+            dispute.save()
+            if decision == 'expert':
+                order.status = 'completed'
+                order.save(update_fields=['status', 'updated_at'])
+                EscrowService.release(order)
+            elif decision == 'client':
+                order.status = 'cancelled'
+                order.save(update_fields=['status', 'updated_at'])
+                # Возврат оплаты выполняет очередь возвратов; escrow возвращается
+                # клиенту, когда провайдер подтвердит возврат
+                RefundService.queue(order, reason=dispute.result or '')
+            # Уведомляем участников о решении спора
+            OutboxService.publish('dispute.resolved', dispute_id=dispute.id)
         
         return Response(DisputeSerializer(dispute).data)
 
@@ -394,11 +443,10 @@ class DisputeViewSet(viewsets.ModelViewSet):
             )
         
         dispute.arbitrator = arbitrator
-        dispute.save()
-        
-        # Отправляем уведомление арбитру
-        from apps.notifications.services import NotificationService
-        NotificationService.notify_arbitrator_assigned(dispute)
+        with transaction.atomic():
+            dispute.save()
+            # Уведомление арбитру отправит релей outbox
+            OutboxService.publish('dispute.arbitrator_assigned', dispute_id=dispute.id)
         
         serializer = DisputeSerializer(dispute)
         return Response(serializer.data)
@@ -509,6 +557,10 @@ class BidViewSet(viewsets.ModelViewSet):
         
         return Bid.objects.filter(order_id=order_id).select_related('expert', 'order')
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         order_id = self.kwargs['order_pk']
         order = get_object_or_404(Order, id=order_id)
@@ -529,14 +581,16 @@ class BidViewSet(viewsets.ModelViewSet):
             raise permissions.PermissionDenied('У заказа уже есть назначенный эксперт.')
         
         # Создаем или обновляем ставку
-        bid, created = Bid.objects.get_or_create(
-            order=order, 
-            expert=user, 
-            defaults=serializer.validated_data
-        )
-        if not created:
-            for attr, value in serializer.validated_data.items():
-                setattr(bid, attr, value)
-            bid.save()
+        with transaction.atomic():
+            bid, created = Bid.objects.get_or_create(
+                order=order, 
+                expert=user, 
+                defaults=serializer.validated_data
+            )
+            if not created:
+                for attr, value in serializer.validated_data.items():
+                    setattr(bid, attr, value)
+                bid.save()
+            OutboxService.publish('bid.created', bid_id=bid.id, created=created)
         
         return bid
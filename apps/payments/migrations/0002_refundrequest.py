@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_ledgermonthlyrollup_transaction_entry_id_and_more'),
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefundRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('completed', 'Выполнен'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('reason', models.TextField(blank=True, verbose_name='Причина')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработана')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='refund_requests', to='orders.order', verbose_name='Заказ')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='refund_requests', to='payments.payment', verbose_name='Платеж')),
+            ],
+            options={
+                'verbose_name': 'Заявка на возврат',
+                'verbose_name_plural': 'Заявки на возврат',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='payments_re_status_9d8b07_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'processing'])), fields=('order',), name='unique_active_refund_per_order')],
+            },
+        ),
+    ]
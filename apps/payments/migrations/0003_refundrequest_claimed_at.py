@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_refundrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refundrequest',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взята в обработку'),
+        ),
+    ]
@@ -99,3 +99,85 @@ class Payment(models.Model):
             return {}
         crypto = PaymentCrypto()
         return crypto.decrypt_data(self.encrypted_data)
+
+
+class RefundStatus(models.TextChoices):
+    PENDING = 'pending', 'В очереди'
+    PROCESSING = 'processing', 'Обрабатывается'
+    COMPLETED = 'completed', 'Выполнен'
+    FAILED = 'failed', 'Ошибка'
+
+
+class RefundRequest(models.Model):
+    """Заявка на возврат средств клиенту по заказу"""
+    order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.PROTECT,
+        related_name='refund_requests',
+        verbose_name="Заказ"
+    )
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='refund_requests',
+        verbose_name="Платеж"
+    )
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Сумма"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=RefundStatus.choices,
+        default=RefundStatus.PENDING,
+        verbose_name="Статус"
+    )
+    reason = models.TextField(
+        blank=True,
+        verbose_name="Причина"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попыток"
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Последняя ошибка"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Создана"
+    )
+    # Время, когда обработчик забрал заявку; зависшие в обработке дольше
+    # REFUND_CLAIM_TIMEOUT заявки возвращаются в очередь
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Взята в обработку"
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Обработана"
+    )
+
+    class Meta:
+        verbose_name = "Заявка на возврат"
+        verbose_name_plural = "Заявки на возврат"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['order'],
+                condition=models.Q(status__in=['pending', 'processing']),
+                name='unique_active_refund_per_order'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Возврат {self.amount} по заказу {self.order_id} ({self.get_status_display()})"
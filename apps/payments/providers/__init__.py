@@ -0,0 +1,51 @@
+"""
+Реестр платежных провайдеров.
+
+Соответствие метода оплаты и класса клиента задается настройкой
+PAYMENT_PROVIDERS ({'card': 'apps.payments.providers.alfabank.AlfaBankClient', ...}).
+Модуль провайдера импортируется при первом обращении, экземпляр клиента
+создается один раз на процесс и переиспользуется.
+"""
+import threading
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_PAYMENT_PROVIDERS = {
+    'card': 'apps.payments.providers.alfabank.AlfaBankClient',
+    'sbp': 'apps.payments.providers.sbp.SBPClient',
+}
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def get_provider_paths():
+    return getattr(settings, 'PAYMENT_PROVIDERS', DEFAULT_PAYMENT_PROVIDERS)
+
+
+def is_supported(payment_method):
+    return payment_method in get_provider_paths()
+
+
+def get_provider(payment_method):
+    """Возвращает клиент провайдера для метода оплаты"""
+    provider = _providers.get(payment_method)
+    if provider is not None:
+        return provider
+
+    path = get_provider_paths().get(payment_method)
+    if path is None:
+        raise ValueError(f"Неподдерживаемый метод оплаты: {payment_method}")
+
+    with _lock:
+        provider = _providers.get(payment_method)
+        if provider is None:
+            provider = import_string(path)()
+            _providers[payment_method] = provider
+    return provider
+
+
+def reset_providers():
+    """Сбрасывает созданные клиенты (после изменения настроек, в тестах)"""
+    with _lock:
+        _providers.clear()
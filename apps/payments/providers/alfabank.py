@@ -1,33 +1,36 @@
 import uuid
 import hashlib
-import requests
 from typing import Dict, Any, Optional
 from decimal import Decimal
 from django.urls import reverse
 from ..config import ALFABANK_SETTINGS, PAYMENT_SETTINGS
 from ..models import Payment
+from .base import BasePaymentProvider
 
 
-class AlfaBankClient:
+class AlfaBankClient(BasePaymentProvider):
+    payment_link_field = 'formUrl'
+
     def __init__(self):
+        super().__init__()
         self.api_url = ALFABANK_SETTINGS['API_URL']
         self.username = ALFABANK_SETTINGS['USERNAME']
         self.password = ALFABANK_SETTINGS['PASSWORD']
         self.test_mode = ALFABANK_SETTINGS['TEST_MODE']
+        self.auth_token = self._get_auth_token()
 
-    def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _make_request(self, endpoint: str, data: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Выполняет запрос к API Альфа-Банка
         """
         url = f"{self.api_url}{endpoint}"
         headers = {
             'Content-Type': 'application/json',
-            'Authorization': self._get_auth_token()
+            'Authorization': self.auth_token
         }
-        
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        return self._post(url, data, headers)
 
     def _get_auth_token(self) -> str:
         """
@@ -117,6 +120,23 @@ class AlfaBankClient:
 
         return response.get('orderStatus')
 
+    def refund_payment(self, payment: Payment, amount: Optional[Decimal] = None,
+                       idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Возвращает платеж полностью или частично
+        """
+        data = {
+            'orderId': payment.payment_id,
+            'amount': int((amount if amount is not None else payment.amount) * 100),  # Сумма в копейках
+        }
+
+        response = self._make_request('refund.do', data, idempotency_key=idempotency_key)
+
+        if response.get('errorCode') and response.get('errorCode') != '0':
+            raise ValueError(f"Ошибка возврата платежа: {response.get('errorMessage')}")
+
+        return response
+
     def process_callback(self, data: Dict[str, Any]) -> Optional[Payment]:
         """
         Обрабатывает уведомление от Альфа-Банка
@@ -0,0 +1,66 @@
+from typing import Dict, Any, Optional
+from decimal import Decimal
+import requests
+from asgiref.sync import sync_to_async
+from ..models import Payment
+
+
+class BasePaymentProvider:
+    """
+    Базовый клиент платежного провайдера.
+
+    Экземпляр создается реестром один раз на процесс, поэтому настройки
+    читаются в __init__ однократно, а HTTP-соединения переиспользуются
+    через общую requests.Session. Наследник реализует синхронные методы,
+    асинхронные обертки (a*) доступны автоматически.
+    """
+    # Поле ответа register_payment со ссылкой на оплату
+    payment_link_field = None
+    # Таймаут запросов к API провайдера: (соединение, чтение), сек
+    timeout = (5, 30)
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def _post(self, url: str, data: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        response = self.session.post(url, json=data, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def register_payment(self, payment: Payment) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def check_payment_status(self, payment: Payment) -> str:
+        raise NotImplementedError
+
+    def refund_payment(self, payment: Payment, amount: Optional[Decimal] = None,
+                       idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Возвращает платеж полностью или частично. Повторный запрос с тем же
+        idempotency_key провайдер не выполняет второй раз.
+        """
+        raise NotImplementedError
+
+    def process_callback(self, data: Dict[str, Any]) -> Optional[Payment]:
+        raise NotImplementedError
+
+    def get_payment_link(self, payment: Payment) -> str:
+        """Регистрирует платеж и возвращает ссылку для оплаты"""
+        response = self.register_payment(payment)
+        return response[self.payment_link_field]
+
+    async def aregister_payment(self, payment: Payment) -> Dict[str, Any]:
+        return await sync_to_async(self.register_payment)(payment)
+
+    async def acheck_payment_status(self, payment: Payment) -> str:
+        return await sync_to_async(self.check_payment_status)(payment)
+
+    async def arefund_payment(self, payment: Payment, amount: Optional[Decimal] = None,
+                              idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        return await sync_to_async(self.refund_payment)(payment, amount, idempotency_key)
+
+    async def aprocess_callback(self, data: Dict[str, Any]) -> Optional[Payment]:
+        return await sync_to_async(self.process_callback)(data)
+
+    async def aget_payment_link(self, payment: Payment) -> str:
+        return await sync_to_async(self.get_payment_link)(payment)
@@ -3,16 +3,19 @@ import hmac
 import hashlib
 import base64
 import json
-import requests
 from typing import Dict, Any, Optional
 from decimal import Decimal
 from django.utils import timezone
 from ..config import SBP_SETTINGS, PAYMENT_SETTINGS
 from ..models import Payment
+from .base import BasePaymentProvider
 
 
-class SBPClient:
+class SBPClient(BasePaymentProvider):
+    payment_link_field = 'qrUrl'
+
     def __init__(self):
+        super().__init__()
         self.api_url = SBP_SETTINGS['API_URL']
         self.merchant_id = SBP_SETTINGS['MERCHANT_ID']
         self.api_key = SBP_SETTINGS['API_KEY']
@@ -30,21 +33,19 @@ class SBPClient:
         ).digest()
         return base64.b64encode(signature).decode()
 
-    def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _make_request(self, endpoint: str, data: Dict[str, Any], request_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Выполняет запрос к API СБП
+        Выполняет запрос к API СБП. Запросы с одинаковым X-Request-ID
+        СБП выполняет один раз.
         """
         url = f"{self.api_url}{endpoint}"
         headers = {
             'Content-Type': 'application/json',
             'X-Merchant-ID': self.merchant_id,
-            'X-Request-ID': str(uuid.uuid4()),
+            'X-Request-ID': request_id or str(uuid.uuid4()),
             'X-Request-Signature': self._sign_request(data)
         }
-        
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return self._post(url, data, headers)
 
     def register_payment(self, payment: Payment) -> Dict[str, Any]:
         """
@@ -103,6 +104,27 @@ class SBPClient:
 
         return response.get('status')
 
+    def refund_payment(self, payment: Payment, amount: Optional[Decimal] = None,
+                       idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Возвращает платеж полностью или частично
+        """
+        data = {
+            'qrId': payment.payment_id,
+            'merchantId': self.merchant_id,
+            'amount': {
+                'value': str(amount if amount is not None else payment.amount),
+                'currency': 'RUB'
+            }
+        }
+
+        response = self._make_request('qr/refund', data, request_id=idempotency_key)
+
+        if response.get('errorCode'):
+            raise ValueError(f"Ошибка возврата платежа: {response.get('errorMessage')}")
+
+        return response
+
     def process_callback(self, data: Dict[str, Any]) -> Optional[Payment]:
         """
         Обрабатывает уведомление от СБП
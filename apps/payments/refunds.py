@@ -0,0 +1,195 @@
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.core.ratelimit import RateLimiter
+from apps.orders.escrow import EscrowService, held_totals
+from apps.orders.ledger import LedgerService
+from apps.orders.models import Order, Transaction, TransactionType
+from .models import Payment, PaymentStatus, RefundRequest, RefundStatus
+from .providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+
+class RefundService:
+    """
+    Очередь возвратов: заявки создаются при отмене заказа или решении спора
+    в пользу клиента, а обрабатываются пачками. Запросы к провайдерам
+    выполняются параллельно с ограничением частоты, результаты записываются
+    в базу массовыми обновлениями.
+    """
+
+    @staticmethod
+    def queue(order, reason=''):
+        """Ставит возврат по заказу в очередь. Повторная заявка не создается."""
+        payment = order.payments.filter(
+            status=PaymentStatus.COMPLETED
+        ).order_by('-paid_at', '-id').first()
+        amount = payment.amount if payment else EscrowService.held_amount(order)
+        if amount <= 0:
+            return None
+
+        try:
+            with transaction.atomic():
+                return RefundRequest.objects.create(
+                    order=order,
+                    payment=payment,
+                    amount=amount,
+                    reason=reason
+                )
+        except IntegrityError:
+            # Активная заявка по заказу уже есть
+            return RefundRequest.objects.filter(
+                order=order,
+                status__in=[RefundStatus.PENDING, RefundStatus.PROCESSING]
+            ).first()
+
+    @staticmethod
+    def _claim(limit):
+        """
+        Забирает пачку заявок из очереди, переводя их в обработку. Заявки,
+        которые дольше REFUND_CLAIM_TIMEOUT секунд остаются в обработке
+        (обработчик упал, не записав результат), забираются снова.
+        """
+        now = timezone.now()
+        timeout = timedelta(seconds=getattr(settings, 'REFUND_CLAIM_TIMEOUT', 900))
+        with transaction.atomic():
+            ids = list(
+                RefundRequest.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=RefundStatus.PENDING)
+                    | Q(status=RefundStatus.PROCESSING, claimed_at__lt=now - timeout)
+                )
+                .order_by('created_at')
+                .values_list('id', flat=True)[:limit]
+            )
+            RefundRequest.objects.filter(id__in=ids).update(status=RefundStatus.PROCESSING, claimed_at=now)
+        return list(
+            RefundRequest.objects.filter(id__in=ids).select_related('payment')
+        )
+
+    @staticmethod
+    def idempotency_key(refund):
+        """
+        Ключ запроса возврата к провайдеру: один на заявку, поэтому повтор
+        заявки, снова взятой из зависшей обработки, не возвращает деньги дважды
+        """
+        return f'refund-{refund.id}'
+
+    @staticmethod
+    def _execute(refund, limiter):
+        """Выполняет возврат у провайдера. Вызывается в рабочем потоке, к базе не обращается."""
+        if refund.payment is None:
+            # Заказ не оплачивался через провайдера: достаточно вернуть escrow
+            return refund.id, None
+        try:
+            limiter.wait()
+            get_provider(refund.payment.payment_method).refund_payment(
+                refund.payment, refund.amount, idempotency_key=RefundService.idempotency_key(refund)
+            )
+            return refund.id, None
+        except Exception as e:
+            return refund.id, str(e) or e.__class__.__name__
+
+    @staticmethod
+    def process_batch(limit=None, max_workers=None, rate=None):
+        """
+        Обрабатывает пачку заявок на возврат.
+        Возвращает статистику: обработано, успешно, ошибок, сумма, время и скорость.
+        """
+        limit = limit or getattr(settings, 'REFUND_BATCH_SIZE', 100)
+        max_workers = max_workers or getattr(settings, 'REFUND_MAX_WORKERS', 4)
+        rate = rate if rate is not None else getattr(settings, 'REFUND_RATE_LIMIT', 5)
+        max_attempts = getattr(settings, 'REFUND_MAX_ATTEMPTS', 3)
+
+        started = time.monotonic()
+        refunds = RefundService._claim(limit)
+        if not refunds:
+            return {'processed': 0, 'succeeded': 0, 'failed': 0,
+                    'amount': Decimal('0'), 'duration': 0.0, 'per_second': 0.0}
+
+        limiter = RateLimiter(rate)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            errors = dict(executor.map(lambda refund: RefundService._execute(refund, limiter), refunds))
+
+        now = timezone.now()
+        succeeded = []
+        failed = []
+        for refund in refunds:
+            refund.attempts += 1
+            refund.processed_at = now
+            error = errors[refund.id]
+            if error is None:
+                refund.status = RefundStatus.COMPLETED
+                refund.error = ''
+                succeeded.append(refund)
+            else:
+                refund.status = RefundStatus.FAILED if refund.attempts >= max_attempts else RefundStatus.PENDING
+                refund.error = error
+                failed.append(refund)
+
+        with transaction.atomic():
+            RefundRequest.objects.bulk_update(refunds, ['status', 'error', 'attempts', 'processed_at'])
+            if succeeded:
+                RefundService._apply(succeeded, now)
+
+        duration = time.monotonic() - started
+        stats = {
+            'processed': len(refunds),
+            'succeeded': len(succeeded),
+            'failed': len(failed),
+            'amount': sum((refund.amount for refund in succeeded), Decimal('0')),
+            'duration': round(duration, 3),
+            'per_second': round(len(refunds) / duration, 2) if duration else float(len(refunds)),
+        }
+        logger.info(
+            f"Возвраты: обработано {stats['processed']}, успешно {stats['succeeded']}, "
+            f"ошибок {stats['failed']}, {stats['per_second']}/с"
+        )
+        for refund in failed:
+            logger.warning(f"Возврат {refund.id} по заказу {refund.order_id}: {refund.error}")
+        return stats
+
+    @staticmethod
+    def _apply(refunds, now):
+        """
+        Массово отмечает платежи возвращенными и возвращает escrow клиентам.
+        Заказы отменяются через Order.save(), чтобы изменение статуса
+        попало в outbox (order.changed).
+        """
+        order_ids = [refund.order_id for refund in refunds]
+        payment_ids = [refund.payment_id for refund in refunds if refund.payment_id]
+
+        Payment.objects.filter(id__in=payment_ids).update(
+            status=PaymentStatus.REFUNDED,
+            refunded_at=now
+        )
+        for order in Order.objects.select_for_update().filter(id__in=order_ids).exclude(status='cancelled'):
+            order.status = 'cancelled'
+            order.save(update_fields=['status', 'updated_at'])
+
+        held_in, held_out = held_totals()
+        held = (
+            Transaction.objects.filter(order_id__in=order_ids)
+            .values('order_id', 'order__client_id')
+            .annotate(held_in=held_in, held_out=held_out)
+        )
+        postings = [
+            Transaction(
+                user_id=row['order__client_id'],
+                order_id=row['order_id'],
+                amount=row['held_in'] - row['held_out'],
+                type=TransactionType.REFUND,
+                entry_id=uuid.uuid4()
+            )
+            for row in held
+            if row['held_in'] > row['held_out']
+        ]
+        LedgerService.post_many(postings)
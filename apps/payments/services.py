@@ -1,10 +1,11 @@
 from typing import Dict, Any
 from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from apps.core.outbox import OutboxService
 from .models import Payment, PaymentMethod, PaymentStatus
-from .providers.alfabank import AlfaBankClient
-from .providers.sbp import SBPClient
+from .providers import get_provider
 
 
 class PaymentService:
@@ -25,56 +26,46 @@ class PaymentService:
     @staticmethod
     def get_payment_link(payment: Payment) -> str:
         """
-        Генерирует ссылку для оплаты в зависимости от метода
+        Генерирует ссылку для оплаты через провайдера метода оплаты
         """
-        if payment.payment_method == PaymentMethod.CARD:
-            return PaymentService._get_alfabank_payment_link(payment)
-        elif payment.payment_method == PaymentMethod.SBP:
-            return PaymentService._get_sbp_link(payment)
-        raise ValueError(f"Неподдерживаемый метод оплаты: {payment.payment_method}")
+        return get_provider(payment.payment_method).get_payment_link(payment)
 
     @staticmethod
-    def process_payment_callback(payment_id: str, data: Dict[str, Any]) -> bool:
+    def check_payment_status(payment: Payment) -> str:
         """
-        Обрабатывает callback от платежной системы
+        Запрашивает статус платежа у провайдера
         """
-        try:
-            payment = Payment.objects.get(payment_id=payment_id)
-            
-            # Определяем провайдера платежа
-            if payment.payment_method == PaymentMethod.CARD:
-                result = AlfaBankClient().process_callback(data)
-            elif payment.payment_method == PaymentMethod.SBP:
-                result = SBPClient().process_callback(data)
-            else:
-                result = None
-
-            if result:
-                # Обновляем статус заказа
-                order = payment.order
-                order.status = 'in_progress'
-                order.save()
-                return True
-                
-            return False
-        except Payment.DoesNotExist:
-            return False
+        return get_provider(payment.payment_method).check_payment_status(payment)
 
     @staticmethod
-    def _get_alfabank_payment_link(payment: Payment) -> str:
+    def refund_payment(payment: Payment, amount: Decimal = None) -> Dict[str, Any]:
         """
-        Получает ссылку для оплаты через Альфа-Банк
+        Запрашивает возврат платежа у провайдера
         """
-        client = AlfaBankClient()
-        response = client.register_payment(payment)
-        return response['formUrl']
+        return get_provider(payment.payment_method).refund_payment(payment, amount)
 
     @staticmethod
-    def _get_sbp_link(payment: Payment) -> str:
+    def process_payment_callback(payment_id: str, data: Dict[str, Any]) -> bool:
         """
-        Получает ссылку для оплаты через СБП
+        Обрабатывает callback от платежной системы
         """
-        client = SBPClient()
-        response = client.register_payment(payment)
-        # Возвращаем URL для оплаты через СБП
-        return response['qrUrl'] 
\ No newline at end of file
+        try:
+            payment = Payment.objects.get(payment_id=payment_id)
+        except Payment.DoesNotExist:
+            return False
+
+        try:
+            provider = get_provider(payment.payment_method)
+        except ValueError:
+            return False
+
+        if provider.process_callback(data):
+            # Обновляем статус заказа; уведомления рассылает релей outbox
+            order = payment.order
+            with transaction.atomic():
+                order.status = 'in_progress'
+                order.save()
+                OutboxService.publish('payment.completed', payment_id=payment.id, order_id=order.id)
+            return True
+
+        return False
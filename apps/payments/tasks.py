@@ -0,0 +1,24 @@
+from celery import shared_task
+import logging
+from apps.core.task_metrics import record_rows
+from .refunds import RefundService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def process_refunds(self, max_batches=10):
+    """Обрабатывает очередь возвратов пачками"""
+    totals = {'processed': 0, 'succeeded': 0, 'failed': 0}
+    try:
+        for _ in range(max_batches):
+            stats = RefundService.process_batch()
+            for key in totals:
+                totals[key] += stats[key]
+            if not stats['processed']:
+                break
+    except Exception as e:
+        logger.error(f"Ошибка обработки возвратов: {str(e)}")
+        raise self.retry(exc=e, countdown=300)
+    record_rows(totals['processed'])
+    return totals
@@ -1,3 +1,117 @@
+from decimal import Decimal
+from unittest import mock
+from django.contrib.auth import get_user_model
+from datetime import timedelta
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from apps.core.models import OutboxEvent
+from apps.orders.escrow import EscrowService
+from apps.orders.models import Order
+from .models import Payment, PaymentStatus, RefundRequest, RefundStatus
+from .refunds import RefundService
 
-# Create your tests here.
+User = get_user_model()
+
+
+class RefundServiceTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+
+    def _paid_order(self, number):
+        order = Order.objects.create(
+            client=self.client_user, expert=self.expert, title=f'Заказ {number}',
+            budget=Decimal('300.00'), status='in_progress'
+        )
+        EscrowService.hold(order)
+        Payment.objects.create(
+            order=order, amount=Decimal('300.00'), payment_method='card',
+            status=PaymentStatus.COMPLETED, payment_id=f'pay-{number}', paid_at=timezone.now()
+        )
+        return order
+
+    def test_queue_is_deduplicated(self):
+        order = self._paid_order(1)
+        first = RefundService.queue(order)
+        second = RefundService.queue(order)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(RefundRequest.objects.count(), 1)
+
+    @mock.patch('apps.payments.refunds.get_provider')
+    def test_batch_refunds_payments_orders_and_escrow(self, get_provider):
+        orders = [self._paid_order(n) for n in range(3)]
+        for order in orders:
+            RefundService.queue(order)
+
+        stats = RefundService.process_batch(rate=0)
+
+        self.assertEqual(get_provider.return_value.refund_payment.call_count, 3)
+        self.assertEqual((stats['processed'], stats['succeeded'], stats['failed']), (3, 3, 0))
+        self.assertEqual(stats['amount'], Decimal('900.00'))
+        self.assertFalse(Payment.objects.exclude(status=PaymentStatus.REFUNDED).exists())
+        self.assertFalse(Order.objects.exclude(status='cancelled').exists())
+        self.client_user.refresh_from_db()
+        self.assertEqual(self.client_user.frozen_balance, Decimal('0.00'))
+        # Отмена заказов прошла через Order.save() и попала в outbox
+        cancelled = [
+            event.payload['order_id'] for event in OutboxEvent.objects.filter(event_type='order.changed')
+            if event.payload['status'] == 'cancelled'
+        ]
+        self.assertCountEqual(cancelled, [order.id for order in orders])
+
+    @mock.patch('apps.payments.refunds.get_provider')
+    def test_stale_processing_refund_is_requeued(self, get_provider):
+        fresh, stale = [RefundService.queue(self._paid_order(n)) for n in range(2)]
+        RefundRequest.objects.filter(pk=fresh.pk).update(status=RefundStatus.PROCESSING, claimed_at=timezone.now())
+        RefundRequest.objects.filter(pk=stale.pk).update(
+            status=RefundStatus.PROCESSING, claimed_at=timezone.now() - timedelta(hours=1)
+        )
+
+        stats = RefundService.process_batch(rate=0)
+
+        self.assertEqual(stats['succeeded'], 1)
+        self.assertEqual(RefundRequest.objects.get(pk=stale.pk).status, RefundStatus.COMPLETED)
+        self.assertEqual(RefundRequest.objects.get(pk=fresh.pk).status, RefundStatus.PROCESSING)
+
+    @mock.patch('apps.payments.refunds.get_provider')
+    def test_failed_refund_is_retried(self, get_provider):
+        get_provider.return_value.refund_payment.side_effect = ValueError('Банк недоступен')
+        order = self._paid_order(1)
+        RefundService.queue(order)
+
+        stats = RefundService.process_batch(rate=0)
+
+        self.assertEqual(stats['failed'], 1)
+        refund = RefundRequest.objects.get()
+        self.assertEqual(refund.status, RefundStatus.PENDING)
+        self.assertEqual(refund.attempts, 1)
+        self.assertEqual(refund.error, 'Банк недоступен')
+        self.assertEqual(EscrowService.held_amount(order), Decimal('300.00'))
+
+    @mock.patch('apps.payments.refunds.get_provider')
+    def test_dispute_refund_releases_escrow_only_after_provider(self, get_provider):
+        from rest_framework.test import APIClient
+        from apps.orders.models import Dispute
+
+        get_provider.return_value.refund_payment.side_effect = ValueError('Банк недоступен')
+        order = self._paid_order(1)
+        dispute = Dispute.objects.create(order=order, reason='Работа не сдана')
+        admin = User.objects.create_user(username='admin', password='pass', role='admin')
+        api = APIClient()
+        api.force_authenticate(admin)
+
+        response = api.post(reverse('dispute-resolve', args=[dispute.id]), {'decision': 'client'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        refund = RefundRequest.objects.get(order=order)
+        self.assertEqual(refund.amount, Decimal('300.00'))
+
+        # Провайдер не вернул деньги: средства клиента остаются в escrow
+        RefundService.process_batch(rate=0)
+        self.assertEqual(EscrowService.held_amount(order), Decimal('300.00'))
+
+        get_provider.return_value.refund_payment.side_effect = None
+        RefundService.process_batch(rate=0)
+        self.assertEqual(EscrowService.held_amount(order), Decimal('0.00'))
+        keys = {call.kwargs['idempotency_key'] for call in get_provider.return_value.refund_payment.call_args_list}
+        self.assertEqual(keys, {f'refund-{refund.id}'})
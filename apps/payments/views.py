@@ -7,8 +7,10 @@ from django.http import HttpResponse
 from .models import Payment, PaymentMethod
 from .serializers import PaymentSerializer
 from .services import PaymentService
+from .providers import is_supported
 from .utils import generate_qr_code
 from apps.orders.models import Order
+from apps.core.idempotency import idempotent
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
@@ -23,6 +25,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(order__client=user)
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def create_payment(self, request):
         """
         Создает новый платеж для заказа
@@ -44,7 +47,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if payment_method not in PaymentMethod.values:
+        if not is_supported(payment_method):
             return Response(
                 {'error': 'Неподдерживаемый метод оплаты'},
                 status=status.HTTP_400_BAD_REQUEST
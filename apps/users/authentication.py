@@ -0,0 +1,119 @@
+import copy
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import User
+
+TOKEN_VERSION_CLAIM = 'ver'
+
+# Поля, которые не кэшируются для request.user: хэш пароля и суммы со
+# счетчиками, которые меняются через update()/F() без сохранения модели
+# (и без сброса кэша). Они отложены и читаются из базы при обращении.
+# Остальные поля (профиль) кэшируются: сохранение пользователя сбрасывает
+# запись в кэше (signals.invalidate_auth_cache).
+AUTH_USER_DEFERRED_FIELDS = (
+    'password', 'balance', 'frozen_balance',
+    'total_referrals', 'active_referrals', 'total_earnings', 'paid_earnings',
+)
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+class AuthUserCache:
+    """
+    Двухуровневый кэш пользователей для JWT-аутентификации: короткий
+    локальный кэш процесса и Redis. Ключ — id пользователя и версия токена,
+    поэтому после отзыва токенов (увеличения token_version) старые записи
+    больше не читаются. Локальный кэш других процессов живет не дольше
+    AUTH_USER_LOCAL_CACHE_TIMEOUT секунд.
+    """
+
+    @staticmethod
+    def _key(user_id, version):
+        return f'auth_user:{user_id}:{version}'
+
+    @staticmethod
+    def get(user_id, version):
+        key = AuthUserCache._key(user_id, version)
+        entry = _local.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        user = cache.get(key)
+        if user is not None:
+            AuthUserCache._set_local(key, user)
+        return user
+
+    @staticmethod
+    def set(user):
+        key = AuthUserCache._key(user.pk, user.token_version)
+        cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        AuthUserCache._set_local(key, user)
+
+    @staticmethod
+    def _set_local(key, user):
+        timeout = getattr(settings, 'AUTH_USER_LOCAL_CACHE_TIMEOUT', 5)
+        with _local_lock:
+            if len(_local) >= getattr(settings, 'AUTH_USER_LOCAL_CACHE_SIZE', 10000):
+                _local.clear()
+            _local[key] = (time.monotonic() + timeout, user)
+
+    @staticmethod
+    def invalidate(user_id, version):
+        key = AuthUserCache._key(user_id, version)
+        with _local_lock:
+            _local.pop(key, None)
+        cache.delete(key)
+
+    @staticmethod
+    def load(user_id):
+        return User.objects.defer(*AUTH_USER_DEFERRED_FIELDS).get(pk=user_id)
+
+    @staticmethod
+    def revoke_tokens(user):
+        """Отзывает все выданные токены пользователя (смена пароля, выход со всех устройств)"""
+        AuthUserCache.invalidate(user.pk, user.token_version)
+        user.token_version += 1
+        User.objects.filter(pk=user.pk).update(token_version=user.token_version)
+
+
+def clear_local_cache():
+    """Сбрасывает локальный кэш процесса (в тестах)"""
+    with _local_lock:
+        _local.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication без запроса пользователя на каждый вызов API:
+    пользователь берется из AuthUserCache, в базу идет только промах кэша.
+    Токен с устаревшей версией (token_version) отклоняется.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+        user = AuthUserCache.get(user_id, version)
+        if user is None:
+            try:
+                user = AuthUserCache.load(user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if user.token_version != version:
+                raise AuthenticationFailed('Токен отозван', code='token_revoked')
+            AuthUserCache.set(user)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        # Копия: изменения request.user в одном запросе не попадают в общий кэш
+        return copy.copy(user)
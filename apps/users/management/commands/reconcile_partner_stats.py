@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.users.services import PartnerService
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики партнеров с начислениями и рефералами и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rollups',
+            action='store_true',
+            help='Также пересобрать помесячные итоги начислений'
+        )
+
+    def handle(self, *args, **options):
+        fixed = PartnerService.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено партнеров: {fixed}'))
+        if options['rollups']:
+            PartnerService.rebuild_rollups()
+            self.stdout.write(self.style.SUCCESS('Помесячные итоги начислений пересобраны'))
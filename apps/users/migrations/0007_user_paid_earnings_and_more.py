@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:52
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def fill_paid_earnings(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    PartnerEarning = apps.get_model('users', 'PartnerEarning')
+    paid = PartnerEarning.objects.filter(is_paid=True)
+    totals = paid.filter(partner=OuterRef('pk')).order_by().values('partner').annotate(
+        total=Sum('amount')
+    ).values('total')
+    User.objects.filter(pk__in=paid.values('partner')).update(paid_earnings=Subquery(totals))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_ledgermonthlyrollup_transaction_entry_id_and_more'),
+        ('users', '0006_remove_user_franchisee_user_active_referrals_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='paid_earnings',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Выплачено партнеру'),
+        ),
+        migrations.AddIndex(
+            model_name='partnerearning',
+            index=models.Index(fields=['partner', '-created_at'], name='users_partn_partner_3ab42f_idx'),
+        ),
+        migrations.RunPython(fill_paid_earnings, migrations.RunPython.noop),
+    ]
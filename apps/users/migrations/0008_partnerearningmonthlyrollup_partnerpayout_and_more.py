@@ -0,0 +1,91 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    PartnerEarning = apps.get_model('users', 'PartnerEarning')
+    PartnerEarningMonthlyRollup = apps.get_model('users', 'PartnerEarningMonthlyRollup')
+    rows = (
+        PartnerEarning.objects.order_by()
+        .annotate(month=TruncMonth('created_at', output_field=DateField()))
+        .values('partner_id', 'month', 'earning_type')
+        .annotate(
+            total=Sum('amount'),
+            paid_total=Sum('amount', filter=Q(is_paid=True)),
+            entries_count=Count('id')
+        )
+    )
+    PartnerEarningMonthlyRollup.objects.bulk_create([
+        PartnerEarningMonthlyRollup(
+            partner_id=row['partner_id'],
+            month=row['month'],
+            earning_type=row['earning_type'],
+            total=row['total'],
+            paid_total=row['paid_total'] or 0,
+            entries_count=row['entries_count']
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_ledgermonthlyrollup_transaction_entry_id_and_more'),
+        ('users', '0007_user_paid_earnings_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartnerEarningMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('earning_type', models.CharField(max_length=20, verbose_name='Тип начисления')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Начислено')),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выплачено')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Количество начислений')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='earning_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Партнер')),
+            ],
+            options={
+                'verbose_name': 'Итоги начислений за месяц',
+                'verbose_name_plural': 'Итоги начислений по месяцам',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PartnerPayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Сумма выплаты')),
+                ('earnings_count', models.PositiveIntegerField(default=0, verbose_name='Количество начислений')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата выплаты')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_partner_payouts', to=settings.AUTH_USER_MODEL, verbose_name='Создал')),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partner_payouts', to=settings.AUTH_USER_MODEL, verbose_name='Партнер')),
+            ],
+            options={
+                'verbose_name': 'Выплата партнеру',
+                'verbose_name_plural': 'Выплаты партнерам',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='partnerearning',
+            name='payout',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='earnings', to='users.partnerpayout', verbose_name='Выплата'),
+        ),
+        migrations.AddIndex(
+            model_name='partnerearning',
+            index=models.Index(fields=['partner', 'is_paid'], name='users_partn_partner_56d7d3_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='partnerearningmonthlyrollup',
+            unique_together={('partner', 'month', 'earning_type')},
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
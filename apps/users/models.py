@@ -33,6 +33,10 @@ class User(AbstractUser):
     total_referrals = models.PositiveIntegerField(default=0, verbose_name="Всего рефералов")
     active_referrals = models.PositiveIntegerField(default=0, verbose_name="Активных рефералов")
     total_earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Общий доход")
+    paid_earnings = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Выплачено партнеру")
+
+    # Версия JWT: токены с другой версией отклоняются (см. CachedJWTAuthentication)
+    token_version = models.PositiveIntegerField(default=0, verbose_name="Версия токенов")
     
     def save(self, *args, **kwargs):
         # Генерируем реферальный код для партнеров
@@ -62,13 +66,68 @@ class PartnerEarning(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     is_paid = models.BooleanField(default=False, verbose_name="Выплачено")
+    payout = models.ForeignKey(
+        'PartnerPayout',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='earnings',
+        verbose_name="Выплата"
+    )
     
     class Meta:
         verbose_name = "Доход партнера"
         verbose_name_plural = "Доходы партнеров"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['partner', '-created_at']),
+            models.Index(fields=['partner', 'is_paid']),
+        ]
     
     def __str__(self):
         return f"{self.partner.username} - {self.amount} ₽ от {self.referral.username}"
 
 
+
+
+class PartnerPayout(models.Model):
+    """Выплата партнеру: объединяет все невыплаченные начисления на момент создания"""
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='partner_payouts', verbose_name="Партнер")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Сумма выплаты")
+    earnings_count = models.PositiveIntegerField(default=0, verbose_name="Количество начислений")
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='created_partner_payouts',
+        verbose_name="Создал"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата выплаты")
+
+    class Meta:
+        verbose_name = "Выплата партнеру"
+        verbose_name_plural = "Выплаты партнерам"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Выплата {self.amount} ₽ партнеру {self.partner_id}"
+
+
+class PartnerEarningMonthlyRollup(models.Model):
+    """Помесячные итоги начислений партнера по типам"""
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='earning_rollups', verbose_name="Партнер")
+    month = models.DateField(verbose_name="Месяц")
+    earning_type = models.CharField(max_length=20, verbose_name="Тип начисления")
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Начислено")
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Выплачено")
+    entries_count = models.PositiveIntegerField(default=0, verbose_name="Количество начислений")
+
+    class Meta:
+        verbose_name = "Итоги начислений за месяц"
+        verbose_name_plural = "Итоги начислений по месяцам"
+        unique_together = ('partner', 'month', 'earning_type')
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.partner_id} {self.month:%Y-%m} {self.earning_type}: {self.total}"
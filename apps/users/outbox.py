@@ -0,0 +1,58 @@
+from decimal import Decimal
+from apps.orders.models import Order
+from .models import User, PartnerEarning
+from .services import PartnerService
+
+
+def partner_accounting(payloads):
+    """
+    Обработчик outbox 'order.changed': учитывает реферала как активного
+    при первом заказе и начисляет партнеру комиссию при завершении заказа
+    """
+    relevant = [
+        payload for payload in payloads
+        if payload['created'] or ('status' in payload['changed_fields'] and payload['status'] == 'completed')
+    ]
+    if not relevant:
+        return
+
+    partners = dict(
+        User.objects.filter(
+            id__in={payload['client_id'] for payload in relevant},
+            partner__isnull=False
+        ).values_list('id', 'partner_id')
+    )
+
+    for payload in relevant:
+        partner_id = partners.get(payload['client_id'])
+        if not partner_id:
+            continue
+
+        if payload['created']:
+            # Реферал становится активным при первом заказе
+            if not Order.objects.filter(client_id=payload['client_id'], pk__lt=payload['order_id']).exists():
+                PartnerService.activate_referral(User(pk=partner_id))
+
+        if payload['status'] != 'completed' or 'status' not in payload['changed_fields']:
+            continue
+        # Проверяем, что начисление еще не было создано (повторное завершение, повтор события)
+        if PartnerEarning.objects.filter(partner_id=partner_id, order_id=payload['order_id']).exists():
+            continue
+
+        partner = User.objects.only('id', 'partner_commission_rate').get(pk=partner_id)
+        order = Order.objects.only('id', 'budget').get(pk=payload['order_id'])
+
+        # Рассчитываем сумму начисления
+        order_amount = Decimal(str(order.budget))
+        commission_rate = partner.partner_commission_rate / 100
+        earning_amount = order_amount * commission_rate
+
+        PartnerService.record_earning(
+            partner=partner,
+            referral_id=payload['client_id'],
+            order=order,
+            amount=earning_amount,
+            commission_rate=partner.partner_commission_rate,
+            source_amount=order_amount,
+            earning_type='order'
+        )
@@ -2,6 +2,8 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.password_validation import validate_password
+from .authentication import TOKEN_VERSION_CLAIM
+from .services import UserCardService
 
 User = get_user_model()
 
@@ -17,7 +19,7 @@ class UserSerializer(serializers.ModelSerializer):
             'avatar', 'bio', 'experience_years', 'hourly_rate', 'education', 
             'skills', 'portfolio_url', 'is_verified',
             'referral_code', 'partner_commission_rate', 'total_referrals', 
-            'active_referrals', 'total_earnings'
+            'active_referrals', 'total_earnings', 'paid_earnings'
         ]
         read_only_fields = ['email', 'date_joined', 'last_login', 'is_verified']
     
@@ -28,6 +30,26 @@ class UserSerializer(serializers.ModelSerializer):
             return SpecializationSerializer(obj.specializations.all(), many=True).data
         return []
 
+class UserCardSerializer(serializers.BaseSerializer):
+    """
+    Краткая публичная карточка пользователя для вложенных представлений.
+    Карточки берутся из кэша (UserCardService) и запоминаются в контексте,
+    поэтому повторяющийся в ответе пользователь собирается один раз.
+    """
+
+    def to_representation(self, instance):
+        cards = self.context.setdefault('_user_cards', {})
+        card = cards.get(instance.pk)
+        if card is None:
+            card = UserCardService.get_card(instance)
+            cards[instance.pk] = card
+
+        request = self.context.get('request')
+        if card['avatar'] and request is not None:
+            card = dict(card, avatar=request.build_absolute_uri(card['avatar']))
+        return card
+
+
 class UserCreateSerializer(serializers.Serializer):
     # MVP: упрощенная регистрация
     email = serializers.EmailField(required=False)
@@ -95,12 +117,8 @@ class UserCreateSerializer(serializers.Serializer):
             role=role,
             partner=partner,
         )
-        
-        # Обновляем статистику партнера
-        if partner:
-            partner.total_referrals += 1
-            partner.save()
 
+        # Счетчики партнера обновляет сигнал post_save пользователя
         return user
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -127,6 +145,18 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         return attrs
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        """
+        Добавляет в токен роль и версию токенов, чтобы частые запросы
+        проверяли права без обращения к базе.
+        Access-токен при обновлении наследует эти claims из refresh-токена.
+        """
+        token = super().get_token(user)
+        token['role'] = user.role
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
     def validate(self, attrs):
         # Поддерживаем вход по username, email или телефону
         username = attrs.get('username')
@@ -0,0 +1,357 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum, Count, Exists, OuterRef, Subquery, Value, DecimalField, DateField
+from django.db.models.functions import Coalesce, TruncMonth
+from apps.orders.ledger import month_start
+from .models import User, PartnerEarning, PartnerPayout, PartnerEarningMonthlyRollup
+
+EARNINGS_FEED_TIMEOUT = 60 * 10
+USER_CARD_TIMEOUT = 60 * 60
+
+
+class UserCardService:
+    """
+    Карточка пользователя для вложенных представлений (заказы, отклики,
+    комментарии, отзывы): id, имя, аватар, рейтинг, верификация.
+    Хранится в кэше до изменения профиля или статистики эксперта.
+    """
+
+    @staticmethod
+    def _key(user_id):
+        return f'user_card:{user_id}'
+
+    @staticmethod
+    def build(user):
+        rating = None
+        if user.role == 'expert':
+            from apps.experts.models import ExpertStatistics
+            if type(user).statistics.is_cached(user):
+                # Статистика загружена вместе с пользователем (select_related/prefetch_related)
+                statistics = getattr(user, 'statistics', None)
+                rating = statistics.average_rating if statistics else None
+            else:
+                rating = ExpertStatistics.objects.filter(expert_id=user.pk).values_list(
+                    'average_rating', flat=True
+                ).first()
+        return {
+            'id': user.pk,
+            'username': user.username,
+            'avatar': user.avatar.url if user.avatar else None,
+            'rating': float(rating) if rating is not None else None,
+            'is_verified': user.is_verified,
+        }
+
+    @staticmethod
+    def get_card(user):
+        key = UserCardService._key(user.pk)
+        card = cache.get(key)
+        if card is None:
+            card = UserCardService.build(user)
+            cache.set(key, card, USER_CARD_TIMEOUT)
+        return card
+
+    @staticmethod
+    def invalidate(user_id):
+        cache.delete(UserCardService._key(user_id))
+
+
+class PartnerService:
+    """
+    Счетчики партнера (total_referrals, active_referrals, total_earnings,
+    paid_earnings) поддерживаются инкрементально через F()-выражения.
+    Полный пересчет агрегатами — только в reconcile().
+    """
+
+    @staticmethod
+    def record_earning(partner, referral_id, amount, commission_rate, source_amount,
+                       earning_type='order', order=None):
+        """Создает начисление и увеличивает доход партнера"""
+        with transaction.atomic():
+            earning = PartnerEarning.objects.create(
+                partner=partner,
+                referral_id=referral_id,
+                order=order,
+                amount=amount,
+                commission_rate=commission_rate,
+                source_amount=source_amount,
+                earning_type=earning_type
+            )
+            User.objects.filter(pk=partner.pk).update(
+                total_earnings=F('total_earnings') + amount
+            )
+            PartnerService._bump_rollup(
+                partner.pk, month_start(), earning_type,
+                total=amount, entries_count=1
+            )
+        PartnerService.invalidate_earnings_feed(partner.pk)
+        return earning
+
+    @staticmethod
+    def _bump_rollup(partner_id, month, earning_type, **deltas):
+        """Увеличивает помесячный итог партнера, создавая строку при первой записи"""
+        lookup = {'partner_id': partner_id, 'month': month, 'earning_type': earning_type}
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        if PartnerEarningMonthlyRollup.objects.filter(**lookup).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                PartnerEarningMonthlyRollup.objects.create(**lookup, **deltas)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            PartnerEarningMonthlyRollup.objects.filter(**lookup).update(**updates)
+
+    @staticmethod
+    def _settle(earnings, payout=None):
+        """
+        Отмечает выбранные (заблокированные) начисления выплаченными одним UPDATE
+        и переносит суммы в paid_earnings партнеров и помесячные итоги.
+        Возвращает {partner_id: (сумма, количество)}.
+        """
+        by_month = list(
+            earnings.order_by()
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('partner_id', 'month', 'earning_type')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+        updates = {'is_paid': True}
+        if payout is not None:
+            updates['payout'] = payout
+        earnings.update(**updates)
+
+        per_partner = {}
+        for row in by_month:
+            total, count = per_partner.get(row['partner_id'], (Decimal('0'), 0))
+            per_partner[row['partner_id']] = (total + row['total'], count + row['count'])
+            PartnerService._bump_rollup(
+                row['partner_id'], row['month'], row['earning_type'],
+                paid_total=row['total']
+            )
+        for partner_id, (total, _) in per_partner.items():
+            User.objects.filter(pk=partner_id).update(paid_earnings=F('paid_earnings') + total)
+        return per_partner
+
+    @staticmethod
+    def register_referral(partner):
+        """Учитывает нового реферала"""
+        User.objects.filter(pk=partner.pk).update(total_referrals=F('total_referrals') + 1)
+
+    @staticmethod
+    def activate_referral(partner):
+        """Учитывает реферала, сделавшего первый заказ"""
+        User.objects.filter(pk=partner.pk).update(active_referrals=F('active_referrals') + 1)
+
+    @staticmethod
+    def mark_paid(earning_ids):
+        """
+        Отмечает начисления выплаченными и увеличивает paid_earnings партнеров.
+        Уже выплаченные начисления пропускаются. Возвращает число отмеченных.
+        """
+        with transaction.atomic():
+            ids = list(
+                PartnerEarning.objects.select_for_update()
+                .filter(id__in=earning_ids, is_paid=False)
+                .values_list('id', flat=True)
+            )
+            per_partner = PartnerService._settle(PartnerEarning.objects.filter(id__in=ids))
+        for partner_id in per_partner:
+            PartnerService.invalidate_earnings_feed(partner_id)
+        return len(ids)
+
+    @staticmethod
+    def create_payouts(partner_ids=None, created_by=None):
+        """
+        Создает по выплате на каждого партнера с невыплаченными начислениями.
+        Начисления партнера блокируются, привязываются к выплате и отмечаются
+        выплаченными одним UPDATE в той же транзакции. Возвращает список выплат.
+        """
+        unpaid = PartnerEarning.objects.filter(is_paid=False)
+        if partner_ids is not None:
+            unpaid = unpaid.filter(partner_id__in=partner_ids)
+        partners = list(unpaid.order_by('partner_id').values_list('partner_id', flat=True).distinct())
+
+        payouts = []
+        for partner_id in partners:
+            with transaction.atomic():
+                ids = list(
+                    PartnerEarning.objects.select_for_update()
+                    .filter(partner_id=partner_id, is_paid=False)
+                    .values_list('id', flat=True)
+                )
+                if not ids:
+                    continue
+                earnings = PartnerEarning.objects.filter(id__in=ids)
+                totals = earnings.aggregate(total=Sum('amount'), count=Count('id'))
+                payout = PartnerPayout.objects.create(
+                    partner_id=partner_id,
+                    amount=totals['total'],
+                    earnings_count=totals['count'],
+                    created_by=created_by
+                )
+                PartnerService._settle(earnings, payout=payout)
+            PartnerService.invalidate_earnings_feed(partner_id)
+            payouts.append(payout)
+        return payouts
+
+    @staticmethod
+    def rebuild_rollups():
+        """Пересобирает помесячные итоги начислений одним агрегирующим запросом"""
+        rows = (
+            PartnerEarning.objects.order_by()
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('partner_id', 'month', 'earning_type')
+            .annotate(
+                total=Sum('amount'),
+                paid_total=Coalesce(
+                    Sum('amount', filter=Q(is_paid=True)),
+                    Value(Decimal('0'), output_field=DecimalField(max_digits=12, decimal_places=2))
+                ),
+                entries_count=Count('id')
+            )
+        )
+        with transaction.atomic():
+            PartnerEarningMonthlyRollup.objects.all().delete()
+            PartnerEarningMonthlyRollup.objects.bulk_create(
+                [PartnerEarningMonthlyRollup(**row) for row in rows.iterator()],
+                batch_size=1000
+            )
+
+    @staticmethod
+    def _feed_version(partner_id):
+        return cache.get(f'partner_earnings_version:{partner_id}') or 0
+
+    @staticmethod
+    def invalidate_earnings_feed(partner_id):
+        """Новая версия ленты начислений: старые страницы в кэше больше не читаются"""
+        key = f'partner_earnings_version:{partner_id}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    @staticmethod
+    def get_earnings_page(partner, page=1, page_size=20):
+        """Страница ленты начислений партнера (кэшируется до следующего изменения)"""
+        page = max(int(page), 1)
+        version = PartnerService._feed_version(partner.pk)
+        key = f'partner_earnings:{partner.pk}:{version}:{page}:{page_size}'
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+        offset = (page - 1) * page_size
+        earnings = (
+            PartnerEarning.objects.filter(partner=partner)
+            .order_by('-created_at', '-id')
+            .values(
+                'id', 'amount', 'earning_type', 'created_at', 'is_paid',
+                'order_id', referral_username=F('referral__username')
+            )[offset:offset + page_size + 1]
+        )
+        results = list(earnings)
+        data = {
+            'page': page,
+            'page_size': page_size,
+            'has_next': len(results) > page_size,
+            'results': [
+                {
+                    'id': row['id'],
+                    'amount': row['amount'],
+                    'referral': row['referral_username'],
+                    'earning_type': row['earning_type'],
+                    'order': row['order_id'],
+                    'created_at': row['created_at'],
+                    'is_paid': row['is_paid'],
+                }
+                for row in results[:page_size]
+            ],
+        }
+        cache.set(key, data, EARNINGS_FEED_TIMEOUT)
+        return data
+
+    @staticmethod
+    def reconcile(partners=None):
+        """
+        Пересчитывает счетчики партнеров агрегатами в базе.
+        Возвращает количество партнеров с исправленными счетчиками.
+        """
+        from apps.orders.models import Order
+
+        money = DecimalField(max_digits=10, decimal_places=2)
+        zero = Value(Decimal('0'), output_field=money)
+        earnings = PartnerEarning.objects.filter(partner=OuterRef('pk')).order_by().values('partner')
+        referrals = User.objects.filter(partner=OuterRef('pk')).order_by().values('partner')
+        active = referrals.filter(Exists(Order.objects.filter(client=OuterRef('pk'))))
+
+        def subquery_sum(qs, expression):
+            return Coalesce(Subquery(qs.annotate(v=expression).values('v')), zero, output_field=money)
+
+        def subquery_count(qs):
+            return Coalesce(Subquery(qs.annotate(v=Count('pk')).values('v')), 0)
+
+        queryset = User.objects.filter(role='partner') if partners is None else User.objects.filter(
+            pk__in=[p.pk for p in partners]
+        )
+        rows = queryset.annotate(
+            actual_total_referrals=subquery_count(referrals),
+            actual_active_referrals=subquery_count(active),
+            actual_total_earnings=subquery_sum(earnings, Sum('amount')),
+            actual_paid_earnings=subquery_sum(earnings, Sum('amount', filter=Q(is_paid=True))),
+        ).filter(
+            ~Q(total_referrals=F('actual_total_referrals'))
+            | ~Q(active_referrals=F('actual_active_referrals'))
+            | ~Q(total_earnings=F('actual_total_earnings'))
+            | ~Q(paid_earnings=F('actual_paid_earnings'))
+        ).values_list(
+            'pk', 'actual_total_referrals', 'actual_active_referrals',
+            'actual_total_earnings', 'actual_paid_earnings'
+        )
+
+        fixed = 0
+        for pk, total_referrals, active_referrals, total_earnings, paid_earnings in rows:
+            User.objects.filter(pk=pk).update(
+                total_referrals=total_referrals,
+                active_referrals=active_referrals,
+                total_earnings=total_earnings,
+                paid_earnings=paid_earnings
+            )
+            PartnerService.invalidate_earnings_feed(pk)
+            fixed += 1
+        return fixed
+
+    @staticmethod
+    def referrals_with_stats(partner):
+        """
+        Рефералы партнера с количеством заказов, суммой оплаченных заказов
+        и принесенной комиссией. Каждая метрика — коррелированный подзапрос,
+        поэтому строки не размножаются join-ами и не нужен GROUP BY по всем полям.
+        """
+        from apps.orders.models import Order
+
+        money = DecimalField(max_digits=12, decimal_places=2)
+        zero = Value(Decimal('0'), output_field=money)
+
+        client_orders = Order.objects.filter(client=OuterRef('pk')).order_by().values('client')
+        expert_orders = Order.objects.filter(expert=OuterRef('pk')).order_by().values('expert')
+        earnings = PartnerEarning.objects.filter(
+            partner=partner,
+            referral=OuterRef('pk')
+        ).order_by().values('referral')
+
+        return partner.referrals.annotate(
+            client_orders_count=Coalesce(Subquery(client_orders.annotate(v=Count('pk')).values('v')), 0),
+            expert_orders_count=Coalesce(Subquery(expert_orders.annotate(v=Count('pk')).values('v')), 0),
+            spend=Coalesce(
+                Subquery(
+                    client_orders.filter(status='completed').annotate(v=Sum('budget')).values('v'),
+                    output_field=money
+                ),
+                zero,
+                output_field=money
+            ),
+            commission=Coalesce(
+                Subquery(earnings.annotate(v=Sum('amount')).values('v'), output_field=money),
+                zero,
+                output_field=money
+            ),
+        )
@@ -1,8 +1,13 @@
-from django.test import TestCase
+from decimal import Decimal
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
+from .authentication import AuthUserCache, AUTH_USER_DEFERRED_FIELDS, clear_local_cache
+from .models import PartnerEarning, PartnerEarningMonthlyRollup
+from .services import PartnerService
+from apps.core.outbox import OutboxService
 
 User = get_user_model()
 
@@ -104,3 +109,184 @@ class AuthenticationTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['username'], self.user_data['username'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_local_cache()
+        self.addCleanup(clear_local_cache)
+        self.user = User.objects.create_user(username='client', password='pass', role='client')
+        self.url = reverse('user-me')
+
+    def _login(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'client', 'password': 'pass'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return response.data
+
+    def test_token_contains_role_and_version(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        token = AccessToken(self._login()['access'])
+        self.assertEqual(token['role'], 'client')
+        self.assertEqual(token['ver'], 0)
+        self.assertNotIn('specializations', token)
+
+    def test_user_is_resolved_from_cache(self):
+        self._login()
+        self.client.get(self.url)
+        # Остается только чтение профиля в самом представлении
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['username'], 'client')
+
+    def test_user_save_invalidates_cache(self):
+        self._login()
+        self.client.get(self.url)
+        self.user.first_name = 'Иван'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).data['first_name'], 'Иван')
+
+    def test_cached_user_has_profile_but_not_balances(self):
+        user = AuthUserCache.load(self.user.pk)
+        with self.assertNumQueries(0):
+            user.referral_code, user.avatar, user.phone, user.partner_id
+        self.assertEqual(user.get_deferred_fields(), set(AUTH_USER_DEFERRED_FIELDS))
+
+    def test_revoked_tokens_are_rejected(self):
+        self._login()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        AuthUserCache.revoke_tokens(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self._login()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UserCardTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.expert = User.objects.create_user(username='expert', password='pass', role='expert')
+
+    def test_card_is_cached_and_invalidated_on_profile_change(self):
+        from apps.experts.models import ExpertStatistics
+        from .serializers import UserCardSerializer
+        ExpertStatistics.objects.create(expert=self.expert, average_rating=Decimal('4.50'))
+
+        card = UserCardSerializer(self.expert).data
+        self.assertEqual(card, {
+            'id': self.expert.pk, 'username': 'expert', 'avatar': None,
+            'rating': 4.5, 'is_verified': False,
+        })
+        with self.assertNumQueries(0):
+            UserCardSerializer(self.expert).data
+
+        self.expert.is_verified = True
+        self.expert.save()
+        self.assertTrue(UserCardSerializer(self.expert).data['is_verified'])
+
+
+class PartnerCountersTests(APITestCase):
+    def setUp(self):
+        self.partner = User.objects.create_user(username='partner', password='pass', role='partner')
+        self.referral = User.objects.create_user(
+            username='referral', password='pass', role='client', partner=self.partner
+        )
+
+    def test_counters_are_incremental(self):
+        from apps.orders.models import Order
+        order = Order.objects.create(client=self.referral, title='Диплом', budget=Decimal('2000.00'))
+        Order.objects.create(client=self.referral, title='Отчет', budget=Decimal('100.00'))
+        order.status = 'completed'
+        order.save()
+        order.save()
+        OutboxService.relay()
+
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.total_referrals, 1)
+        self.assertEqual(self.partner.active_referrals, 1)
+        # 50 за регистрацию + 5% от 2000
+        self.assertEqual(self.partner.total_earnings, Decimal('150.00'))
+        self.assertEqual(PartnerService.reconcile([self.partner]), 0)
+
+    def test_mark_paid_is_idempotent(self):
+        earning = PartnerEarning.objects.get(partner=self.partner)
+        self.assertEqual(PartnerService.mark_paid([earning.id]), 1)
+        self.assertEqual(PartnerService.mark_paid([earning.id]), 0)
+
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.paid_earnings, Decimal('50.00'))
+
+    def test_reconcile_fixes_drift(self):
+        User.objects.filter(pk=self.partner.pk).update(total_referrals=7, total_earnings=Decimal('1.00'))
+
+        self.assertEqual(PartnerService.reconcile(), 1)
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.total_referrals, 1)
+        self.assertEqual(self.partner.total_earnings, Decimal('50.00'))
+
+    def test_dashboard_does_not_write(self):
+        User.objects.filter(pk=self.partner.pk).update(total_earnings=Decimal('999.00'))
+        self.partner.refresh_from_db()
+        self.client.force_authenticate(self.partner)
+
+        # Профиль, рефералы и первая страница ленты
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user-partner-dashboard'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['partner_info']['total_earnings'], Decimal('999.00'))
+        self.assertEqual(len(response.data['recent_earnings']), 1)
+
+    def test_referral_listing_annotations_and_export(self):
+        from apps.orders.models import Order
+        Order.objects.create(client=self.referral, title='Диплом', budget=Decimal('2000.00'), status='completed')
+        Order.objects.create(client=self.referral, title='Отчет', budget=Decimal('100.00'))
+        OutboxService.relay()
+        self.client.force_authenticate(self.partner)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user-partner-referrals'))
+        row = response.data['results'][0]
+        self.assertEqual(row['orders_count'], 2)
+        self.assertEqual(row['spend'], Decimal('2000.00'))
+        self.assertEqual(row['commission'], Decimal('150.00'))
+
+        response = self.client.get(reverse('user-partner-referrals-export'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.referral.id},referral,'))
+
+    def test_payout_batch_settles_unpaid_earnings(self):
+        from apps.orders.models import Order
+        Order.objects.create(client=self.referral, title='Диплом', budget=Decimal('2000.00'), status='completed')
+        OutboxService.relay()
+
+        payouts = PartnerService.create_payouts()
+
+        self.assertEqual(len(payouts), 1)
+        self.assertEqual(payouts[0].amount, Decimal('150.00'))
+        self.assertEqual(payouts[0].earnings_count, 2)
+        self.assertFalse(PartnerEarning.objects.filter(is_paid=False).exists())
+        self.assertEqual(PartnerEarning.objects.filter(payout=payouts[0]).count(), 2)
+        self.partner.refresh_from_db()
+        self.assertEqual(self.partner.paid_earnings, Decimal('150.00'))
+        rollups = PartnerEarningMonthlyRollup.objects.filter(partner=self.partner)
+        self.assertEqual(sum(r.total for r in rollups), Decimal('150.00'))
+        self.assertEqual(sum(r.paid_total for r in rollups), Decimal('150.00'))
+        self.assertEqual(PartnerService.create_payouts(), [])
+
+    def test_admin_partner_filters_are_validated(self):
+        admin = User.objects.create_user(username='admin', password='pass', role='admin')
+        self.client.force_authenticate(admin)
+
+        for name in ('user-admin-earnings', 'user-admin-earnings-summary'):
+            response = self.client.get(reverse(name), {'partner': 'abc'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(self.client.get(reverse(name), {'partner': self.partner.id}).status_code, status.HTTP_200_OK)
+
+        for partner_ids in (str(self.partner.id), ['1; DROP'], [True]):
+            response = self.client.post(reverse('user-admin-create-payouts'), {'partner_ids': partner_ids}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('user-admin-create-payouts'), {'partner_ids': [self.partner.id]}, format='json')
+        self.assertEqual(len(response.data['payouts']), 1)
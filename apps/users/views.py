@@ -21,9 +21,42 @@ from .serializers import (
     PasswordResetSerializer, PasswordResetConfirmSerializer,
     CustomTokenObtainPairSerializer
 )
+from .authentication import AuthUserCache
+from .services import PartnerService
+from rest_framework.pagination import CursorPagination
+from django.http import StreamingHttpResponse
+import csv
+from decimal import Decimal
 
 User = get_user_model()
 
+
+class KeysetPagination(CursorPagination):
+    """Keyset-пагинация по id: стоимость страницы не зависит от ее номера"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+    def write(self, value):
+        return value
+
+
+def _referral_row(ref):
+    return {
+        'id': ref.id,
+        'username': ref.username,
+        'email': ref.email,
+        'role': ref.role,
+        'date_joined': ref.date_joined,
+        'orders_count': ref.client_orders_count if ref.role == 'client' else ref.expert_orders_count,
+        'spend': ref.spend,
+        'commission': ref.commission,
+    }
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
@@ -31,6 +64,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    # Бюджет запросов к базе (RequestMetricsMiddleware)
+    query_budgets = {'me': 2, 'partner_dashboard': 3}
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -109,6 +144,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 
                 if default_token_generator.check_token(user, serializer.validated_data['token']):
                     user.set_password(serializer.validated_data['new_password'])
+                    # Выданные до смены пароля токены больше не принимаются
+                    AuthUserCache.revoke_tokens(user)
                     user.save()
                     return Response(
                         {"detail": "Пароль успешно изменен."},
@@ -126,12 +163,13 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
+        # В request.user нет балансов и счетчиков партнера (AUTH_USER_DEFERRED_FIELDS), читаем профиль целиком
+        serializer = self.get_serializer(User.objects.get(pk=request.user.pk))
         return Response(serializer.data)
 
     @action(detail=False, methods=['patch'], permission_classes=[permissions.IsAuthenticated])
     def update_me(self, request):
-        serializer = UserUpdateSerializer(request.user, data=request.data, partial=True)
+        serializer = UserUpdateSerializer(User.objects.get(pk=request.user.pk), data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -142,7 +180,7 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         Получение данных для клиентского кабинета
         """
-        user = request.user
+        user = User.objects.get(pk=request.user.pk)
         if user.role != 'client':
             return Response(
                 {'error': 'Доступно только для клиентов'},
@@ -240,6 +278,7 @@ class UserViewSet(viewsets.ModelViewSet):
             refresh_token = request.data["refresh"]
             token = RefreshToken(refresh_token)
             token.blacklist()
+            AuthUserCache.invalidate(request.user.pk, request.user.token_version)
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -259,29 +298,16 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def partner_dashboard(self, request):
         """Получение данных для партнерского кабинета"""
-        user = request.user
+        user = User.objects.get(pk=request.user.pk)
         if user.role != 'partner':
             return Response(
                 {'error': 'Доступно только для партнеров'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        
-        # Статистика рефералов
-        referrals = user.referrals.all()
-        active_referrals = referrals.filter(
-            client_orders__isnull=False
-        ).distinct()
-        
-        # Доходы партнера
-        from .models import PartnerEarning
-        earnings = PartnerEarning.objects.filter(partner=user)
-        total_earnings = sum(earning.amount for earning in earnings)
-        
-        # Обновляем статистику
-        user.active_referrals = active_referrals.count()
-        user.total_earnings = total_earnings
-        user.save()
-        
+
+        # Счетчики поддерживаются инкрементально, пересчет на чтении не нужен
+        referrals = PartnerService.referrals_with_stats(user).order_by('-date_joined')[:10]
+
         return Response({
             'partner_info': {
                 'referral_code': user.referral_code,
@@ -289,31 +315,73 @@ class UserViewSet(viewsets.ModelViewSet):
                 'total_referrals': user.total_referrals,
                 'active_referrals': user.active_referrals,
                 'total_earnings': user.total_earnings,
+                'paid_earnings': user.paid_earnings,
             },
             'referrals': [
-                {
-                    'id': ref.id,
-                    'username': ref.username,
-                    'email': ref.email,
-                    'role': ref.role,
-                    'date_joined': ref.date_joined,
-                    'orders_count': ref.client_orders.count() if ref.role == 'client' else ref.expert_orders.count(),
-                }
+                _referral_row(ref)
                 for ref in referrals
             ],
-            'recent_earnings': [
-                {
-                    'id': earning.id,
-                    'amount': earning.amount,
-                    'referral': earning.referral.username,
-                    'earning_type': earning.earning_type,
-                    'created_at': earning.created_at,
-                    'is_paid': earning.is_paid,
-                }
-                for earning in earnings[:10]
-            ]
+            'recent_earnings': PartnerService.get_earnings_page(user, page=1, page_size=10)['results']
         })
 
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def partner_earnings(self, request):
+        """Лента начислений партнера с постраничной навигацией"""
+        user = request.user
+        if user.role != 'partner':
+            return Response(
+                {'error': 'Доступно только для партнеров'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = min(int(request.query_params.get('page_size', 20)), 100)
+        except ValueError:
+            return Response(
+                {'error': 'Некорректные параметры страницы'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(PartnerService.get_earnings_page(user, page=page, page_size=max(page_size, 1)))
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def partner_referrals(self, request):
+        """Рефералы партнера с заказами, тратами и комиссией (cursor-пагинация)"""
+        user = request.user
+        if user.role != 'partner':
+            return Response(
+                {'error': 'Доступно только для партнеров'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(PartnerService.referrals_with_stats(user), request, view=self)
+        return paginator.get_paginated_response([_referral_row(ref) for ref in page])
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def partner_referrals_export(self, request):
+        """Потоковая выгрузка рефералов партнера в CSV"""
+        user = request.user
+        if user.role != 'partner':
+            return Response(
+                {'error': 'Доступно только для партнеров'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        columns = ['id', 'username', 'email', 'role', 'date_joined', 'orders_count', 'spend', 'commission']
+        referrals = PartnerService.referrals_with_stats(user).order_by('-id').iterator(chunk_size=2000)
+        writer = csv.writer(_Echo())
+
+        def rows():
+            yield writer.writerow(columns)
+            for ref in referrals:
+                row = _referral_row(ref)
+                yield writer.writerow([row[column] for column in columns])
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="referrals.csv"'
+        return response
+
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def generate_referral_link(self, request):
         """Генерация реферальной ссылки"""
@@ -364,11 +432,21 @@ class UserViewSet(viewsets.ModelViewSet):
             )
 
         from .models import PartnerEarning
-        earnings = PartnerEarning.objects.select_related('partner', 'referral').order_by('-created_at')
-        
-        earnings_data = []
-        for earning in earnings:
-            earnings_data.append({
+        earnings = PartnerEarning.objects.select_related('partner', 'referral')
+        partner_id = request.query_params.get('partner')
+        if partner_id:
+            try:
+                earnings = earnings.filter(partner_id=int(partner_id))
+            except ValueError:
+                return Response(
+                    {'error': 'Некорректный идентификатор партнера'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(earnings, request, view=self)
+        return paginator.get_paginated_response([
+            {
                 'id': earning.id,
                 'partner': earning.partner.username,
                 'referral': earning.referral.username,
@@ -376,9 +454,78 @@ class UserViewSet(viewsets.ModelViewSet):
                 'earning_type': earning.earning_type,
                 'created_at': earning.created_at,
                 'is_paid': earning.is_paid,
-            })
-        
-        return Response(earnings_data)
+                'payout': earning.payout_id,
+            }
+            for earning in page
+        ])
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def admin_earnings_summary(self, request):
+        """Итоги начислений по партнерам и месяцам (из помесячных итогов)"""
+        user = request.user
+        if user.role != 'admin':
+            return Response(
+                {'error': 'Доступно только для администраторов'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        from .models import PartnerEarningMonthlyRollup
+        rollups = PartnerEarningMonthlyRollup.objects.all()
+        partner_id = request.query_params.get('partner')
+        if partner_id:
+            try:
+                rollups = rollups.filter(partner_id=int(partner_id))
+            except ValueError:
+                return Response(
+                    {'error': 'Некорректный идентификатор партнера'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        summary = rollups.values(
+            'partner_id', 'month', partner_username=models.F('partner__username')
+        ).annotate(
+            total=models.Sum('total'),
+            paid_total=models.Sum('paid_total'),
+            entries_count=models.Sum('entries_count')
+        ).order_by('-month', 'partner_id')
+
+        page = self.paginate_queryset(summary)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(summary))
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def admin_create_payouts(self, request):
+        """Создать выплаты по всем невыплаченным начислениям (или по указанным партнерам)"""
+        user = request.user
+        if user.role != 'admin':
+            return Response(
+                {'error': 'Доступно только для администраторов'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        partner_ids = request.data.get('partner_ids')
+        if partner_ids is not None and (
+            not isinstance(partner_ids, list)
+            or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in partner_ids)
+        ):
+            return Response(
+                {'error': 'partner_ids должен быть списком идентификаторов партнеров'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        payouts = PartnerService.create_payouts(partner_ids=partner_ids, created_by=user)
+        return Response({
+            'payouts': [
+                {
+                    'id': payout.id,
+                    'partner': payout.partner_id,
+                    'amount': payout.amount,
+                    'earnings_count': payout.earnings_count,
+                }
+                for payout in payouts
+            ],
+            'total_amount': sum((payout.amount for payout in payouts), Decimal('0')),
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAuthenticated])
     def admin_update_partner(self, request, pk=None):
@@ -425,17 +572,14 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            from .models import PartnerEarning
-            earning = PartnerEarning.objects.get(id=earning_id)
-            earning.is_paid = True
-            earning.save()
-            return Response({'message': 'Начисление отмечено как выплаченное'})
-        except PartnerEarning.DoesNotExist:
+        from .models import PartnerEarning
+        if not PartnerEarning.objects.filter(id=earning_id).exists():
             return Response(
                 {'error': 'Начисление не найдено'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        PartnerService.mark_paid([earning_id])
+        return Response({'message': 'Начисление отмечено как выплаченное'})
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def admin_arbitrators(self, request):
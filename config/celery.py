@@ -27,6 +27,34 @@ app.conf.beat_schedule = {
         'task': 'apps.notifications.tasks.cleanup_old_notifications',
         'schedule': crontab(hour='3', minute='0'),  # Каждый день в 3:00
     },
+    'archive-notifications': {
+        'task': 'apps.notifications.tasks.archive_notifications',
+        'schedule': crontab(hour='3', minute='30'),  # Каждый день в 3:30
+    },
+    'process-escrow-payouts': {
+        'task': 'apps.orders.tasks.process_escrow_payouts',
+        'schedule': crontab(minute='*/15'),  # Каждые 15 минут
+    },
+    'process-refunds': {
+        'task': 'apps.payments.tasks.process_refunds',
+        'schedule': crontab(minute='*/5'),  # Каждые 5 минут
+    },
+    'relay-outbox': {
+        'task': 'apps.core.tasks.relay_outbox',
+        'schedule': 5.0,  # Каждые 5 секунд
+    },
+    'reconcile-catalog-counters': {
+        'task': 'apps.catalog.tasks.reconcile_catalog_counters',
+        'schedule': crontab(hour='4', minute='30'),  # Каждый день в 4:30
+    },
+    'rollup-discount-usage': {
+        'task': 'apps.catalog.tasks.rollup_discount_usage',
+        'schedule': crontab(minute='10'),  # Каждый час в 10 минут
+    },
+    'reconcile-client-loyalty': {
+        'task': 'apps.catalog.tasks.reconcile_client_loyalty',
+        'schedule': crontab(hour='4', minute='40'),  # Каждый день в 4:40
+    },
 }
 
 @app.task(bind=True)
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'django_filters',
     'corsheaders',
     'channels',
@@ -57,9 +58,11 @@ INSTALLED_APPS = [
     'apps.core',
     'apps.experts',
     'apps.notifications',
+    'apps.payments',
 ]
 
 MIDDLEWARE = [
+    'apps.core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -111,7 +114,7 @@ CHANNEL_LAYERS = {
 # Настройки кэширования
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'apps.core.cache.InstrumentedRedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -195,12 +198,16 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.InstrumentedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': [
@@ -311,3 +318,99 @@ PAYMENT_ENCRYPTION_KEY = os.getenv('PAYMENT_ENCRYPTION_KEY', Fernet.generate_key
 # Настройки медиа файлов
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Escrow заказов
+PLATFORM_COMMISSION_RATE = 10  # Комиссия платформы с выплаты исполнителю, %
+ESCROW_PAYOUT_BATCH_SIZE = 500  # Заказов в одной пакетной выплате
+
+# Ключи идемпотентности (заголовок Idempotency-Key)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # Срок хранения ответа, сек
+IDEMPOTENCY_LOCK_TIMEOUT = 60  # Блокировка на время обработки первого запроса, сек
+
+# Платежные провайдеры: метод оплаты -> класс клиента (загружается при первом обращении)
+PAYMENT_PROVIDERS = {
+    'card': 'apps.payments.providers.alfabank.AlfaBankClient',
+    'sbp': 'apps.payments.providers.sbp.SBPClient',
+}
+
+# Очередь возвратов
+REFUND_BATCH_SIZE = 100  # Заявок в одной пачке
+REFUND_MAX_WORKERS = 4  # Параллельных запросов к провайдерам
+REFUND_RATE_LIMIT = 5  # Запросов к провайдерам в секунду
+REFUND_MAX_ATTEMPTS = 3  # Попыток до перевода заявки в ошибку
+REFUND_CLAIM_TIMEOUT = 900  # Заявка в обработке дольше возвращается в очередь, сек
+
+# Transactional outbox: тип события -> обработчики (получают список payload)
+OUTBOX_HANDLERS = {
+    'order.changed': [
+        'apps.experts.outbox.refresh_statistics',
+        'apps.users.outbox.partner_accounting',
+        'apps.catalog.outbox.update_order_counters',
+        'apps.catalog.outbox.update_client_loyalty',
+        'apps.catalog.outbox.update_discount_rollups',
+    ],
+    'order.taken': ['apps.notifications.outbox.order_taken'],
+    'order.status_changed': ['apps.notifications.outbox.order_status_changed'],
+    'bid.created': ['apps.notifications.outbox.bid_created'],
+    'dispute.created': ['apps.notifications.outbox.dispute_created'],
+    'dispute.arbitrator_assigned': ['apps.notifications.outbox.arbitrator_assigned'],
+    'dispute.resolved': ['apps.notifications.outbox.dispute_resolved'],
+    'payment.completed': ['apps.notifications.outbox.payment_completed'],
+}
+OUTBOX_BATCH_SIZE = 200  # Событий в одной пачке релея
+OUTBOX_MAX_ATTEMPTS = 5  # Попыток доставки до остановки события
+
+# Кэш пользователей для JWT-аутентификации
+AUTH_USER_CACHE_TIMEOUT = 300  # Redis, сек
+AUTH_USER_LOCAL_CACHE_TIMEOUT = 5  # Локальный кэш процесса, сек
+AUTH_USER_LOCAL_CACHE_SIZE = 10000  # Записей в локальном кэше процесса
+
+# Снимок каталога для формы заказа
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60 * 24  # Хранение версии снимка в Redis, сек
+CATALOG_SNAPSHOT_LOCAL_TIMEOUT = 30  # Копия в памяти процесса, сек
+
+# Сегменты правил скидок
+DISCOUNT_SEGMENT_COUNT_TIMEOUT = 60  # Кэш количества подходящих клиентов, сек
+
+# Рассылки о скидках
+DISCOUNT_CAMPAIGN_BATCH_SIZE = 100  # Клиентов в пачке между сохранениями позиции
+DISCOUNT_CAMPAIGN_RATE = 10  # Писем в секунду
+DISCOUNT_CAMPAIGN_TIME_LIMIT = 600  # Работа одной задачи до продолжения в новой, сек
+DISCOUNT_CAMPAIGN_STALE_AFTER = 900  # Рассылка без обновлений считается брошенной, сек
+
+# Расчет цен в памяти процесса (PricingEngine)
+PRICING_ENGINE_CHECK_INTERVAL = 5  # Проверка версии каталога не чаще, сек
+PRICING_ENGINE_RELOAD_INTERVAL = 300  # Перезагрузка без смены версии (без Redis), сек
+
+# Метрики запросов (RequestMetricsMiddleware, /api/metrics/)
+SERVER_TIMING_HEADER = os.getenv('SERVER_TIMING_HEADER', 'False') == 'True'  # Заголовок Server-Timing (сотрудникам и METRICS_ALLOWED_IPS)
+QUERY_BUDGET_RAISE = False  # Превышение бюджета запросов: ошибка вместо предупреждения (включает TEST_RUNNER)
+TEST_RUNNER = 'apps.core.test_runner.TestRunner'
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')  # Адреса, с которых доступны метрики
+
+# События задач для экспортера метрик Celery (manage.py celery_exporter)
+CELERY_WORKER_SEND_TASK_EVENTS = True  # События выполнения задач от воркеров
+CELERY_TASK_SEND_SENT_EVENT = True  # Событие публикации задачи (для ожидания в очереди)
+CELERY_EXPORTER_PORT = int(os.getenv('CELERY_EXPORTER_PORT', 9808))  # Порт HTTP экспортера
+CELERY_EXPORTER_ADDRESS = os.getenv('CELERY_EXPORTER_ADDRESS', '127.0.0.1')  # Адрес HTTP экспортера
+
+# Периодические задачи с пачками (apps.core.jobs)
+JOB_LOCK_LEASE = 300  # Блокировка задачи без продления истекает через, сек
+JOB_CHUNK_SIZE = 200  # Строк в пачке между сохранениями позиции
+
+# Очистка уведомлений (cleanup_old_notifications)
+NOTIFICATION_RETENTION_DAYS = {  # Срок хранения прочитанных уведомлений по типам, дней
+    'new_order': 30,
+    'order_taken': 90,
+    'order_completed': 180,
+    'review_received': 365,
+}
+NOTIFICATION_RETENTION_DEFAULT_DAYS = 30  # Для остальных типов, дней
+NOTIFICATION_CLEANUP_BATCH_SIZE = 1000  # Уведомлений в одном DELETE
+NOTIFICATION_CLEANUP_PAUSE = 0.5  # Пауза между пачками, сек
+
+# Архив уведомлений (archive_notifications, export_notification_archive)
+NOTIFICATION_ARCHIVE_AFTER_DAYS = 30  # Уведомления старше переносятся в архив, дней
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000  # Уведомлений в одной транзакции переноса
+NOTIFICATION_ARCHIVE_EXPORT_MONTHS = 12  # Месяцы архива старше выгружаются в файлы
+NOTIFICATION_ARCHIVE_DIR = BASE_DIR / 'archive' / 'notifications'  # Каталог файлов выгрузки